@@ -0,0 +1,198 @@
+# auth.py
+"""Admin authentication.
+
+    python auth.py set-password <username>     # add an admin or reset a password
+
+Passwords are stored as "pbkdf2_sha256$<iterations>$<salt>$<hash>".  The
+old unsalted SHA-256 hex digests are still accepted and are replaced by
+a PBKDF2 hash after the next successful login.  The parsed admin table
+is cached and only re-read when the admin file (or its journal) changes
+on disk.  Hashing is deliberately slow, so GUI callers should run
+authenticate() off the Tk thread.  An unknown username is checked against
+a dummy hash and fails like a wrong password, so neither the result nor
+the time taken tells which usernames exist.
+"""
+import argparse
+import getpass
+import hashlib
+import hmac
+import secrets
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+from constants import (ADMIN_FILE, PBKDF2_ITERATIONS, LOGIN_MAX_FAILURES, LOGIN_LOCKOUT_SECONDS,
+                       LOGIN_TRACKED_USERS)
+from file_handler import file_stamp, load_records, upsert_records
+from logger import log_info, log_warning
+from records import Admin
+
+SCHEME = "pbkdf2_sha256"
+
+# Results of authenticate().
+OK = "ok"
+BAD_PASSWORD = "bad_password"
+LOCKED = "locked"
+
+# ---------- Hashing ----------
+
+def hash_password(password, iterations=PBKDF2_ITERATIONS, salt=None):
+    """Returns a salted PBKDF2 hash string for password."""
+    salt = salt or secrets.token_hex(16)
+    digest = hashlib.pbkdf2_hmac("sha256", password.encode(), salt.encode(), iterations)
+    return f"{SCHEME}${iterations}${salt}${digest.hex()}"
+
+def legacy_hash(password):
+    """The original unsalted SHA-256 hex digest."""
+    return hashlib.sha256(password.encode()).hexdigest()
+
+def verify_password(password, stored):
+    """Checks password against a stored hash in constant time."""
+    if stored.startswith(SCHEME + "$"):
+        try:
+            _, iterations, salt, _ = stored.split("$")
+            candidate = hash_password(password, int(iterations), salt)
+        except ValueError:
+            return False
+    else:
+        candidate = legacy_hash(password)
+    return hmac.compare_digest(candidate.encode(), stored.encode())
+
+def needs_upgrade(stored):
+    """True for legacy hashes and PBKDF2 hashes with fewer iterations than now."""
+    if not stored.startswith(SCHEME + "$"):
+        return True
+    try:
+        return int(stored.split("$")[1]) < PBKDF2_ITERATIONS
+    except (IndexError, ValueError):
+        return True
+
+# ---------- Admin table ----------
+
+class AdminTable:
+    """Parsed admins by username, re-read only when the files change."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.stamp = None
+        self.admins = {}
+
+    def get(self, username):
+        with self.lock:
+            stamp = file_stamp([ADMIN_FILE])
+            if stamp != self.stamp:
+                self.admins = {admin.username: admin
+                               for admin in load_records(ADMIN_FILE, Admin)}
+                self.stamp = stamp
+            return self.admins.get(username)
+
+    def save(self, admin):
+        with self.lock:
+            upsert_records(ADMIN_FILE, [admin.to_line()])
+            self.admins[admin.username] = admin
+            self.stamp = file_stamp([ADMIN_FILE])
+
+    def next_id(self):
+        with self.lock:
+            ids = [int(admin.admin_id) for admin in self.admins.values()
+                   if admin.admin_id.isdigit()]
+        return str(max(ids, default=0) + 1)
+
+admins = AdminTable()
+
+# ---------- Login ----------
+
+# username -> (count, time of the last failure), least recently failed first.
+_failures = OrderedDict()
+_failures_lock = threading.Lock()
+_dummy_hash = None
+
+def _locked(username):
+    with _failures_lock:
+        count, since = _failures.get(username, (0, 0.0))
+        if count < LOGIN_MAX_FAILURES:
+            return False
+        if time.monotonic() - since > LOGIN_LOCKOUT_SECONDS:
+            del _failures[username]
+            return False
+        return True
+
+def _failed(username):
+    with _failures_lock:
+        now = time.monotonic()
+        count, _ = _failures.pop(username, (0, 0.0))
+        _failures[username] = (count + 1, now)
+        while _failures:
+            oldest, (_, since) = next(iter(_failures.items()))
+            if now - since <= LOGIN_LOCKOUT_SECONDS and len(_failures) <= LOGIN_TRACKED_USERS:
+                break
+            del _failures[oldest]
+
+def _dummy():
+    """A hash no password matches, to spend the same time on unknown usernames."""
+    global _dummy_hash
+    if _dummy_hash is None:
+        _dummy_hash = hash_password(secrets.token_hex(16))
+    return _dummy_hash
+
+def authenticate(username, password):
+    """Checks admin credentials; returns OK, BAD_PASSWORD or LOCKED.
+
+    A successful login with an outdated hash rewrites it as PBKDF2.
+    """
+    result, upgraded = verify(username, password)
+    if upgraded is not None:
+        upgrade(username, *upgraded)
+    return result
+
+def verify(username, password):
+    """authenticate() without writing anything: returns (result, upgraded).
+
+    upgraded is (old hash, new PBKDF2 hash) after a successful login with
+    an outdated hash, for upgrade(); otherwise None.
+    """
+    if _locked(username):
+        return LOCKED, None
+    dummy = _dummy()  # made on the first login either way, not just an unknown user's
+    admin = admins.get(username)
+    stored = dummy if admin is None else admin.password_hash
+    if not verify_password(password, stored) or admin is None:
+        _failed(username)
+        log_warning("login failed", username=username)
+        return BAD_PASSWORD, None
+    with _failures_lock:
+        _failures.pop(username, None)
+    if needs_upgrade(admin.password_hash):
+        return OK, (admin.password_hash, hash_password(password))
+    return OK, None
+
+def upgrade(username, old_hash, new_hash):
+    """Stores new_hash, unless the password was changed since old_hash was read."""
+    admin = admins.get(username)
+    if admin is not None and admin.password_hash == old_hash:
+        admins.save(admin.replace(password_hash=new_hash))
+        log_info("password hash upgraded", username=username)
+
+def set_password(username, password):
+    """Adds an admin or replaces their password; returns the admin ID."""
+    admin = admins.get(username)
+    if admin is None:
+        admin = Admin(admins.next_id(), username, "")
+    admins.save(admin.replace(password_hash=hash_password(password)))
+    return admin.admin_id
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manage admin logins.")
+    actions = parser.add_subparsers(dest="action", required=True)
+    actions.add_parser("set-password").add_argument("username")
+    args = parser.parse_args(argv)
+    password = getpass.getpass(f"New password for {args.username}: ")
+    if not password or password != getpass.getpass("Repeat: "):
+        print("Passwords are empty or do not match.")
+        return 1
+    print(f"Password set for admin {set_password(args.username, password)}.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
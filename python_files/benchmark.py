@@ -0,0 +1,283 @@
+# benchmark.py
+"""Benchmarks of the core store operations on synthetic data.
+
+    python benchmark.py                          # 10k and 100k patients
+    python benchmark.py --sizes 1000000 --output results.json
+    python benchmark.py --baseline old.json      # compare with an earlier run
+
+Datasets are generated from a fixed seed in the normal record file
+formats (about three appointments and two prescriptions per patient,
+dated relative to the day of generation) and cached under --data-dir.
+Every size runs on a fresh copy of its dataset, so deletes and bookings
+never change the cached files.  Startup is timed in fresh processes,
+with and without the warm-start snapshot.  Results are written as
+JSON: per operation the sample count and min/mean/p50/p95 latencies in
+milliseconds, plus the commit and Python they came from.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from constants import (PATIENTS_FILE, APPOINTMENTS_FILE, PRESCRIPTIONS_FILE, ADMIN_FILE,
+                       SLOT_MINUTES, SNAPSHOT_FILE)
+from dates import ordinal_to_date, today_ordinal
+from logger import get_logger
+from records import Patient, Appointment, Prescription
+from slot_index import SLOTS_PER_DAY, slot_time
+import snapshot
+
+DEFAULT_SIZES = (10_000, 100_000)
+APPOINTMENTS_PER_PATIENT = 3
+PRESCRIPTIONS_PER_PATIENT = 2
+BOOKING_DAYS = 60
+
+FIRST_NAMES = ("James", "Mary", "John", "Patricia", "Robert", "Jennifer", "Michael", "Linda",
+               "William", "Elizabeth", "David", "Barbara", "Richard", "Susan", "Joseph",
+               "Jessica", "Thomas", "Sarah", "Charles", "Karen", "Aisha", "Wei", "Priya",
+               "Mohammed", "Olga", "Kenji", "Fatima", "Mateo", "Chloe", "Liam")
+LAST_NAMES = ("Smith", "Johnson", "Williams", "Brown", "Jones", "Garcia", "Miller", "Davis",
+              "Rodriguez", "Martinez", "Hernandez", "Lopez", "Gonzalez", "Wilson", "Anderson",
+              "Thomas", "Taylor", "Moore", "Jackson", "Martin", "Lee", "Perez", "Thompson",
+              "White", "Harris", "Sanchez", "Clark", "Ramirez", "Lewis", "Robinson", "Patel",
+              "Nguyen", "Kim", "Chen", "Singh", "Okafor", "Kowalski", "Rossi", "Murphy", "Rivera")
+STREETS = ("High Street", "Station Road", "Church Lane", "Park Avenue", "Mill Road",
+           "Victoria Road", "Green Lane", "Kings Road", "Queens Road", "New Street")
+TOWNS = ("Leeds", "York", "Bath", "Derby", "Exeter", "Hull", "Leicester", "Norwich")
+REASONS = ("Eye test", "Contact lens check", "Glasses fitting", "Follow-up",
+           "Dry eyes, irritation", "Headaches")
+LENSES = ("-0.50", "-1.25", "-2.00", "+0.75", "+1.50", "-3.25")
+
+# ---------- Data generation ----------
+
+def generate(directory, patients, seed=1):
+    """Writes a synthetic dataset of the given size into directory."""
+    rng = random.Random(seed)
+    os.makedirs(directory, exist_ok=True)
+    today = today_ordinal()
+    free_slots = [(day, slot) for day in range(today + 1, today + 1 + BOOKING_DAYS)
+                  for slot in range(SLOTS_PER_DAY)]
+    rng.shuffle(free_slots)
+    aid = 0
+    presc_id = 0
+    with open(os.path.join(directory, PATIENTS_FILE), "w", encoding="utf-8") as pf, \
+            open(os.path.join(directory, APPOINTMENTS_FILE), "w", encoding="utf-8") as af, \
+            open(os.path.join(directory, PRESCRIPTIONS_FILE), "w", encoding="utf-8") as rf:
+        for pid in range(1, patients + 1):
+            first = rng.choice(FIRST_NAMES)
+            last = rng.choice(LAST_NAMES)
+            name = f"{first} {last}"
+            dob = ordinal_to_date(today - rng.randint(5 * 365, 95 * 365))
+            address = f"{rng.randint(1, 200)} {rng.choice(STREETS)}, {rng.choice(TOWNS)}"
+            pf.write(Patient(str(pid), first, last, dob, f"07{rng.randint(0, 99999999):08d}",
+                             f"{first}.{last}{pid}@example.com".lower(), address).to_line() + "\n")
+            for _ in range(rng.randint(0, 2 * APPOINTMENTS_PER_PATIENT)):
+                aid += 1
+                if free_slots and rng.random() < 0.05:
+                    day, slot = free_slots.pop()
+                    status = "Booked"
+                else:
+                    day, slot = today - rng.randint(1, 3 * 365), rng.randrange(SLOTS_PER_DAY)
+                    status = rng.choice(("Completed", "Completed", "Cancelled"))
+                af.write(Appointment(str(aid), str(pid), name, day, slot_time(slot), status,
+                                     rng.choice(REASONS)).to_line() + "\n")
+            for _ in range(rng.randint(0, 2 * PRESCRIPTIONS_PER_PATIENT)):
+                presc_id += 1
+                day = today - rng.randint(0, 6 * 365)
+                details = f"R {rng.choice(LENSES)} L {rng.choice(LENSES)}"
+                rf.write(Prescription(str(presc_id), str(pid), name, details, day,
+                                      day + 365).to_line() + "\n")
+    with open(os.path.join(directory, ADMIN_FILE), "w", encoding="utf-8") as f:
+        f.write("1,admin,ef92b778bafe771e89245b89ecbc08a44a4e166c06659911881f383d4473e94f\n")
+    with open(os.path.join(directory, "dataset.json"), "w", encoding="utf-8") as f:
+        json.dump({"patients": patients, "appointments": aid, "prescriptions": presc_id,
+                   "seed": seed}, f)
+
+def dataset(data_dir, patients, seed):
+    """Returns the cached dataset directory for a size, generating it if needed."""
+    directory = os.path.join(data_dir, f"patients_{patients}_seed_{seed}")
+    if not os.path.exists(os.path.join(directory, "dataset.json")):
+        generate(directory, patients, seed)
+    return directory
+
+# ---------- Timing ----------
+
+def measure(func, inputs):
+    """Calls func(x) for each input; returns per-call latency stats in ms."""
+    samples = []
+    for value in inputs:
+        start = time.perf_counter()
+        func(value)
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return {
+        "n": len(samples),
+        "min_ms": round(samples[0], 4),
+        "mean_ms": round(statistics.fmean(samples), 4),
+        "p50_ms": round(samples[len(samples) // 2], 4),
+        "p95_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 4),
+    }
+
+def _cold_store(_=None):
+    from record_store import RecordStore
+    _remove_snapshot()
+    return RecordStore()
+
+def _remove_snapshot():
+    path = snapshot.snapshot_path()
+    if SNAPSHOT_FILE and os.path.exists(path):
+        os.remove(path)
+
+def startup(samples=3):
+    """Times fresh processes that import services and load the store.
+
+    "startup.cold" parses every file; "startup.snapshot" restores the
+    warm-start snapshot that the previous process saved on close.
+    """
+    env = dict(os.environ, PYTHONPATH=os.path.dirname(os.path.abspath(__file__)))
+    script = "import services; services.warm_up(); services.close()"
+
+    def launch(cold):
+        if cold:
+            _remove_snapshot()
+        subprocess.run([sys.executable, "-c", script], env=env, check=True)
+
+    results = {"startup.cold": measure(launch, [True] * samples)}
+    launch(True)
+    results["startup.snapshot"] = measure(launch, [False] * samples)
+    return results
+
+def run_operations(repeat, seed):
+    """Times each core operation against the store in the current directory."""
+    from record_reader import RecordReader
+    from record_store import RecordStore
+    rng = random.Random(seed)
+    results = {"load": measure(_cold_store, range(3))}
+    store = _cold_store()
+    store.save_snapshot()
+    results["load.snapshot"] = measure(lambda _: RecordStore(), range(3))
+    today = today_ordinal()
+    pids = list(store.patients)
+    sample = [store.patients[rng.choice(pids)] for _ in range(repeat)]
+    future = [(ordinal_to_date(today + rng.randint(1, BOOKING_DAYS)),
+               slot_time(rng.randrange(SLOTS_PER_DAY))) for _ in range(repeat)]
+    heavy = max(1, min(repeat, 10))
+
+    results["find_patients_by_name.full"] = measure(
+        store.find_patients_by_name, [p.full_name for p in sample])
+    results["find_patients_by_name.partial"] = measure(
+        store.find_patients_by_name, [p.last_name[:4] for p in sample])
+    results["get_patient"] = measure(store.get_patient, [p.patient_id for p in sample])
+    results["reader.index"] = measure(
+        lambda _: RecordReader(PATIENTS_FILE, Patient).refresh(), range(3))
+    reader = RecordReader(PATIENTS_FILE, Patient)
+    results["reader.get"] = measure(reader.get, [p.patient_id for p in sample])
+    reader.close()
+    results["is_slot_booked"] = measure(lambda slot: store.is_slot_booked(*slot), future)
+    results["next_free_slot"] = measure(lambda _: store.next_free_slot(), range(repeat))
+    results["day_schedule.week"] = measure(
+        lambda day: [store.day_schedule(d) for d in range(day, day + 7)],
+        [today + rng.randint(0, BOOKING_DAYS) for _ in range(repeat)])
+    results["book_slot"] = measure(
+        lambda p: store.book_slot(p.patient_id, p.full_name, *store.next_free_slot(), "Benchmark"),
+        sample[:heavy])
+    results["create_patient"] = measure(
+        lambda p: store.create_patient(p.replace(patient_id="")), sample[:heavy])
+    results["expiring_prescriptions.week"] = measure(
+        lambda day: store.expiring_prescriptions(day, day + 6),
+        [today + rng.randint(-30, 365) for _ in range(repeat)])
+    results["sorted_ids.appointments_by_date"] = measure(
+        lambda reverse: store.sorted_ids("appointments", 3, reverse), (False, True))
+    results["inactive_patients"] = measure(
+        lambda _: store.inactive_patients(today - 4 * 365), range(heavy))
+    victims = rng.sample(pids, min(len(pids), heavy))
+    results["delete_patients.cascade"] = measure(
+        lambda pid: store.delete_patients([pid]), victims)
+    return results
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, cwd=os.path.dirname(os.path.abspath(__file__)),
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run(sizes=DEFAULT_SIZES, repeat=200, seed=1, data_dir="bench_data"):
+    """Runs the benchmarks for each dataset size; returns the results document."""
+    data_dir = os.path.abspath(data_dir)
+    report = {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "seed": seed,
+        "repeat": repeat,
+        "slot_minutes": SLOT_MINUTES,
+        "sizes": {},
+    }
+    cwd = os.getcwd()
+    # Open the log here so it is not written into the throwaway copies.
+    get_logger()
+    for patients in sizes:
+        source = dataset(data_dir, patients, seed)
+        with open(os.path.join(source, "dataset.json"), encoding="utf-8") as f:
+            counts = json.load(f)
+        with tempfile.TemporaryDirectory() as work:
+            shutil.copytree(source, work, dirs_exist_ok=True)
+            os.chdir(work)
+            try:
+                results = startup()
+                results.update(run_operations(repeat, seed))
+            finally:
+                # The snapshot lives in the user's cache, not the temp folder.
+                _remove_snapshot()
+                os.chdir(cwd)
+        report["sizes"][str(patients)] = {"dataset": counts, "operations": results}
+    return report
+
+def compare(report, baseline):
+    """Prints mean latency per operation against a baseline results document."""
+    for size, current in report["sizes"].items():
+        old = baseline.get("sizes", {}).get(size)
+        if old is None:
+            continue
+        print(f"{size} patients (vs {baseline.get('commit')}):")
+        for op, stats in current["operations"].items():
+            before = old["operations"].get(op)
+            if before is None or not before["mean_ms"]:
+                continue
+            ratio = stats["mean_ms"] / before["mean_ms"]
+            print(f"  {op:36} {before['mean_ms']:10.3f} -> {stats['mean_ms']:10.3f} ms  x{ratio:.2f}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the record store on synthetic data.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES),
+                        help="patient counts (e.g. 10000 100000 1000000)")
+    parser.add_argument("--repeat", type=int, default=200, help="samples per light operation")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--data-dir", default="bench_data", help="where datasets are cached")
+    parser.add_argument("--output", help="write results JSON here (default stdout)")
+    parser.add_argument("--baseline", help="earlier results JSON to compare against")
+    args = parser.parse_args(argv)
+    report = run(args.sizes, args.repeat, args.seed, args.data_dir)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            compare(report, json.load(f))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,250 @@
+# bulk_io.py
+"""Headless bulk CSV import/export.
+
+    python bulk_io.py import patients legacy.csv [--rejects rejected.csv]
+    python bulk_io.py export appointments appointments.csv
+    python bulk_io.py recall recall.csv --from 01/06/2025 --to 07/06/2025
+
+Imports stream rows through the column checks in validation.py, allocate IDs
+and append rows in batches, and write every rejected row (with the
+reason) to a side file.  Exports stream the record file in chunks.  The
+recall export lists prescriptions expiring in a date window with the
+patients' contact details, for reminder mailings.
+"""
+import argparse
+import csv
+import itertools
+import sys
+
+from constants import PRESCRIPTION_VALID_DAYS
+from dates import date_to_ordinal, ordinal_to_date, today_ordinal
+from file_handler import iter_records
+from record_store import close as close_store, get_store, RECORD_TYPES, TABLE_FILES
+from records import parse_line
+from slot_index import time_to_minutes
+from validation import (check_nonempty, check_date, check_past_date, check_phone,
+                        check_email, check_time, check_columns)
+
+BATCH_SIZE = 5000
+
+# Columns expected in an import file's header row.  Optional columns may
+# be left out or blank.
+IMPORT_COLUMNS = {
+    "patients": ("first_name", "last_name", "dob", "phone", "email", "address"),
+    "appointments": ("patient_id", "date", "time", "reason", "status"),
+    "prescriptions": ("patient_id", "details", "date", "expiry"),
+}
+OPTIONAL_COLUMNS = {"status", "expiry"}
+
+EXPORT_COLUMNS = {
+    "patients": ("patient_id", "first_name", "last_name", "dob", "phone", "email", "address"),
+    "appointments": ("appointment_id", "patient_id", "patient_name", "date", "time",
+                     "status", "reason"),
+    "prescriptions": ("prescription_id", "patient_id", "patient_name", "details",
+                      "date", "expiry"),
+}
+RECALL_COLUMNS = ("prescription_id", "expiry", "patient_id", "first_name", "last_name",
+                  "phone", "email", "address", "details")
+RECALL_DAYS = 7
+
+# ---------- Pipeline stages ----------
+
+def read_rows(path):
+    """Yields (line number, {column: value}) for each data row of a CSV file."""
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        reader = csv.DictReader(f)
+        for row in reader:
+            yield reader.line_num, {key.strip(): (value or "").strip()
+                                    for key, value in row.items() if key}
+
+def validate_rows(kind, rows, store, reject, chunk_size=BATCH_SIZE):
+    """Yields the field tuples (without ID) of valid rows; passes others to reject.
+
+    Format checks run column-at-a-time over each chunk of rows; checks
+    that need the store (patient exists, slot free) then run per row.
+    """
+    checks = FORMAT_CHECKS[kind]
+    finish = _FINISHERS[kind]
+    seen_slots = set()
+    for chunk in batched(rows, chunk_size):
+        complete = []
+        for line_no, row in chunk:
+            missing = [col for col in IMPORT_COLUMNS[kind]
+                       if col not in OPTIONAL_COLUMNS and col not in row]
+            if missing:
+                reject(line_no, row, f"Missing column(s): {', '.join(missing)}")
+            else:
+                complete.append((line_no, row))
+        columns = {field: [row[field] for _, row in complete] for field in checks}
+        failures = check_columns(columns, checks)
+        for i, (line_no, row) in enumerate(complete):
+            if i in failures:
+                reject(line_no, row, "; ".join(error.message for error in failures[i]))
+                continue
+            fields, error = finish(row, store, seen_slots)
+            if error:
+                reject(line_no, row, error)
+            else:
+                yield fields
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(itertools.islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+def _patient_name(store, pid):
+    patient = store.get_patient(pid)
+    return patient.full_name if patient is not None else None
+
+def _finish_patient(row, store, seen_slots):
+    return tuple(row[col] for col in IMPORT_COLUMNS["patients"]), None
+
+def _finish_appointment(row, store, seen_slots):
+    pid, date, time_str, reason = (row[col] for col in ("patient_id", "date", "time", "reason"))
+    status = row.get("status") or "Booked"
+    name = _patient_name(store, pid)
+    fields = (pid, name, date, time_str, status, reason)
+    if not name:
+        return fields, f"Unknown patient ID {pid!r}."
+    if status.lower() == "booked":
+        slot = (date_to_ordinal(date), time_to_minutes(time_str))
+        if slot in seen_slots or store.is_slot_booked(date, time_str):
+            return fields, "This appointment slot is already booked."
+        seen_slots.add(slot)
+    return fields, None
+
+def _finish_prescription(row, store, seen_slots):
+    pid, details, presc_date = (row[col] for col in ("patient_id", "details", "date"))
+    expiry = row.get("expiry", "")
+    name = _patient_name(store, pid)
+    if expiry and check_date(expiry):
+        return (), check_date(expiry, "expiry").message
+    if not expiry:
+        expiry = ordinal_to_date(date_to_ordinal(presc_date) + PRESCRIPTION_VALID_DAYS)
+    fields = (pid, name, details, presc_date, expiry)
+    if not name:
+        return fields, f"Unknown patient ID {pid!r}."
+    return fields, None
+
+# Store-independent checks, run over whole columns.
+FORMAT_CHECKS = {
+    "patients": {"first_name": check_nonempty, "last_name": check_nonempty,
+                 "address": check_nonempty, "dob": check_past_date,
+                 "phone": check_phone, "email": check_email},
+    "appointments": {"date": check_date, "time": check_time, "reason": check_nonempty},
+    "prescriptions": {"details": check_nonempty, "date": check_date},
+}
+
+_FINISHERS = {
+    "patients": _finish_patient,
+    "appointments": _finish_appointment,
+    "prescriptions": _finish_prescription,
+}
+
+# ---------- Import / export ----------
+
+def import_csv(kind, path, rejects_path=None, batch_size=BATCH_SIZE):
+    """Imports a CSV file of patients, appointments or prescriptions.
+
+    Returns (imported, rejected) counts.  Rejected rows are written to
+    rejects_path (default "<path>.rejected.csv") with an "error" column.
+    """
+    store = get_store()
+    rejects_path = rejects_path or f"{path}.rejected.csv"
+    imported = 0
+    rejected = 0
+    with open(rejects_path, "w", encoding="utf-8", newline="") as reject_file:
+        writer = csv.writer(reject_file)
+        writer.writerow(("line",) + IMPORT_COLUMNS[kind] + ("error",))
+
+        def reject(line_no, row, error):
+            nonlocal rejected
+            rejected += 1
+            writer.writerow((line_no,) + tuple(row.get(col, "") for col in IMPORT_COLUMNS[kind])
+                            + (error,))
+
+        record_type = RECORD_TYPES[kind]
+        valid = validate_rows(kind, read_rows(path), store, reject)
+        for batch in batched(valid, batch_size):
+            ids = store.reserve_ids(kind, len(batch))
+            store.add_rows(kind, [record_type(rid, *fields) for rid, fields in zip(ids, batch)])
+            imported += len(batch)
+    return imported, rejected
+
+def export_csv(kind, path, chunk_size=BATCH_SIZE):
+    """Streams a record file out to CSV; returns the number of rows written."""
+    count = 0
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(EXPORT_COLUMNS[kind])
+        record_type = RECORD_TYPES[kind]
+        for chunk in batched(iter_records(TABLE_FILES[kind]), chunk_size):
+            writer.writerows(record_type.from_fields(parse_line(rec)).fields() for rec in chunk)
+            count += len(chunk)
+    return count
+
+def recall_rows(first_day, last_day, store=None):
+    """Yields a RECALL_COLUMNS row per prescription expiring in the window."""
+    store = store or get_store()
+    for prescription in store.expiring_prescriptions(first_day, last_day):
+        patient = store.get_patient(prescription.patient_id)
+        if patient is None:
+            continue
+        yield (prescription.prescription_id, prescription.expiry, patient.patient_id,
+               patient.first_name, patient.last_name, patient.phone, patient.email,
+               patient.address, prescription.details)
+
+def export_recalls(path, first_day, last_day, store=None):
+    """Writes the recall list for [first_day, last_day] to CSV; returns the row count."""
+    rows = list(recall_rows(first_day, last_day, store))
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(RECALL_COLUMNS)
+        writer.writerows(rows)
+    return len(rows)
+
+def _day_arg(text):
+    day = date_to_ordinal(text)
+    if day is None:
+        raise argparse.ArgumentTypeError("use DD/MM/YYYY")
+    return day
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk CSV import/export.")
+    actions = parser.add_subparsers(dest="action", required=True)
+    for action in ("import", "export"):
+        sub = actions.add_parser(action)
+        sub.add_argument("kind", choices=tuple(TABLE_FILES))
+        sub.add_argument("path")
+        sub.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+        if action == "import":
+            sub.add_argument("--rejects", help="where to write rejected rows")
+    recall = actions.add_parser("recall", help="prescriptions expiring in a date window")
+    recall.add_argument("path")
+    recall.add_argument("--from", dest="first_day", type=_day_arg, default=None,
+                        help="first expiry date (default today)")
+    recall.add_argument("--to", dest="last_day", type=_day_arg, default=None,
+                        help=f"last expiry date (default {RECALL_DAYS} days after --from)")
+    args = parser.parse_args(argv)
+    if args.action == "import":
+        try:
+            imported, rejected = import_csv(args.kind, args.path, args.rejects, args.batch_size)
+        finally:
+            close_store()
+        print(f"Imported {imported} {args.kind}; rejected {rejected}.")
+    elif args.action == "export":
+        count = export_csv(args.kind, args.path, args.batch_size)
+        print(f"Exported {count} {args.kind} to {args.path}.")
+    else:
+        first_day = args.first_day or today_ordinal()
+        last_day = args.last_day or first_day + RECALL_DAYS - 1
+        count = export_recalls(args.path, first_day, last_day)
+        print(f"Exported {count} recalls ({ordinal_to_date(first_day)} to "
+              f"{ordinal_to_date(last_day)}) to {args.path}.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,82 @@
+# change_feed.py
+"""Publish/subscribe feed of committed record changes.
+
+RecordStore publishes a Change for every insert, update and delete once
+it is on disk, including changes made by other processes, which are
+picked up by RecordStore.refresh().  A subscriber receives changes to
+the tables it asked for on its own queue and collects them with
+pending() on whatever thread suits it (the Tk thread for views), so
+publishing never calls into subscriber code.
+"""
+import queue
+import threading
+
+INSERT = "insert"
+UPDATE = "update"
+DELETE = "delete"
+
+class Change:
+    """IDs of one table's records that were inserted, updated or deleted."""
+
+    __slots__ = ("table", "kind", "record_ids")
+
+    def __init__(self, table, kind, record_ids):
+        self.table = table
+        self.kind = kind
+        self.record_ids = record_ids
+
+    def __repr__(self):
+        return f"Change({self.table!r}, {self.kind!r}, {self.record_ids!r})"
+
+class Subscription:
+    """Queued changes to some tables (all tables when tables is None)."""
+
+    def __init__(self, feed, tables):
+        self.feed = feed
+        self.tables = None if tables is None else frozenset(tables)
+        self.changes = queue.SimpleQueue()
+
+    def wants(self, table):
+        return self.tables is None or table in self.tables
+
+    def pending(self):
+        """Returns and clears the changes published since the last call."""
+        changes = []
+        while True:
+            try:
+                changes.append(self.changes.get_nowait())
+            except queue.Empty:
+                return changes
+
+    def close(self):
+        self.feed.unsubscribe(self)
+
+class ChangeFeed:
+    """Fans published changes out to the subscriptions that want them."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.subscriptions = []
+
+    def subscribe(self, tables=None):
+        """Returns a Subscription to changes of the given tables."""
+        subscription = Subscription(self, tables)
+        with self.lock:
+            self.subscriptions = self.subscriptions + [subscription]
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            self.subscriptions = [s for s in self.subscriptions if s is not subscription]
+
+    def watched(self, table):
+        """True if any subscriber wants changes to table."""
+        return any(s.wants(table) for s in self.subscriptions)
+
+    def publish(self, changes):
+        """Hands each Change to the subscribers of its table."""
+        subscriptions = self.subscriptions
+        for change in changes:
+            for subscription in subscriptions:
+                if subscription.wants(change.table):
+                    subscription.changes.put(change)
@@ -0,0 +1,141 @@
+# client.py
+"""Thin client for server.py with the same functions as services.py.
+
+    import client as services
+    services.configure("http://127.0.0.1:8765")
+
+Each thread keeps one keep-alive connection to the server.  The session
+returned by authenticate is sent with every later call.  Records are
+rebuilt from their fields, and server-side ServiceErrors are raised
+again here, so callers cannot tell the difference from local services.
+"""
+import csv
+import http.client
+import json
+import threading
+import time
+import urllib.parse
+
+from bulk_io import RECALL_COLUMNS
+from records import Patient, Appointment, Prescription, Admin
+from server import IDLE_TIMEOUT, READS, WRITES
+from services import ServiceError
+
+RECORD_TYPES = {cls.__name__: cls for cls in (Patient, Appointment, Prescription, Admin)}
+TIMEOUT = 30
+# Writes are never resent, because the server may have applied one before
+# the connection dropped, so they avoid connections idle long enough that
+# the server may be about to close them.
+WRITE_REUSE_SECONDS = IDLE_TIMEOUT / 2
+
+_config = {"host": None, "port": None, "token": None, "session": None}
+_local = threading.local()
+
+def configure(url, token=None):
+    """Points the client at a server URL such as http://127.0.0.1:8765."""
+    parts = urllib.parse.urlsplit(url)
+    _config.update(host=parts.hostname, port=parts.port or 80, token=token)
+
+def _decode(obj):
+    if "record" in obj and "fields" in obj:
+        return RECORD_TYPES[obj["record"]].from_fields(obj["fields"])
+    return obj
+
+def _connection():
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = http.client.HTTPConnection(_config["host"], _config["port"], timeout=TIMEOUT)
+        _local.conn = conn
+    _local.used = time.monotonic()
+    return conn
+
+def _drop_connection():
+    conn = getattr(_local, "conn", None)
+    if conn is not None:
+        conn.close()
+        _local.conn = None
+
+def call(name, *args):
+    """Calls services.<name>(*args) on the server and returns the result."""
+    body = json.dumps({"args": args})
+    headers = {"Content-Type": "application/json"}
+    if _config["token"]:
+        headers["X-Api-Token"] = _config["token"]
+    if _config["session"]:
+        headers["X-Session"] = _config["session"]
+    if name not in READS and time.monotonic() - getattr(_local, "used", 0.0) > WRITE_REUSE_SECONDS:
+        _drop_connection()
+    reused = getattr(_local, "conn", None) is not None
+    try:
+        conn = _connection()
+        conn.request("POST", f"/api/{name}", body, headers)
+        response = conn.getresponse()
+        data = response.read()
+    except (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError):
+        _drop_connection()
+        if name not in READS:
+            raise ServiceError("Lost connection to the server; the change may not have "
+                               "been saved.", "Server Error")
+        if not reused:
+            raise ServiceError("Lost connection to the server.", "Server Error")
+        # The server probably closed an idle keep-alive connection before
+        # reading the request; a read is safe to retry once on a fresh one.
+        return call(name, *args)
+    except OSError as e:
+        _drop_connection()
+        raise ServiceError(f"Cannot reach the server: {e}", "Server Error")
+    payload = json.loads(data, object_hook=_decode)
+    if "error" in payload:
+        raise ServiceError(payload["error"]["message"], payload["error"]["title"])
+    if "session" in payload:
+        _config["session"] = payload["session"]
+    return payload["result"]
+
+def _remote(name):
+    def remote(*args):
+        return call(name, *args)
+    remote.__name__ = name
+    return remote
+
+for _name in READS + WRITES:
+    globals()[_name] = _remote(_name)
+
+# ---------- Local variants ----------
+
+def next_free_slot(date="", time_str=""):
+    return tuple(call("next_free_slot", date, time_str))
+
+def day_schedule(day):
+    return [tuple(slot) for slot in call("day_schedule", day)]
+
+def day_schedules(days):
+    return [[tuple(slot) for slot in schedule] for schedule in call("day_schedules", list(days))]
+
+def sort_key(table, record_id, column):
+    key = call("sort_key", table, record_id, column)
+    return None if key is None else tuple(key)
+
+def close():
+    """The server keeps the store; only the connection is closed."""
+    _drop_connection()
+
+def subscribe(tables=None):
+    """The change feed does not cross the network; views refresh on demand."""
+    return None
+
+def refresh():
+    return []
+
+def inactive_patients(task=None):
+    """Progress and cancellation stay local; the scan itself runs on the server."""
+    patients = call("inactive_patients")
+    return None if task is not None and task.cancelled else patients
+
+def export_recalls(path, first_day, last_day):
+    """Writes the server's recall list to a CSV file on this machine."""
+    rows = call("recall_list", first_day, last_day)
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(RECALL_COLUMNS)
+        writer.writerows(rows)
+    return len(rows)
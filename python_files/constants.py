@@ -3,3 +3,70 @@ PATIENTS_FILE = "patients.txt"
 APPOINTMENTS_FILE = "appointments.txt"
 PRESCRIPTIONS_FILE = "prescriptions.txt"
 ADMIN_FILE = "admins.txt"
+
+# Opening hours used for appointment slots (matches validate_time).
+OPENING_TIME = "09:00"
+CLOSING_TIME = "19:00"
+SLOT_MINUTES = 30
+
+# Journaled writes: edits and deletes are appended to "<file>.journal" and
+# folded back into the base file once the journal grows past these limits.
+JOURNAL_MODE = True
+JOURNAL_COMPACT_MIN_BYTES = 64 * 1024
+JOURNAL_COMPACT_MAX_BYTES = 4 * 1024 * 1024
+JOURNAL_COMPACT_RATIO = 0.5
+
+# Storage backend: "text" (the .txt files above) or "sqlite".
+STORAGE_BACKEND = "text"
+SQLITE_DB_FILE = "optician.db"
+
+# Warm-start snapshot of the parsed and indexed store, reused while the
+# record files are unchanged.  Kept under this name in the user's local
+# cache folder (see snapshot.py).  None turns it off.
+SNAPSHOT_FILE = "store.snapshot"
+
+# Writes from several processes: a write whose files were changed by
+# another process is re-run on fresh data up to this many times.
+WRITE_RETRIES = 5
+
+# IDs are reserved in blocks of this size; the reservation is persisted to
+# "<file>.seq" so an ID is never handed out twice, even after a crash.
+ID_BLOCK_SIZE = 100
+
+# Logging: JSON lines, buffered, rotated once the file passes LOG_MAX_BYTES.
+# Errors are written out immediately; other entries every LOG_BUFFER lines.
+LOG_FILE = "app_log.jsonl"
+LOG_LEVEL = "INFO"
+LOG_MAX_BYTES = 1024 * 1024
+LOG_BACKUPS = 5
+LOG_BUFFER = 50
+# timed() blocks slower than this are logged as warnings.
+SLOW_MS = 500
+
+# Live views: open windows collect store changes every VIEW_POLL_MS and the
+# files are checked for other processes' writes every FILE_CHECK_MS.
+VIEW_POLL_MS = 250
+FILE_CHECK_MS = 2000
+
+# Business rules.
+PRESCRIPTION_VALID_DAYS = 365
+INACTIVE_AFTER_DAYS = 4 * 365
+
+# Shared server (server.py).  With SERVER_URL set, e.g. "http://127.0.0.1:8765",
+# the UI runs as a thin client of that server instead of opening the files.
+# When SERVER_TOKEN is set, clients must send it in an X-Api-Token header.
+# Server sessions (issued at login) lapse after SESSION_TIMEOUT idle seconds.
+SERVER_HOST = "127.0.0.1"
+SERVER_PORT = 8765
+SERVER_URL = None
+SERVER_TOKEN = None
+SESSION_TIMEOUT = 8 * 3600
+
+# Admin passwords: salted PBKDF2-SHA256.  Legacy unsalted SHA-256 hashes
+# are upgraded on the next successful login.  After LOGIN_MAX_FAILURES
+# failed attempts a username is locked for LOGIN_LOCKOUT_SECONDS.  Failures
+# are tracked for at most LOGIN_TRACKED_USERS usernames, oldest dropped first.
+PBKDF2_ITERATIONS = 600_000
+LOGIN_MAX_FAILURES = 5
+LOGIN_LOCKOUT_SECONDS = 30
+LOGIN_TRACKED_USERS = 10000
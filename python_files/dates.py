@@ -0,0 +1,36 @@
+# dates.py
+import datetime
+import functools
+import re
+
+# Dates are stored as DD/MM/YYYY text but compared as proleptic Gregorian
+# ordinals (datetime.date.toordinal), so comparisons and range scans are
+# plain integer operations.  Both conversions are cached.
+
+DATE_RE = re.compile(r"(\d{1,2})/(\d{1,2})/(\d{4})$", re.ASCII)
+
+@functools.lru_cache(maxsize=65536)
+def date_to_ordinal(date_text):
+    """Parses DD/MM/YYYY into a day ordinal, or None if it is invalid."""
+    match = DATE_RE.match(date_text)
+    if not match:
+        return None
+    day, month, year = (int(part) for part in match.groups())
+    try:
+        return datetime.date(year, month, day).toordinal()
+    except ValueError:
+        return None
+
+@functools.lru_cache(maxsize=65536)
+def ordinal_to_date(day):
+    """Formats a day ordinal as DD/MM/YYYY."""
+    dt = datetime.date.fromordinal(day)
+    return f"{dt.day:02d}/{dt.month:02d}/{dt.year:04d}"
+
+def parse_date(date_text):
+    """Parses DD/MM/YYYY into a datetime.date, or None if it is invalid."""
+    day = date_to_ordinal(date_text)
+    return None if day is None else datetime.date.fromordinal(day)
+
+def today_ordinal():
+    return datetime.date.today().toordinal()
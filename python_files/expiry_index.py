@@ -0,0 +1,44 @@
+# expiry_index.py
+import bisect
+
+class ExpiryIndex:
+    """Prescription IDs ordered by expiry day ordinal.
+
+    Entries are (expiry day, prescription ID) pairs in a sorted list, so a
+    date-window query is two bisections plus the k matches.  Additions
+    that arrive out of order (as during a load) are appended and the list
+    is re-sorted once before the next lookup.
+    """
+
+    def __init__(self):
+        self.entries = []
+        self.unsorted = False
+
+    def clear(self):
+        self.entries = []
+        self.unsorted = False
+
+    def add(self, day, presc_id):
+        entry = (day, presc_id)
+        if self.entries and entry < self.entries[-1]:
+            self.unsorted = True
+        self.entries.append(entry)
+
+    def remove(self, day, presc_id):
+        self._sort()
+        entry = (day, presc_id)
+        pos = bisect.bisect_left(self.entries, entry)
+        if pos < len(self.entries) and self.entries[pos] == entry:
+            del self.entries[pos]
+
+    def between(self, first_day, last_day):
+        """Returns the IDs expiring from first_day to last_day inclusive, by expiry."""
+        self._sort()
+        lo = bisect.bisect_left(self.entries, (first_day,))
+        hi = bisect.bisect_left(self.entries, (last_day + 1,))
+        return [presc_id for _, presc_id in self.entries[lo:hi]]
+
+    def _sort(self):
+        if self.unsorted:
+            self.entries.sort()
+            self.unsorted = False
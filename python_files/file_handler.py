@@ -1,31 +1,706 @@
 # file_handler.py
-from constants import PATIENTS_FILE, APPOINTMENTS_FILE, PRESCRIPTIONS_FILE, ADMIN_FILE
-from logger import log_error
+import functools
+import os
+import threading
+from contextlib import contextmanager
 
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks, versions still work
+    fcntl = None
+
+from constants import (PATIENTS_FILE, APPOINTMENTS_FILE, PRESCRIPTIONS_FILE, ADMIN_FILE,
+                       JOURNAL_COMPACT_MIN_BYTES, JOURNAL_COMPACT_MAX_BYTES,
+                       JOURNAL_COMPACT_RATIO, STORAGE_BACKEND, SQLITE_DB_FILE)
+from logger import log_error, timed
+from records import parse_line
+
+# Journal entries: "+<record>" is an upsert keyed by the record's first field,
+# "-<id>" is a tombstone.  Only newline-terminated entries count, so a torn
+# final line from a crash mid-append is ignored.
+UPSERT = "+"
+TOMBSTONE = "-"
+
+def journal_path(filename):
+    return filename + ".journal"
+
+# ---------- Locks and versions ----------
+
+LOCK_SUFFIX = ".lock"
+
+_local = threading.local()
+
+def _held():
+    """This thread's open lock files: path -> [file, exclusive, depth]."""
+    if not hasattr(_local, "held"):
+        _local.held = {}
+    return _local.held
+
+@contextmanager
+def locked(filenames, exclusive=False):
+    """Holds advisory locks on record files: shared for reads, exclusive for writes.
+
+    The lock lives in "<file>.lock", because the data files themselves
+    are replaced by rename.  Locks are taken in sorted order so writers
+    never deadlock, and nest within a thread (an exclusive lock covers
+    shared requests; upgrading a shared one is refused).  The outermost
+    lock first finishes any commit a crash left half done on the files.
+    """
+    filenames = sorted(set(filenames))
+    recovered = bool(_held())
+    while True:
+        with _locked(filenames, exclusive):
+            if recovered or not _interrupted(filenames):
+                yield
+                return
+        _recover(filenames)
+        recovered = True
+
+@contextmanager
+def _locked(filenames, exclusive=False):
+    held = _held()
+    acquired = []
+    try:
+        for filename in sorted(set(filenames)):
+            path = filename + LOCK_SUFFIX
+            entry = held.get(path)
+            if entry is None:
+                f = os.fdopen(os.open(path, os.O_RDWR | os.O_CREAT, 0o644), "r+b")
+                if fcntl:
+                    fcntl.flock(f, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+                entry = held[path] = [f, exclusive, 0]
+            elif exclusive and not entry[1]:
+                raise RuntimeError(f"Cannot upgrade a shared lock on {filename}")
+            entry[2] += 1
+            acquired.append(path)
+        yield
+    finally:
+        for path in reversed(acquired):
+            entry = held[path]
+            entry[2] -= 1
+            if entry[2] == 0:
+                del held[path]
+                entry[0].close()  # releases the flock
+
+def _version_file(filename):
+    f = _held()[filename + LOCK_SUFFIX][0]
+    f.seek(0)
+    return f
+
+def _counters(filename):
+    """The lock file's "<version> <generation>"; a bare version is generation 0."""
+    with locked([filename]):
+        fields = _version_file(filename).read().split()
+    counters = [int(field) if field.isdigit() else 0 for field in fields[:2]]
+    return tuple(counters + [0] * (2 - len(counters)))
+
+def _set_counters(filename, version, generation):
+    f = _version_file(filename)
+    f.truncate()
+    f.write(f"{version} {generation}".encode("ascii"))
+    f.flush()
+
+def file_version(filename):
+    """A record file's write counter, bumped by every write through this module."""
+    return _counters(filename)[0]
+
+def file_generation(filename):
+    """A record file's rewrite counter, bumped whenever the file is replaced."""
+    return _counters(filename)[1]
+
+def _bump(filename):
+    version, generation = _counters(filename)
+    _set_counters(filename, version + 1, generation)
+
+def _replaced(filename):
+    with locked([filename]):
+        version, generation = _counters(filename)
+        _set_counters(filename, version, generation + 1)
+
+def _files(target):
+    return [target] if isinstance(target, str) else list(target)
+
+def _reads(func):
+    """Runs func(filename, ...) under a shared lock on the file."""
+    @functools.wraps(func)
+    def wrapper(filename, *args, **kwargs):
+        with locked([filename]):
+            return func(filename, *args, **kwargs)
+    return wrapper
+
+def _writes(func):
+    """Runs func(filename or {filename: ...}, ...) under exclusive locks, then bumps versions."""
+    @functools.wraps(func)
+    def wrapper(target, *args, **kwargs):
+        filenames = _files(target)
+        with locked(filenames, exclusive=True):
+            result = func(target, *args, **kwargs)
+            for filename in filenames:
+                _bump(filename)
+        return result
+    return wrapper
+
+def commit_if_unchanged(versions, writes):
+    """Runs writes, [(func, args), ...], only if no file has moved past its version.
+
+    versions maps filename -> the version the caller's copy was read at.
+    The check and the writes happen under one set of exclusive locks.
+    Returns the files' new versions, or None, having written nothing,
+    when another process wrote one of them first.  Raises OSError when a
+    write reports failure (returns False), skipping the rest.
+    """
+    with locked(versions, exclusive=True):
+        if any(file_version(filename) != version for filename, version in versions.items()):
+            return None
+        for func, args in writes:
+            if func(*args) is False:
+                raise OSError(f"{func.__name__} failed; see the log")
+        return {filename: file_version(filename) for filename in versions}
+
+def record_id(record):
+    """Returns the ID (first field) of a raw record line."""
+    return record.split(",", 1)[0].strip()
+
+def _sqlite():
+    """Returns the SQLite backend module when it is the configured store."""
+    if STORAGE_BACKEND == "sqlite":
+        import sqlite_backend
+        return sqlite_backend
+    return None
+
+def file_stamp(filenames):
+    """(mtime, size) of every file the given record files are read from.
+
+    Any write, journal append or compaction changes the stamp, so it
+    tells cached copies of the records whether they are still current.
+    """
+    if _sqlite():
+        paths = (SQLITE_DB_FILE, SQLITE_DB_FILE + "-wal")
+    else:
+        paths = [path for filename in filenames for path in (filename, journal_path(filename))]
+    stamp = []
+    for path in paths:
+        try:
+            st = os.stat(path)
+            stamp.append((st.st_mtime_ns, st.st_size))
+        except FileNotFoundError:
+            stamp.append(None)
+    return tuple(stamp)
+
+@timed("file.read_records")
+@_reads
 def read_records(filename):
-    """Reads all non-empty lines from a file."""
+    """Reads all records from the configured storage backend."""
+    db = _sqlite()
+    if db:
+        return db.read_records(filename)
+    return read_text_records(filename)
+
+@timed("file.load_records")
+@_reads
+def load_records(filename, record_type):
+    """Reads a file's records parsed into record_type objects."""
+    db = _sqlite()
+    if db:
+        return [record_type.from_fields(row) for row in db.read_rows(filename)]
+    return [record_type.from_fields(parse_line(rec)) for rec in read_text_records(filename)]
+
+@_reads
+def load_record(filename, record_type, rid):
+    """Reads one record by ID, or None; an indexed query with SQLite.
+
+    The text backend scans the file; record_reader.RecordReader is the
+    fast path there.
+    """
+    db = _sqlite()
+    if db:
+        row = db.read_row(filename, rid)
+        return None if row is None else record_type.from_fields(row)
+    rid = str(rid).strip()
+    for rec in read_text_records(filename):
+        if record_id(rec) == rid:
+            return record_type.from_fields(parse_line(rec))
+    return None
+
+@_reads
+def read_text_records(filename):
+    """Reads all non-empty lines from a file, replaying its journal if any."""
     try:
         with open(filename, "r", encoding="utf-8") as f:
-            return [line.strip() for line in f if line.strip()]
+            records = [line.strip() for line in f if line.strip()]
     except FileNotFoundError:
-        return []
+        records = []
     except Exception as e:
         log_error(f"Error reading {filename}: {e}")
         return []
+    entries = _read_journal(filename)
+    if entries:
+        records = _replay(records, entries)
+    return records
 
+@timed("file.write_records")
+@_writes
 def write_records(filename, records):
-    """Overwrites the file with the given records."""
+    """Overwrites the file with the given records; returns False on failure.
+
+    The new contents go to a temp file that replaces the original in one
+    rename, so a crash leaves either the old or the new file, never a
+    truncated one.  Any journal is discarded as part of the same commit.
+    """
+    db = _sqlite()
+    if db:
+        return db.write_records(filename, records)
     try:
-        with open(filename, "w", encoding="utf-8") as f:
-            for record in records:
-                f.write(record.strip() + "\n")
+        _commit_snapshot(filename, records)
     except Exception as e:
         log_error(f"Error writing to {filename}: {e}")
+        return False
 
 def append_record(filename, record):
     """Appends a single record to the given file."""
+    return append_records(filename, [record])
+
+@timed("file.append_records")
+@_writes
+def append_records(filename, records):
+    """Appends a batch of records to the given file in one write; False on failure."""
+    db = _sqlite()
+    if db:
+        return db.append_records(filename, records)
+    if os.path.exists(journal_path(filename)):
+        # Keep ordering relative to pending journal entries.
+        return upsert_records(filename, records)
     try:
         with open(filename, "a", encoding="utf-8") as f:
-            f.write(record.strip() + "\n")
+            f.write("".join(record.strip() + "\n" for record in records))
     except Exception as e:
         log_error(f"Error appending to {filename}: {e}")
+        return False
+
+def iter_records(filename):
+    """Yields records one at a time without loading the whole file.
+
+    Falls back to read_records() when a journal has to be replayed or
+    the SQLite backend is in use.
+    """
+    if _sqlite() or os.path.exists(journal_path(filename)):
+        yield from read_records(filename)
+        return
+    try:
+        with locked([filename]):
+            with open(filename, "r", encoding="utf-8") as f:
+                for line in f:
+                    line = line.strip()
+                    if line:
+                        yield line
+    except FileNotFoundError:
+        return
+    except Exception as e:
+        log_error(f"Error reading {filename}: {e}")
+
+# ---------- Journal ----------
+
+@timed("file.upsert_records")
+@_writes
+def upsert_records(filename, records):
+    """Journals inserts/replacements of the given records (keyed by ID); False on failure."""
+    db = _sqlite()
+    if db:
+        return db.upsert_records(filename, records)
+    return _append_journal(filename, [UPSERT + record.strip() for record in records])
+
+@timed("file.delete_records")
+@_writes
+def delete_records(filename, record_ids):
+    """Journals tombstones for the given record IDs; False on failure."""
+    db = _sqlite()
+    if db:
+        return db.delete_records(filename, record_ids)
+    return _append_journal(filename, [TOMBSTONE + str(rid).strip() for rid in record_ids])
+
+@timed("file.delete_records_atomic")
+@_writes
+def delete_records_atomic(deletions):
+    """Journals tombstones in several files as one all-or-nothing commit.
+
+    deletions maps filename -> record IDs.  The entries for every file are
+    staged first, then committed with a transaction marker exactly like
+    write_records_atomic(), so a crash never leaves some files with their
+    tombstones and others without.
+    """
+    if not deletions:
+        return True
+    db = _sqlite()
+    if db:
+        return db.delete_records_atomic(deletions)
+    try:
+        for filename, record_ids in deletions.items():
+            with open(_staged_path(filename), "w", encoding="utf-8") as f:
+                f.write("".join(TOMBSTONE + str(rid).strip() + "\n" for rid in record_ids))
+                f.flush()
+                os.fsync(f.fileno())
+        _commit_marker(deletions)
+    except Exception as e:
+        log_error(f"Error committing {', '.join(deletions)}: {e}")
+        return False
+    for filename in deletions:
+        if needs_compaction(filename):
+            compact(filename)
+    return True
+
+def needs_compaction(filename):
+    """True once the journal passes the size or journal/base ratio limit."""
+    try:
+        journal_size = os.path.getsize(journal_path(filename))
+    except OSError:
+        return False
+    if journal_size < JOURNAL_COMPACT_MIN_BYTES:
+        return False
+    try:
+        base_size = os.path.getsize(filename)
+    except OSError:
+        base_size = 0
+    return (journal_size >= JOURNAL_COMPACT_MAX_BYTES or
+            journal_size >= base_size * JOURNAL_COMPACT_RATIO)
+
+@timed("file.compact")
+@_writes
+def compact(filename):
+    """Folds the journal back into the base file."""
+    if not os.path.exists(journal_path(filename)):
+        return
+    write_records(filename, read_records(filename))
+
+def _append_journal(filename, entries):
+    if not entries:
+        return
+    path = journal_path(filename)
+    try:
+        _repair_journal(path)
+        with open(path, "a", encoding="utf-8") as f:
+            f.write("".join(entry + "\n" for entry in entries))
+            f.flush()
+            os.fsync(f.fileno())
+    except Exception as e:
+        log_error(f"Error appending to journal {path}: {e}")
+        return False
+    if needs_compaction(filename):
+        compact(filename)
+
+def _read_journal(filename):
+    try:
+        with open(journal_path(filename), "r", encoding="utf-8") as f:
+            data = f.read()
+    except FileNotFoundError:
+        return []
+    except Exception as e:
+        log_error(f"Error reading journal for {filename}: {e}")
+        return []
+    # Drop the last piece: empty after a final newline, or a torn entry.
+    return [line for line in data.split("\n")[:-1] if len(line) > 1]
+
+def _replay(records, entries):
+    rows = {}
+    for rec in records:
+        rows[record_id(rec)] = rec
+    for entry in entries:
+        op, payload = entry[0], entry[1:].strip()
+        if op == UPSERT:
+            rows[record_id(payload)] = payload
+        elif op == TOMBSTONE:
+            rows.pop(payload, None)
+    return list(rows.values())
+
+# ---------- Tailing ----------
+
+def file_position(filename):
+    """How much of a record file has been read once all of it was read.
+
+    Pass it to read_changes() to get only what was written after.  None
+    for a missing file.  With SQLite it is the seq of the last logged change.
+    """
+    db = _sqlite()
+    if db:
+        return db.position()
+    with locked([filename]):
+        try:
+            st = os.stat(filename)
+        except FileNotFoundError:
+            return None
+        try:
+            journal_size = os.path.getsize(journal_path(filename))
+        except FileNotFoundError:
+            journal_size = 0
+        return file_generation(filename), st.st_size, journal_size
+
+@_reads
+def read_changes(filename, position):
+    """Returns (entries, position) for what was written since position.
+
+    Lines appended to the base file come back as upserts, followed by the
+    new journal entries.  Returns None when everything has to be read
+    again instead: without a position, or after the base file was
+    replaced by a rewrite or a journal compaction (which bumps its
+    generation; inode numbers get reused, so they cannot tell).  With
+    SQLite the entries come from the table's change log.
+    """
+    if position is None:
+        return None
+    db = _sqlite()
+    if db:
+        return db.read_changes(filename, position)
+    generation, base_read, journal_read = position
+    try:
+        if file_generation(filename) != generation:
+            return None
+        base = _tail(filename, base_read)
+        journal = _tail(journal_path(filename), journal_read)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        log_error(f"Error reading changes to {filename}: {e}")
+        return None
+    if base is None or journal is None:
+        return None
+    entries = [UPSERT + line.strip() for line in base[0] if line.strip()]
+    entries.extend(entry for entry in journal[0] if len(entry) > 1)
+    return entries, (generation, base_read + base[1], journal_read + journal[1])
+
+def _tail(path, start):
+    """Complete lines of path from byte start on, and the bytes they span.
+
+    None if the file is now shorter than start or start is not at a line
+    boundary, either way it is not the file that was read up to start.
+    """
+    try:
+        with open(path, "rb") as f:
+            f.seek(0, os.SEEK_END)
+            if f.tell() < start:
+                return None
+            if start:
+                f.seek(start - 1)
+                if f.read(1) != b"\n":
+                    return None
+            f.seek(start)
+            data = f.read()
+    except FileNotFoundError:
+        return ([], 0) if start == 0 else None
+    complete = data.rfind(b"\n") + 1
+    return data[:complete].decode("utf-8").splitlines(), complete
+
+def _repair_journal(path):
+    """Truncates a torn final entry left behind by a crash mid-append."""
+    try:
+        with open(path, "rb+") as f:
+            f.seek(0, os.SEEK_END)
+            if f.tell() == 0:
+                return
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) == b"\n":
+                return
+            f.seek(0)
+            data = f.read()
+            f.truncate(data.rfind(b"\n") + 1)
+    except FileNotFoundError:
+        pass
+
+# ---------- Atomic snapshots ----------
+
+TRANSACTION_FILE = ".transaction"
+
+@timed("file.write_records_atomic")
+@_writes
+def write_records_atomic(snapshots):
+    """Overwrites several files as one all-or-nothing commit.
+
+    snapshots maps filename -> records.  Every temp file is written first,
+    then a transaction marker listing them; once the marker is on disk the
+    commit is rolled forward by the next lock on the files even after a
+    crash, otherwise the temp files are discarded and all originals stay
+    untouched.
+    """
+    if not snapshots:
+        return True
+    db = _sqlite()
+    if db:
+        return db.write_records_atomic(snapshots)
+    try:
+        for filename, records in snapshots.items():
+            _write_temp(filename, records)
+        _commit_marker(snapshots)
+        return True
+    except Exception as e:
+        log_error(f"Error committing {', '.join(snapshots)}: {e}")
+        return False
+
+def _commit_snapshot(filename, records):
+    """Atomically replaces filename with records and retires its journal.
+
+    The journal is renamed to "<journal>.old" only after the temp file is
+    fully on disk; that rename is the commit point.  _recover() rolls an
+    interrupted commit forward, so the old journal is never replayed over
+    the new snapshot.
+    """
+    _write_temp(filename, records)
+    _install(filename)
+
+def _write_temp(filename, records):
+    with open(filename + ".tmp", "w", encoding="utf-8") as f:
+        for record in records:
+            f.write(record.strip() + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+def _install(filename):
+    tmp = filename + ".tmp"
+    journal = journal_path(filename)
+    if os.path.exists(journal):
+        os.replace(journal, journal + ".old")
+    os.replace(tmp, filename)
+    _replaced(filename)
+    _remove(journal + ".old")
+
+def _staged_path(filename):
+    """Journal entries waiting for a multi-file commit."""
+    return journal_path(filename) + ".staged"
+
+def _commit_marker(filenames):
+    """Writes a transaction marker (the commit point) and rolls it forward.
+
+    Each commit gets its own marker, written under a temp name and renamed
+    into place, so nobody ever reads half of one.  The temp name belongs
+    to the first file, whose exclusive lock the caller holds.
+    """
+    filenames = sorted(filenames)
+    tmp = _marker_temp(filenames[0])
+    marker = _transaction_path(filenames[0]) + "." + os.urandom(8).hex()
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write("".join(os.path.abspath(name) + "\n" for name in filenames))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, marker)
+    _roll_forward(marker, filenames)
+
+def _transaction_path(filename):
+    return os.path.join(os.path.dirname(os.path.abspath(filename)), TRANSACTION_FILE)
+
+def _marker_temp(filename):
+    return filename + TRANSACTION_FILE + ".tmp"
+
+def _marker_files(marker):
+    try:
+        with open(marker, "r", encoding="utf-8") as f:
+            return [line.strip() for line in f if line.strip()]
+    except FileNotFoundError:
+        return []
+
+def _markers(filenames):
+    """(marker, listed files) for every committed marker naming one of filenames."""
+    wanted = {os.path.abspath(name) for name in filenames}
+    found = []
+    for directory in {os.path.dirname(path) for path in wanted}:
+        try:
+            names = os.listdir(directory)
+        except FileNotFoundError:
+            continue
+        for name in names:
+            if name == TRANSACTION_FILE or name.startswith(TRANSACTION_FILE + "."):
+                marker = os.path.join(directory, name)
+                listed = _marker_files(marker)
+                if wanted.intersection(listed):
+                    found.append((marker, listed))
+    return found
+
+def _roll_forward(marker, filenames):
+    for filename in filenames:
+        if os.path.exists(filename + ".tmp"):
+            _install(filename)
+        _remove(journal_path(filename) + ".old")
+        if os.path.exists(_staged_path(filename)):
+            _append_staged(filename)
+    _remove(marker)
+
+def _append_staged(filename):
+    # Replaying a tombstone twice is harmless, so a roll-forward that was
+    # itself interrupted can simply append the staged entries again.
+    staged = _staged_path(filename)
+    with open(staged, "r", encoding="utf-8") as f:
+        data = f.read()
+    path = journal_path(filename)
+    _repair_journal(path)
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    _remove(staged)
+
+def _leftovers(filename):
+    """Files that only exist while a commit to filename is under way."""
+    journal = journal_path(filename)
+    return (filename + ".tmp", journal + ".old", _staged_path(filename), _marker_temp(filename))
+
+def _interrupted(filenames):
+    """True if a crash left a commit to any of filenames unfinished.
+
+    Only meaningful under a lock on the files: a live commit holds them
+    exclusively until it is done.
+    """
+    paths = [os.path.abspath(name) for name in filenames]
+    for directory in {os.path.dirname(path) for path in paths}:
+        try:
+            names = set(os.listdir(directory))
+        except FileNotFoundError:
+            continue
+        for path in paths:
+            if os.path.dirname(path) != directory:
+                continue
+            if names.intersection(os.path.basename(leftover) for leftover in _leftovers(path)):
+                return True
+        if any(name == TRANSACTION_FILE or name.startswith(TRANSACTION_FILE + ".")
+               for name in names) and _markers(filenames):
+            return True
+    return False
+
+def _recover(filenames):
+    """Finishes or discards commits a crash left unfinished on filenames.
+
+    A marker is rolled forward under exclusive locks on every file it
+    lists; what is left over without one never reached its commit point.
+    Called without any locks held, so taking them cannot deadlock.
+    """
+    try:
+        for marker, listed in _markers(filenames):
+            with _locked(listed, exclusive=True):
+                if os.path.exists(marker):
+                    _roll_forward(marker, listed)
+                    for filename in listed:
+                        _bump(filename)
+        for filename in filenames:
+            if not any(os.path.exists(path) for path in _leftovers(filename)):
+                continue
+            with _locked([filename], exclusive=True):
+                if not _markers([filename]):
+                    _discard(filename)
+                    _bump(filename)
+    except Exception as e:
+        log_error(f"Error recovering {', '.join(filenames)}: {e}")
+
+def _discard(filename):
+    tmp = filename + ".tmp"
+    old_journal = journal_path(filename) + ".old"
+    if os.path.exists(old_journal):
+        if os.path.exists(tmp):
+            os.replace(tmp, filename)
+            _replaced(filename)
+        _remove(old_journal)
+    elif os.path.exists(tmp):
+        _remove(tmp)
+    # Staged entries without a marker belong to a commit that never happened.
+    _remove(_staged_path(filename))
+    _remove(_marker_temp(filename))
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
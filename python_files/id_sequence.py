@@ -0,0 +1,100 @@
+# id_sequence.py
+import os
+import threading
+
+from constants import ID_BLOCK_SIZE
+from file_handler import locked
+from logger import log_error
+
+class IdSequence:
+    """Monotonic ID allocator for one record file.
+
+    Starts above both the largest ID already in the file and the
+    high-water mark persisted in "<file>.seq".  IDs come out of blocks
+    whose end is written to disk before the first ID of the block is
+    used, so a crash can only skip IDs, never reuse one.  Blocks are
+    claimed under an exclusive lock on the ".seq" file, starting past
+    any block another process has claimed, so processes sharing the
+    files never hand out the same ID.  release() gives the unused rest of
+    a block back on a clean exit, so a session does not leave a gap.
+    """
+
+    def __init__(self, filename, existing_ids=(), block_size=ID_BLOCK_SIZE):
+        self.path = filename + ".seq"
+        self.block_size = block_size
+        self.lock = threading.Lock()
+        start = self._read_high_water()
+        for record_id in existing_ids:
+            if record_id.isdigit() and int(record_id) > start:
+                start = int(record_id)
+        self.next_value = start + 1
+        self.reserved_to = start
+
+    def next(self):
+        """Returns the next unused ID as a string."""
+        return str(self.reserve(1)[0])
+
+    def reserve(self, count):
+        """Reserves count consecutive IDs for a batch insert; returns a range."""
+        with self.lock:
+            first = self.next_value
+            end = first + count
+            if end - 1 > self.reserved_to:
+                with locked([self.path], exclusive=True):
+                    high = self._read_high_water()
+                    if high > self.reserved_to:
+                        # Another process has claimed the IDs after ours.
+                        first = max(first, high + 1)
+                        end = first + count
+                    self._write_high_water(end - 1 + self.block_size)
+            self.next_value = end
+            return range(first, end)
+
+    def observe(self, record_id):
+        """Moves the sequence past an ID that was assigned elsewhere (e.g. an import)."""
+        if not str(record_id).isdigit():
+            return
+        with self.lock:
+            value = int(record_id)
+            if value >= self.next_value:
+                self.next_value = value + 1
+                if value > self.reserved_to:
+                    with locked([self.path], exclusive=True):
+                        value = max(value, self._read_high_water())
+                        self.next_value = value + 1
+                        self._write_high_water(value + self.block_size)
+
+    def release(self):
+        """Lowers the high-water mark to the last ID handed out, if the block is still ours."""
+        with self.lock:
+            if self.next_value > self.reserved_to:
+                return
+            with locked([self.path], exclusive=True):
+                # A higher mark means another process claimed a block after ours.
+                if self._read_high_water() == self.reserved_to:
+                    self._write_high_water(self.next_value - 1)
+
+    def _read_high_water(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return int(f.read().strip() or 0)
+        except FileNotFoundError:
+            return 0
+        except Exception as e:
+            log_error(f"Error reading {self.path}: {e}")
+            return 0
+
+    def _write_high_water(self, value):
+        tmp = self.path + ".tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write(f"{value}\n")
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.path)
+            self.reserved_to = value
+        except Exception as e:
+            # Keep allocating in memory; the file scan on the next start
+            # still prevents reuse of anything written to the data file.
+            log_error(f"Error writing {self.path}: {e}")
+            self.reserved_to = value
@@ -1,7 +1,178 @@
 # logger.py
+import atexit
+import bisect
 import datetime
+import functools
+import json
+import logging
+import logging.handlers
+import threading
+import time
 
-def log_error(message):
-    """Logs error messages with timestamps to a log file."""
-    with open("error_log.txt", "a", encoding="utf-8") as f:
-        f.write(f"{datetime.datetime.now()} - ERROR: {message}\n")
+from constants import LOG_FILE, LOG_LEVEL, LOG_MAX_BYTES, LOG_BACKUPS, LOG_BUFFER, SLOW_MS
+
+# ---------- Structured log ----------
+# Every entry is one JSON object per line: time, level, message and any
+# extra keyword fields.  Entries are buffered in memory and written in
+# batches; ERROR entries flush the buffer straight away.
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "time": datetime.datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "message": record.getMessage(),
+        }
+        entry.update(getattr(record, "fields", {}))
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+_logger = None
+_logger_lock = threading.Lock()
+
+def get_logger():
+    """Returns the application logger, creating its handlers on first use."""
+    global _logger
+    if _logger is None:
+        with _logger_lock:
+            if _logger is None:
+                rotating = logging.handlers.RotatingFileHandler(
+                    LOG_FILE, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUPS,
+                    encoding="utf-8", delay=True)
+                rotating.setFormatter(JsonFormatter())
+                buffered = logging.handlers.MemoryHandler(
+                    LOG_BUFFER, flushLevel=logging.ERROR, target=rotating)
+                logger = logging.getLogger("optician")
+                logger.setLevel(LOG_LEVEL)
+                logger.propagate = False
+                logger.addHandler(buffered)
+                atexit.register(shutdown)
+                _logger = logger
+    return _logger
+
+def log(level, message, **fields):
+    """Logs message at level (a logging constant) with extra JSON fields."""
+    logger = get_logger()
+    if logger.isEnabledFor(level):
+        logger.log(level, message, extra={"fields": fields})
+
+def log_debug(message, **fields):
+    log(logging.DEBUG, message, **fields)
+
+def log_info(message, **fields):
+    log(logging.INFO, message, **fields)
+
+def log_warning(message, **fields):
+    log(logging.WARNING, message, **fields)
+
+def log_error(message, **fields):
+    """Logs error messages with timestamps to the log file."""
+    log(logging.ERROR, message, **fields)
+
+def flush():
+    """Writes out any buffered entries."""
+    if _logger is not None:
+        for handler in _logger.handlers:
+            handler.flush()
+
+def shutdown():
+    """Logs the latency summary and flushes the log (runs at exit)."""
+    for name, stats in latency_stats().items():
+        log_info("latency", name=name, **stats)
+    flush()
+
+# ---------- Latency histograms ----------
+
+# Upper bounds (ms) of the histogram buckets; a last bucket takes the rest.
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+BUCKET_LABELS = ([f"<={bound}ms" for bound in LATENCY_BUCKETS_MS]
+                 + [f">{LATENCY_BUCKETS_MS[-1]}ms"])
+
+class Histogram:
+    """Counts of durations per LATENCY_BUCKETS_MS bucket, plus total and max."""
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def add(self, ms):
+        self.counts[bisect.bisect_left(LATENCY_BUCKETS_MS, ms)] += 1
+        self.count += 1
+        self.total_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+
+    def percentile(self, fraction):
+        """Upper bound of the bucket holding the given fraction of samples."""
+        target = fraction * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= target:
+                return LATENCY_BUCKETS_MS[i] if i < len(LATENCY_BUCKETS_MS) else self.max_ms
+        return self.max_ms
+
+    def stats(self):
+        return {
+            "count": self.count,
+            "mean_ms": round(self.total_ms / self.count, 3) if self.count else 0.0,
+            "p50_ms": self.percentile(0.5),
+            "p95_ms": self.percentile(0.95),
+            "max_ms": round(self.max_ms, 3),
+            "buckets": {label: n for label, n in zip(BUCKET_LABELS, self.counts) if n},
+        }
+
+_histograms = {}
+_histograms_lock = threading.Lock()
+
+def record_latency(name, ms):
+    with _histograms_lock:
+        histogram = _histograms.get(name)
+        if histogram is None:
+            histogram = _histograms[name] = Histogram()
+        histogram.add(ms)
+
+def latency_stats():
+    """Returns {name: stats} for every timed() block seen so far."""
+    with _histograms_lock:
+        return {name: histogram.stats() for name, histogram in sorted(_histograms.items())}
+
+class timed:
+    """Times a block or function into the latency histogram called name.
+
+        with timed("ui.search_patient"):
+            ...
+
+        @timed("file.read_records")
+        def read_records(filename): ...
+
+    Each timing is logged at DEBUG, or as a warning above SLOW_MS.
+    """
+
+    def __init__(self, name, slow_ms=SLOW_MS):
+        self.name = name
+        self.slow_ms = slow_ms
+        self.start = None
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        ms = (time.perf_counter() - self.start) * 1000
+        record_latency(self.name, ms)
+        if ms > self.slow_ms:
+            log_warning("slow operation", name=self.name, ms=round(ms, 3))
+        else:
+            log_debug("timed", name=self.name, ms=round(ms, 3))
+        return False
+
+    def __call__(self, func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            # A fresh instance per call keeps concurrent calls apart.
+            with timed(self.name, self.slow_ms):
+                return func(*args, **kwargs)
+        return wrapper
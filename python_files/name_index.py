@@ -0,0 +1,61 @@
+# name_index.py
+
+def _trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+class NameIndex:
+    """Trigram index over patient names for substring search.
+
+    A query matches a patient when it is a substring of the first name,
+    the last name, or "first last".  The combined form covers the other
+    two, so only that string is indexed.  Queries of three or more
+    characters intersect trigram posting sets and verify the few
+    candidates left.  Shorter queries check the cached lowercase names.
+    """
+
+    def __init__(self):
+        self.names = {}
+        self.postings = {}
+
+    def clear(self):
+        self.names = {}
+        self.postings = {}
+
+    def add(self, pid, first, last):
+        """Indexes (or re-indexes) a patient's name."""
+        if pid in self.names:
+            self.remove(pid)
+        name = f"{first.strip()} {last.strip()}".lower()
+        self.names[pid] = name
+        for gram in _trigrams(name):
+            self.postings.setdefault(gram, set()).add(pid)
+
+    def remove(self, pid):
+        name = self.names.pop(pid, None)
+        if name is None:
+            return
+        for gram in _trigrams(name):
+            ids = self.postings.get(gram)
+            if ids is not None:
+                ids.discard(pid)
+                if not ids:
+                    del self.postings[gram]
+
+    def search(self, query):
+        """Returns the set of patient IDs whose name contains query."""
+        query = query.strip().lower()
+        if len(query) < 3:
+            return {pid for pid, name in self.names.items() if query in name}
+        postings = []
+        for gram in _trigrams(query):
+            ids = self.postings.get(gram)
+            if not ids:
+                return set()
+            postings.append(ids)
+        postings.sort(key=len)
+        candidates = postings[0]
+        for ids in postings[1:]:
+            candidates = candidates & ids
+            if not candidates:
+                return set()
+        return {pid for pid in candidates if query in self.names[pid]}
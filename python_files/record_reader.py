@@ -0,0 +1,172 @@
+# record_reader.py
+"""Point lookups by ID in a record file without loading the whole file.
+
+The base file is memory-mapped and indexed by a compact table of
+(ID, byte offset) pairs held in two arrays, sorted by ID, so a lookup is
+a binary search plus one line parsed straight out of the mapping.
+Resident memory is 16 bytes per row rather than a parsed copy of every
+line.  When the file has only grown since it was indexed (appends),
+just the new lines are indexed; when it was replaced (a rewrite or a
+journal compaction) the index is rebuilt.  Journal entries, which stay
+small, are tailed incrementally into an overlay.  Text backend only.
+"""
+import bisect
+import mmap
+import os
+import re
+import threading
+from array import array
+
+from file_handler import file_generation, journal_path, locked, record_id, UPSERT, TOMBSTONE
+from records import parse_line
+
+# One complete (newline-terminated) line, capturing the ID field.
+LINE = re.compile(rb"([^,\n]*)[^\n]*\n")
+
+class RecordReader:
+    """Reads single records of one file by ID through a byte-offset index."""
+
+    def __init__(self, filename, record_type):
+        self.filename = filename
+        self.record_type = record_type
+        self.lock = threading.Lock()
+        self.map = None
+        self.identity = None
+        self.indexed_to = 0
+        self.ids = array("q")
+        self.offsets = array("q")
+        self.other_ids = {}
+        self.unsorted = False
+        self.journal_read_to = 0
+        self.overlay = {}
+
+    def get(self, rid):
+        """Returns the record with this ID, or None."""
+        rid = str(rid).strip()
+        with self.lock:
+            self.refresh()
+            if rid in self.overlay:
+                line = self.overlay[rid]
+            else:
+                offset = self._offset(rid)
+                line = None if offset is None else self._line(offset)
+        if line is None:
+            return None
+        return self.record_type.from_fields(parse_line(line))
+
+    def refresh(self):
+        """Brings the index up to date with the files."""
+        with locked([self.filename]):
+            self._refresh_base()
+            self._refresh_journal()
+
+    def close(self):
+        """Unmaps the file; a later get() maps and indexes it again."""
+        with self.lock:
+            self._reset(None)
+
+    def _unmap(self):
+        if self.map is not None:
+            self.map.close()
+            self.map = None
+
+    # ---------- Base file ----------
+
+    def _refresh_base(self):
+        try:
+            st = os.stat(self.filename)
+        except FileNotFoundError:
+            self._reset(None)
+            return
+        identity = (st.st_dev, st.st_ino, file_generation(self.filename))
+        if identity != self.identity or st.st_size < self.indexed_to:
+            # Replaced by rename: everything has to be indexed again.
+            self._reset(identity)
+        if st.st_size == self.indexed_to:
+            return
+        self._unmap()
+        with open(self.filename, "rb") as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._index_from(self.indexed_to)
+
+    def _reset(self, identity):
+        self._unmap()
+        self.identity = identity
+        self.indexed_to = 0
+        self.ids = array("q")
+        self.offsets = array("q")
+        self.other_ids = {}
+        self.unsorted = False
+        # A new base file has absorbed the journal it replaced.
+        self.journal_read_to = 0
+        self.overlay = {}
+
+    def _index_from(self, start):
+        ids, offsets, other_ids = self.ids, self.offsets, self.other_ids
+        last = ids[-1] if ids else -1
+        end = start
+        for match in LINE.finditer(self.map, start):
+            end = match.end()
+            key = match.group(1).strip()
+            if not key:
+                continue
+            if key.isdigit():
+                value = int(key)
+                if value < last:
+                    self.unsorted = True
+                last = value
+                ids.append(value)
+                offsets.append(match.start())
+            else:
+                other_ids[key.decode("utf-8")] = match.start()
+        # A torn final line is left for the next refresh.
+        self.indexed_to = end
+
+    def _offset(self, rid):
+        if not rid.isdigit():
+            return self.other_ids.get(rid)
+        if self.unsorted:
+            self._sort()
+        value = int(rid)
+        # Rightmost match: a later row with the same ID replaces an earlier one.
+        i = bisect.bisect_right(self.ids, value) - 1
+        if i >= 0 and self.ids[i] == value:
+            return self.offsets[i]
+        return None
+
+    def _sort(self):
+        order = sorted(range(len(self.ids)), key=self.ids.__getitem__)
+        self.ids = array("q", (self.ids[i] for i in order))
+        self.offsets = array("q", (self.offsets[i] for i in order))
+        self.unsorted = False
+
+    def _line(self, offset):
+        end = self.map.find(b"\n", offset)
+        return self.map[offset:end].decode("utf-8").strip()
+
+    # ---------- Journal ----------
+
+    def _refresh_journal(self):
+        path = journal_path(self.filename)
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            return
+        if size < self.journal_read_to:
+            self.journal_read_to = 0
+            self.overlay = {}
+        if size == self.journal_read_to:
+            return
+        with open(path, "rb") as f:
+            f.seek(self.journal_read_to)
+            data = f.read(size - self.journal_read_to)
+        complete = data.rfind(b"\n") + 1
+        self.journal_read_to += complete
+        for entry in data[:complete].decode("utf-8").split("\n"):
+            if len(entry) < 2:
+                continue
+            op, payload = entry[0], entry[1:].strip()
+            if op == UPSERT:
+                self.overlay[record_id(payload)] = payload
+            elif op == TOMBSTONE:
+                self.overlay[payload] = None
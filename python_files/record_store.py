@@ -0,0 +1,811 @@
+# record_store.py
+import functools
+import threading
+
+from change_feed import ChangeFeed, Change, INSERT, UPDATE, DELETE
+from constants import (PATIENTS_FILE, APPOINTMENTS_FILE, PRESCRIPTIONS_FILE,
+                       OPENING_TIME, CLOSING_TIME, JOURNAL_MODE, JOURNAL_COMPACT_RATIO,
+                       STORAGE_BACKEND, WRITE_RETRIES)
+from dates import date_to_ordinal, ordinal_to_date, today_ordinal
+from expiry_index import ExpiryIndex
+from file_handler import (commit_if_unchanged, file_position, file_stamp, file_version, locked,
+                          load_record, load_records, read_changes, write_records, write_records_atomic,
+                          append_record, append_records, upsert_records, delete_records,
+                          delete_records_atomic, UPSERT, TOMBSTONE)
+from id_sequence import IdSequence
+from logger import log_warning
+from name_index import NameIndex
+from record_reader import RecordReader
+from records import Patient, Appointment, Prescription
+from slot_index import (SlotIndex, SLOTS_PER_DAY, OPENING_MINUTES, SLOT_MINUTES,
+                        slot_time, time_to_minutes)
+import snapshot
+
+TABLE_FILES = {
+    "patients": PATIENTS_FILE,
+    "appointments": APPOINTMENTS_FILE,
+    "prescriptions": PRESCRIPTIONS_FILE,
+}
+FILE_TABLES = {filename: table for table, filename in TABLE_FILES.items()}
+RECORD_TYPES = {
+    "patients": Patient,
+    "appointments": Appointment,
+    "prescriptions": Prescription,
+}
+# Everything load() builds from the files; saved in the warm-start snapshot.
+SNAPSHOT_ATTRS = ("patients", "appointments", "prescriptions", "appointments_by_patient",
+                  "prescriptions_by_patient", "latest_prescription", "prescription_days",
+                  "names", "expiries", "slots")
+
+def _day(date_text):
+    """Day ordinal of a date field; malformed dates are kept as their text."""
+    day = date_to_ordinal(date_text)
+    return date_text if day is None else day
+
+def synchronized(method):
+    """Runs a RecordStore method under the store lock."""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self.lock:
+            return method(self, *args, **kwargs)
+    return wrapper
+
+def transaction(method):
+    """Runs a RecordStore mutator as an optimistic transaction on the files.
+
+    The method runs under the store lock, on tables first brought up to
+    date with writes made by other processes.  The disk writes it queued
+    with _io() are committed after the store lock is released, so readers
+    on the Tk thread only wait for in-memory work, and only if no other
+    process has written those files since they were read.  If one has,
+    the tables are reloaded (dropping the uncommitted change) and the
+    method runs again, so a stale read-modify-write never overwrites
+    someone else's change.  Transactions run one at a time; a nested call
+    joins the outer one.
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if self._writer == threading.get_ident():
+            with self.lock:
+                return method(self, *args, **kwargs)
+        with self._write_lock:
+            self._writer = threading.get_ident()
+            try:
+                return self._run_transaction(method, args, kwargs)
+            finally:
+                self._writer = None
+    return wrapper
+
+class WriteConflict(Exception):
+    """Other processes kept changing the files a write depended on."""
+
+def _written_files(pending):
+    filenames = set()
+    for _, args in pending:
+        target = args[0]
+        filenames.update([target] if isinstance(target, str) else target)
+    return filenames
+
+class RecordStore:
+    """Loads the four record files once and keeps them indexed in memory.
+
+    Rows are typed records (see records.py) parsed once at load, kept in
+    dicts keyed by ID (insertion order follows file order).  Records are
+    never mutated in place; updates replace them.  Every change is
+    written through to disk.  Public methods are thread-safe so they can
+    run on background workers, and several processes can share the files
+    (see transaction()).
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self._write_lock = threading.Lock()
+        self._writer = None
+        self._pending_io = []
+        self._pending_changes = []
+        self.feed = ChangeFeed()
+        self.patients = {}
+        self.appointments = {}
+        self.prescriptions = {}
+        self.appointments_by_patient = {}
+        self.prescriptions_by_patient = {}
+        self.latest_prescription = {}
+        self.prescription_days = {}
+        self.names = NameIndex()
+        self.expiries = ExpiryIndex()
+        self.slots = SlotIndex()
+        self.versions = {}
+        self.file_versions = {}
+        self.file_positions = {}
+        self.sequences = {}
+        self.snapshot_stamp = None
+        self._sort_cache = {}
+        self.load()
+
+    # ---------- Loading ----------
+
+    @synchronized
+    def load(self):
+        """(Re)loads every record file and rebuilds the indexes.
+
+        Tables and indexes come from the warm-start snapshot instead when
+        it was saved from the record files as they are now.
+        """
+        filenames = list(TABLE_FILES.values())
+        with locked(filenames):
+            stamp = file_stamp(filenames)
+            state = snapshot.load(stamp)
+            if state is None:
+                with snapshot.paused_gc():
+                    for table in TABLE_FILES:
+                        self._reload(table)
+                self.snapshot_stamp = None
+            else:
+                for attr in SNAPSHOT_ATTRS:
+                    setattr(self, attr, state[attr])
+                self.file_versions = {filename: file_version(filename) for filename in filenames}
+                self.file_positions = {filename: file_position(filename) for filename in filenames}
+                self.snapshot_stamp = stamp
+        for table, filename in TABLE_FILES.items():
+            self._changed(table)
+            self.sequences[table] = IdSequence(filename, getattr(self, table))
+
+    def _reload(self, table):
+        """Re-reads one table from its file and rebuilds that table's indexes.
+
+        Subscribers of the table are sent what changed.
+        """
+        old = getattr(self, table)
+        rows = self._load_file(TABLE_FILES[table], RECORD_TYPES[table])
+        setattr(self, table, rows)
+        if self.feed.watched(table):
+            self.feed.publish(_diff(table, old, rows))
+        if table == "patients":
+            self.names.clear()
+            for pid, row in rows.items():
+                self._index_patient(pid, row)
+        elif table == "appointments":
+            self.appointments_by_patient = {}
+            self.slots.clear()
+            for aid, row in rows.items():
+                self._index_appointment(aid, row)
+        else:
+            self.prescriptions_by_patient = {}
+            self.latest_prescription = {}
+            self.prescription_days = {}
+            self.expiries.clear()
+            for presc_id, row in rows.items():
+                self._index_prescription(presc_id, row)
+        self._changed(table)
+
+    def _load_file(self, filename, record_type):
+        with locked([filename]):
+            self.file_versions[filename] = file_version(filename)
+            self.file_positions[filename] = file_position(filename)
+            records = load_records(filename, record_type)
+        return {record.record_id: record for record in records}
+
+    def _catch_up(self, table):
+        """Applies only what other processes appended to a table's file.
+
+        Returns False, having changed nothing, when the file was replaced
+        (a rewrite or compaction) and has to be reloaded in full.
+        Subscribers of the table are sent what changed.
+        """
+        filename = TABLE_FILES[table]
+        with locked([filename]):
+            version = file_version(filename)
+            tail = read_changes(filename, self.file_positions.get(filename))
+        if tail is None:
+            return False
+        entries, self.file_positions[filename] = tail
+        self.file_versions[filename] = version
+        rows = getattr(self, table)
+        before = {}
+        for entry in entries:
+            op, payload = entry[0], entry[1:].strip()
+            if op == UPSERT:
+                row = RECORD_TYPES[table].from_line(payload)
+                rid = row.record_id
+            elif op == TOMBSTONE:
+                rid, row = payload, None
+            else:
+                continue
+            if rid not in before:
+                before[rid] = rows.get(rid)
+            self._put_row(table, rid, row)
+        self._changed(table)
+        if before and self.feed.watched(table):
+            old = {rid: row for rid, row in before.items() if row is not None}
+            new = {rid: rows[rid] for rid in before if rid in rows}
+            self.feed.publish(_diff(table, old, new))
+        return True
+
+    def _put_row(self, table, rid, row):
+        """Replaces one row and its index entries; row None removes it."""
+        rows = getattr(self, table)
+        old = rows.get(rid)
+        if old is not None:
+            if table == "patients":
+                self.names.remove(rid)
+            elif table == "appointments":
+                self._unindex_appointment(rid, old)
+            else:
+                self._unindex_prescription(rid, old)
+        if row is None:
+            rows.pop(rid, None)
+            return
+        rows[rid] = row
+        if table == "patients":
+            self._index_patient(rid, row)
+        elif table == "appointments":
+            self._index_appointment(rid, row)
+        else:
+            self._index_prescription(rid, row)
+
+    def _mark_read(self, filenames):
+        """Records how far the files are read, right after this process's commit."""
+        for filename in filenames:
+            self.file_positions[filename] = file_position(filename)
+
+    def refresh(self):
+        """Brings in the changes other processes have written since the tables were read.
+
+        Cheap when nothing changed: one version check per file.  Appended
+        rows and journal entries are applied one by one; a table is only
+        reloaded in full when its file was replaced.  Returns the names of
+        the tables that changed.
+        """
+        with self._write_lock:
+            return self._refresh()
+
+    @synchronized
+    def _refresh(self):
+        stale = [table for table, filename in TABLE_FILES.items()
+                 if file_version(filename) != self.file_versions.get(filename)]
+        for table in stale:
+            if not self._catch_up(table):
+                self._reload(table)
+        return stale
+
+    def _run_transaction(self, method, args, kwargs):
+        for attempt in range(1, WRITE_RETRIES + 1):
+            # The last attempt holds every table file for its whole run, so a
+            # busy file cannot starve a writer.  All of them, taken together
+            # in sorted order: _refresh() reads every table, and adding
+            # locks one by one while holding others could deadlock.
+            last = attempt == WRITE_RETRIES
+            with locked(TABLE_FILES.values() if last else (), exclusive=True):
+                with self.lock:
+                    self._refresh()
+                    try:
+                        result = method(self, *args, **kwargs)
+                    finally:
+                        pending, self._pending_io = self._pending_io, []
+                        changes, self._pending_changes = self._pending_changes, []
+                if not pending:
+                    return result
+                filenames = _written_files(pending)
+                try:
+                    versions = commit_if_unchanged(
+                        {filename: self.file_versions[filename] for filename in filenames},
+                        pending + [(self._mark_read, (filenames,))])
+                except OSError:
+                    # The change did not (fully) reach the disk; bring memory
+                    # back in line with what did.
+                    with self.lock:
+                        for filename in filenames:
+                            self._reload(FILE_TABLES[filename])
+                    raise
+            if versions is not None:
+                self.file_versions.update(versions)
+                self.feed.publish(changes)
+                return result
+            log_warning("write conflict", method=method.__name__, files=sorted(filenames),
+                        attempt=attempt)
+            with self.lock:
+                for filename in filenames:
+                    self._reload(FILE_TABLES[filename])
+        raise WriteConflict(f"{method.__name__}: the files kept changing; "
+                            f"gave up after {WRITE_RETRIES} attempts")
+
+    def save_snapshot(self):
+        """Saves the tables and indexes for a warm start, unless already current."""
+        # Holding the write lock too means no commit is half done, so the
+        # stamp describes exactly the rows being saved.
+        with self._write_lock, self.lock:
+            stamp = file_stamp(TABLE_FILES.values())
+            if stamp == self.snapshot_stamp:
+                return
+            snapshot.save({attr: getattr(self, attr) for attr in SNAPSHOT_ATTRS}, stamp)
+            self.snapshot_stamp = stamp
+
+    def release_ids(self):
+        """Gives back the unclaimed rest of every ID block (see IdSequence.release)."""
+        with self._write_lock:
+            for sequence in self.sequences.values():
+                sequence.release()
+
+    def _changed(self, table):
+        """Bumps a table's version, invalidating cached orderings of it."""
+        self.versions[table] = self.versions.get(table, 0) + 1
+
+    def _notify(self, table, kind, record_ids):
+        """Queues a change for subscribers, sent once the transaction commits."""
+        self._pending_changes.append(Change(table, kind, list(record_ids)))
+
+    def _io(self, func, *args):
+        """Queues a disk write for the running transaction to commit."""
+        self._pending_io.append((func, args))
+
+    def _save(self, filename, rows):
+        self._io(write_records, filename, [row.to_line() for row in rows.values()])
+
+    def _write_changed(self, filename, rows, changed):
+        """Writes changed rows through, journaled or as a full rewrite."""
+        self._changed(FILE_TABLES[filename])
+        if _row_writes():
+            self._io(upsert_records, filename, [row.to_line() for row in changed])
+        else:
+            self._save(filename, rows)
+
+    def _write_deleted(self, filename, rows, ids):
+        """Writes deletions through, journaled or as a full rewrite."""
+        self._changed(FILE_TABLES[filename])
+        if _row_writes():
+            self._io(delete_records, filename, list(ids))
+        else:
+            self._save(filename, rows)
+
+    # ---------- Index maintenance ----------
+
+    def _index_patient(self, pid, patient):
+        self.names.add(pid, patient.first_name, patient.last_name)
+
+    def _index_appointment(self, aid, appointment):
+        self.appointments_by_patient.setdefault(appointment.patient_id, set()).add(aid)
+        if appointment.is_booked:
+            self.slots.add(appointment.day, appointment.time, aid)
+
+    def _unindex_appointment(self, aid, appointment):
+        _discard(self.appointments_by_patient, appointment.patient_id, aid)
+        self.slots.remove(appointment.day, appointment.time, aid)
+
+    def _index_prescription(self, presc_id, prescription):
+        pid = prescription.patient_id
+        self.prescriptions_by_patient.setdefault(pid, set()).add(presc_id)
+        day = prescription.day
+        if isinstance(day, int):
+            self.prescription_days[presc_id] = day
+            latest = self.latest_prescription.get(pid)
+            if latest is None or day > latest:
+                self.latest_prescription[pid] = day
+        if isinstance(prescription.expiry_day, int):
+            self.expiries.add(prescription.expiry_day, presc_id)
+
+    def _unindex_prescription(self, presc_id, prescription):
+        pid = prescription.patient_id
+        _discard(self.prescriptions_by_patient, pid, presc_id)
+        if isinstance(prescription.expiry_day, int):
+            self.expiries.remove(prescription.expiry_day, presc_id)
+        day = self.prescription_days.pop(presc_id, None)
+        if day is not None and day == self.latest_prescription.get(pid):
+            # The removed row held the latest date; recompute from the rest.
+            days = [self.prescription_days[other_id]
+                    for other_id in self.prescriptions_by_patient.get(pid, ())
+                    if other_id in self.prescription_days]
+            if days:
+                self.latest_prescription[pid] = max(days)
+            else:
+                del self.latest_prescription[pid]
+
+    # ---------- Ordering ----------
+
+    @synchronized
+    def sorted_ids(self, table, column=0, reverse=False):
+        """Returns a table's row IDs ordered by a column.
+
+        Orderings are cached per table and only rebuilt after that table
+        changes, so paging and refreshing a view never re-sorts.
+        """
+        key = (table, column, reverse)
+        version = self.versions.get(table, 0)
+        cached = self._sort_cache.get(key)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        if reverse:
+            ids = self.sorted_ids(table, column)[::-1]
+        else:
+            rows = getattr(self, table)
+            ids = sorted(rows, key=lambda rid: sort_key(rows[rid], column))
+        self._sort_cache[key] = (version, ids)
+        return ids
+
+    # ---------- ID generation ----------
+
+    def next_patient_id(self):
+        return self.sequences["patients"].next()
+
+    def next_appointment_id(self):
+        return self.sequences["appointments"].next()
+
+    def next_prescription_id(self):
+        return self.sequences["prescriptions"].next()
+
+    def reserve_ids(self, table, count):
+        """Reserves a block of consecutive IDs for a batch insert."""
+        return [str(value) for value in self.sequences[table].reserve(count)]
+
+    # ---------- Batch inserts ----------
+
+    @transaction
+    def add_rows(self, table, rows):
+        """Adds many records to a table and appends them with a single write."""
+        target = getattr(self, table)
+        index = {"patients": self._index_patient,
+                 "appointments": self._index_appointment,
+                 "prescriptions": self._index_prescription}[table]
+        for row in rows:
+            target[row.record_id] = row
+            index(row.record_id, row)
+            self.sequences[table].observe(row.record_id)
+        self._changed(table)
+        self._notify(table, INSERT, [row.record_id for row in rows])
+        self._io(append_records, TABLE_FILES[table], [row.to_line() for row in rows])
+
+    # ---------- Patients ----------
+
+    def get_patient(self, pid):
+        """Returns the Patient with the given ID, or None."""
+        return self.patients.get(pid)
+
+    @synchronized
+    def find_patients_by_name(self, query):
+        """Returns IDs of patients whose first, last or full name contains query."""
+        return sorted(self.names.search(query), key=_id_key)
+
+    @transaction
+    def add_patient(self, patient):
+        pid = patient.patient_id
+        self.patients[pid] = patient
+        self._index_patient(pid, patient)
+        self._changed("patients")
+        self.sequences["patients"].observe(pid)
+        self._notify("patients", INSERT, [pid])
+        self._io(append_record, PATIENTS_FILE, patient.to_line())
+
+    @transaction
+    def create_patient(self, patient):
+        """Adds a patient under a newly allocated ID and returns the ID."""
+        pid = self.next_patient_id()
+        self.add_patient(patient.replace(patient_id=pid))
+        return pid
+
+    @transaction
+    def update_patient(self, patient):
+        pid = patient.patient_id
+        if pid not in self.patients:
+            return False
+        self.patients[pid] = patient
+        self._index_patient(pid, patient)
+        self._notify("patients", UPDATE, [pid])
+        self._write_changed(PATIENTS_FILE, self.patients, [patient])
+        return True
+
+    @transaction
+    def delete_patients(self, pids):
+        """Deletes patients and cascades to their appointments and prescriptions.
+
+        The deletions in all three files are committed together, so a
+        crash never leaves orphaned appointments or prescriptions behind.
+        In JOURNAL_MODE they are journaled as tombstones; a purge big
+        enough to need a compaction soon anyway rewrites the files.  SQLite
+        always deletes the rows.
+        """
+        removed = [pid for pid in set(pids) if self.patients.pop(pid, None) is not None]
+        if not removed:
+            return 0
+        for pid in removed:
+            self.names.remove(pid)
+        self._notify("patients", DELETE, removed)
+        aids = []
+        presc_ids = []
+        for pid in removed:
+            aids.extend(self.appointments_for_patient(pid))
+            presc_ids.extend(self.prescriptions_for_patient(pid))
+        deleted = {PATIENTS_FILE: removed}
+        dropped = self._drop_appointments(aids)
+        if dropped:
+            deleted[APPOINTMENTS_FILE] = dropped
+        dropped = self._drop_prescriptions(presc_ids)
+        if dropped:
+            deleted[PRESCRIPTIONS_FILE] = dropped
+        for filename in deleted:
+            self._changed(FILE_TABLES[filename])
+        remaining = sum(len(getattr(self, FILE_TABLES[filename])) for filename in deleted)
+        if STORAGE_BACKEND != "text" or (
+                JOURNAL_MODE and sum(map(len, deleted.values())) < remaining * JOURNAL_COMPACT_RATIO):
+            self._io(delete_records_atomic, deleted)
+        else:
+            snapshots = {filename: getattr(self, FILE_TABLES[filename]) for filename in deleted}
+            self._io(write_records_atomic,
+                     {filename: [row.to_line() for row in rows.values()]
+                      for filename, rows in snapshots.items()})
+        return len(removed)
+
+    # ---------- Appointments ----------
+
+    @synchronized
+    def appointments_for_patient(self, pid):
+        return sorted(self.appointments_by_patient.get(pid, ()), key=_id_key)
+
+    @synchronized
+    def is_slot_booked(self, date, time_str):
+        return self.slots.is_booked(_day(date), time_str)
+
+    @synchronized
+    def free_slots(self, date, start=OPENING_TIME, end=CLOSING_TIME):
+        """Returns the free slot times on date within [start, end)."""
+        return self.slots.free_slots(_day(date), start, end)
+
+    @synchronized
+    def day_schedule(self, day):
+        """Returns [(slot time, [Appointment, ...]), ...] for each slot of a day.
+
+        day is a day ordinal.  Empty slots are skipped using the day's
+        occupancy bitmap, so a week of days renders without any scan.
+        """
+        mask = self.slots.occupied(day)
+        schedule = []
+        for slot in range(SLOTS_PER_DAY):
+            booked = []
+            if mask >> slot & 1:
+                for time_str in self.slots.booked_times(day, slot_time(slot), slot_time(slot + 1)):
+                    booked.extend(self.appointments[aid] for aid in
+                                  sorted(self.slots.booked_ids(day, time_str), key=_id_key))
+            schedule.append((slot_time(slot), booked))
+        return schedule
+
+    @synchronized
+    def next_free_slot(self, day=None, time_str=None):
+        """Returns (date, time) of the first free slot at or after day and time.
+
+        day is a day ordinal and defaults to tomorrow; time defaults to
+        opening time.  Returns None if nothing is free within a year.
+        """
+        if day is None:
+            day = today_ordinal() + 1
+        first_slot = 0
+        minutes = time_to_minutes(time_str) if time_str else None
+        if minutes is not None and minutes > OPENING_MINUTES:
+            first_slot = -(-(minutes - OPENING_MINUTES) // SLOT_MINUTES)
+        found = self.slots.next_free(day, first_slot)
+        if found is None:
+            return None
+        free_day, slot = found
+        return ordinal_to_date(free_day), slot_time(slot)
+
+    @transaction
+    def add_appointment(self, appointment):
+        aid = appointment.appointment_id
+        self.appointments[aid] = appointment
+        self._index_appointment(aid, appointment)
+        self._changed("appointments")
+        self.sequences["appointments"].observe(aid)
+        self._notify("appointments", INSERT, [aid])
+        self._io(append_record, APPOINTMENTS_FILE, appointment.to_line())
+
+    @transaction
+    def book_slot(self, pid, full_name, date, time_str, reason):
+        """Books a slot if it is still free; returns the new ID or None."""
+        if self.is_slot_booked(date, time_str):
+            return None
+        aid = self.next_appointment_id()
+        self.add_appointment(Appointment(aid, pid, full_name, date, time_str, "Booked", reason))
+        return aid
+
+    @transaction
+    def move_appointment(self, aid, date, time_str):
+        """Moves an appointment to a free slot; False if it is gone or the slot is taken."""
+        appointment = self.appointments.get(aid)
+        if appointment is None or self.is_slot_booked(date, time_str):
+            return False
+        return self.update_appointment(appointment.replace(day=_day(date), time=time_str,
+                                                           status="Booked"))
+
+    @transaction
+    def update_appointment(self, appointment):
+        aid = appointment.appointment_id
+        old = self.appointments.get(aid)
+        if old is None:
+            return False
+        self._unindex_appointment(aid, old)
+        self.appointments[aid] = appointment
+        self._index_appointment(aid, appointment)
+        self._notify("appointments", UPDATE, [aid])
+        self._write_changed(APPOINTMENTS_FILE, self.appointments, [appointment])
+        return True
+
+    @transaction
+    def delete_appointments(self, aids):
+        """Deletes the given appointment IDs; returns how many were removed."""
+        removed = self._drop_appointments(aids)
+        if removed:
+            self._write_deleted(APPOINTMENTS_FILE, self.appointments, removed)
+        return len(removed)
+
+    def _drop_appointments(self, aids):
+        removed = []
+        for aid in list(aids):
+            row = self.appointments.pop(aid, None)
+            if row is not None:
+                self._unindex_appointment(aid, row)
+                removed.append(aid)
+        if removed:
+            self._notify("appointments", DELETE, removed)
+        return removed
+
+    # ---------- Prescriptions ----------
+
+    @synchronized
+    def prescriptions_for_patient(self, pid):
+        return sorted(self.prescriptions_by_patient.get(pid, ()), key=_id_key)
+
+    def latest_prescription_date(self, pid):
+        """Returns the most recent prescription day ordinal of a patient, or None."""
+        return self.latest_prescription.get(pid)
+
+    @synchronized
+    def inactive_patients(self, threshold):
+        """Returns IDs of patients with no prescription on/after threshold (a day ordinal)."""
+        latest = self.latest_prescription
+        return [pid for pid in self.patients
+                if pid not in latest or latest[pid] < threshold]
+
+    @synchronized
+    def expiring_prescriptions(self, first_day, last_day):
+        """Returns the prescriptions expiring in [first_day, last_day] (day ordinals), by expiry."""
+        return [self.prescriptions[presc_id]
+                for presc_id in self.expiries.between(first_day, last_day)]
+
+    @transaction
+    def add_prescription(self, prescription):
+        presc_id = prescription.prescription_id
+        self.prescriptions[presc_id] = prescription
+        self._index_prescription(presc_id, prescription)
+        self._changed("prescriptions")
+        self.sequences["prescriptions"].observe(presc_id)
+        self._notify("prescriptions", INSERT, [presc_id])
+        self._io(append_record, PRESCRIPTIONS_FILE, prescription.to_line())
+
+    @transaction
+    def create_prescription(self, prescription):
+        """Adds a prescription under a newly allocated ID and returns the ID."""
+        presc_id = self.next_prescription_id()
+        self.add_prescription(prescription.replace(prescription_id=presc_id))
+        return presc_id
+
+    @transaction
+    def update_prescriptions(self, prescriptions):
+        """Replaces several prescriptions at once."""
+        changed = []
+        for prescription in prescriptions:
+            presc_id = prescription.prescription_id
+            old = self.prescriptions.get(presc_id)
+            if old is None:
+                continue
+            self._unindex_prescription(presc_id, old)
+            self.prescriptions[presc_id] = prescription
+            self._index_prescription(presc_id, prescription)
+            changed.append(prescription)
+        if changed:
+            self._notify("prescriptions", UPDATE, [row.prescription_id for row in changed])
+            self._write_changed(PRESCRIPTIONS_FILE, self.prescriptions, changed)
+
+    @transaction
+    def delete_prescriptions(self, presc_ids):
+        """Deletes the given prescription IDs; returns how many were removed."""
+        removed = self._drop_prescriptions(presc_ids)
+        if removed:
+            self._write_deleted(PRESCRIPTIONS_FILE, self.prescriptions, removed)
+        return len(removed)
+
+    def _drop_prescriptions(self, presc_ids):
+        removed = []
+        for presc_id in list(presc_ids):
+            row = self.prescriptions.pop(presc_id, None)
+            if row is not None:
+                self._unindex_prescription(presc_id, row)
+                removed.append(presc_id)
+        if removed:
+            self._notify("prescriptions", DELETE, removed)
+        return removed
+
+def _row_writes():
+    """True when single rows are written (journal or SQLite), not whole files."""
+    return JOURNAL_MODE or STORAGE_BACKEND != "text"
+
+def _discard(index, key, value):
+    ids = index.get(key)
+    if ids is not None:
+        ids.discard(value)
+        if not ids:
+            del index[key]
+
+def _diff(table, old, new):
+    """Changes that turn the rows old into new (both dicts by ID)."""
+    inserted = [rid for rid in new if rid not in old]
+    updated = [rid for rid, row in new.items()
+               if rid in old and old[rid] is not row and old[rid] != row]
+    deleted = [rid for rid in old if rid not in new]
+    return [Change(table, kind, ids) for kind, ids in
+            ((INSERT, inserted), (UPDATE, updated), (DELETE, deleted)) if ids]
+
+def sort_key(row, column):
+    """Key ordering rows by a column, as used by sorted_ids()."""
+    value = row.sort_value(column)
+    if isinstance(value, int):
+        return (1, value, "")
+    if value.isdigit():
+        return (0, int(value), "")
+    day = date_to_ordinal(value)
+    if day is not None:
+        return (1, day, "")
+    return (2, 0, value.lower())
+
+def _id_key(record_id):
+    return (0, int(record_id), "") if record_id.isdigit() else (1, 0, record_id)
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_store():
+    """Returns the shared RecordStore, loading it on first use."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = RecordStore()
+                _close_readers()
+    return _store
+
+def close():
+    """Saves the shared store's warm-start snapshot and gives back unused IDs.
+
+    Does nothing if the store was never loaded.
+    """
+    if _store is not None:
+        _store.save_snapshot()
+        _store.release_ids()
+
+_readers = {}
+
+def lookup(table, record_id):
+    """Returns one record of a table by ID, or None, without waiting for a load.
+
+    The shared store answers once it is loaded.  Until then the record is
+    read straight from its file through a RecordReader, or with SQLite by
+    its primary key.
+    """
+    if _store is not None:
+        return getattr(_store, table).get(record_id)
+    if STORAGE_BACKEND != "text":
+        return load_record(TABLE_FILES[table], RECORD_TYPES[table], record_id)
+    reader = _readers.get(table)
+    if reader is None:
+        reader = _readers.setdefault(table, RecordReader(TABLE_FILES[table], RECORD_TYPES[table]))
+    record = reader.get(record_id)
+    if _store is not None:
+        # The store finished loading meanwhile; don't leave this reader mapped.
+        _close_readers()
+    return record
+
+def _close_readers():
+    """Unmaps the readers used while the store loaded.
+
+    On Windows a mapped file cannot be replaced, which would make every
+    later rewrite or compaction of it fail.
+    """
+    for reader in list(_readers.values()):
+        reader.close()
+    _readers.clear()
@@ -0,0 +1,170 @@
+# records.py
+import csv
+
+from dates import date_to_ordinal, ordinal_to_date
+
+# ---------- Line format ----------
+# Records are comma-separated lines.  A field containing a comma, a quote
+# or a newline is written in double quotes (quotes doubled, as in CSV), so
+# free text such as addresses and reasons no longer corrupts a row.  Lines
+# without quotes, which is every line written before this format, take the
+# plain str.split fast path.
+
+def parse_line(line):
+    """Splits a record line into a list of stripped fields."""
+    if '"' not in line:
+        return [part.strip() for part in line.split(",")]
+    return [part.strip() for part in next(csv.reader([line], skipinitialspace=True))]
+
+def _quote(value):
+    if "," in value or '"' in value or "\n" in value:
+        return '"' + value.replace('"', '""') + '"'
+    return value
+
+def format_line(fields):
+    """Joins fields into a record line, quoting where needed."""
+    return ",".join(_quote(str(field)) for field in fields)
+
+def _day(date_text):
+    # Valid dates are kept as day ordinals; anything else keeps its text.
+    day = date_to_ordinal(date_text)
+    return date_text if day is None else day
+
+def _date_text(day):
+    return ordinal_to_date(day) if isinstance(day, int) else day
+
+# ---------- Record types ----------
+
+class Record:
+    """Base for the typed record classes.
+
+    __slots__ lists the attributes in file column order.  FREE_TEXT is the
+    column that absorbs extra fields when a legacy row was split on a
+    comma inside free text.
+    """
+
+    __slots__ = ()
+    FREE_TEXT = -1
+
+    @classmethod
+    def from_fields(cls, fields):
+        width = len(cls.__slots__)
+        fields = list(fields)
+        if len(fields) > width:
+            free = cls.FREE_TEXT % width
+            extra = len(fields) - width
+            fields[free:free + extra + 1] = [",".join(fields[free:free + extra + 1])]
+        fields += [""] * (width - len(fields))
+        return cls(*fields)
+
+    @classmethod
+    def from_line(cls, line):
+        return cls.from_fields(parse_line(line))
+
+    @property
+    def record_id(self):
+        return getattr(self, self.__slots__[0])
+
+    def fields(self):
+        """Returns the record's fields as display/serialization strings."""
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    def to_line(self):
+        return format_line(self.fields())
+
+    def sort_value(self, column):
+        """Typed value of a column for ordering (day ordinals for dates)."""
+        return getattr(self, self.__slots__[column])
+
+    def replace(self, **changes):
+        """Returns a copy with some attributes changed (records are not mutated)."""
+        values = {name: getattr(self, name) for name in self.__slots__}
+        values.update(changes)
+        return type(self)(**values)
+
+    def __reduce__(self):
+        # Pickle as the constructor arguments; much smaller and faster to
+        # load than the default per-slot state.
+        return type(self), tuple(getattr(self, name) for name in self.__slots__)
+
+    def __eq__(self, other):
+        return type(self) is type(other) and self.fields() == other.fields()
+
+    def __repr__(self):
+        return f"{type(self).__name__}{self.fields()!r}"
+
+class Patient(Record):
+    __slots__ = ("patient_id", "first_name", "last_name", "dob", "phone", "email", "address")
+    FREE_TEXT = 6
+
+    def __init__(self, patient_id, first_name, last_name, dob, phone, email, address):
+        self.patient_id = patient_id
+        self.first_name = first_name
+        self.last_name = last_name
+        self.dob = dob
+        self.phone = phone
+        self.email = email
+        self.address = address
+
+    @property
+    def full_name(self):
+        return f"{self.first_name} {self.last_name}"
+
+class Appointment(Record):
+    __slots__ = ("appointment_id", "patient_id", "patient_name", "day", "time", "status",
+                 "reason")
+    FREE_TEXT = 6
+
+    def __init__(self, appointment_id, patient_id, patient_name, day, time, status, reason):
+        self.appointment_id = appointment_id
+        self.patient_id = patient_id
+        self.patient_name = patient_name
+        self.day = _day(day) if isinstance(day, str) else day
+        self.time = time
+        self.status = status
+        self.reason = reason
+
+    @property
+    def date(self):
+        return _date_text(self.day)
+
+    @property
+    def is_booked(self):
+        return self.status.lower() == "booked"
+
+    def fields(self):
+        return (self.appointment_id, self.patient_id, self.patient_name, self.date,
+                self.time, self.status, self.reason)
+
+class Prescription(Record):
+    __slots__ = ("prescription_id", "patient_id", "patient_name", "details", "day",
+                 "expiry_day")
+    FREE_TEXT = 3
+
+    def __init__(self, prescription_id, patient_id, patient_name, details, day, expiry_day):
+        self.prescription_id = prescription_id
+        self.patient_id = patient_id
+        self.patient_name = patient_name
+        self.details = details
+        self.day = _day(day) if isinstance(day, str) else day
+        self.expiry_day = _day(expiry_day) if isinstance(expiry_day, str) else expiry_day
+
+    @property
+    def date(self):
+        return _date_text(self.day)
+
+    @property
+    def expiry(self):
+        return _date_text(self.expiry_day)
+
+    def fields(self):
+        return (self.prescription_id, self.patient_id, self.patient_name, self.details,
+                self.date, self.expiry)
+
+class Admin(Record):
+    __slots__ = ("admin_id", "username", "password_hash")
+
+    def __init__(self, admin_id, username, password_hash):
+        self.admin_id = admin_id
+        self.username = username
+        self.password_hash = password_hash
@@ -0,0 +1,206 @@
+# server.py
+"""Local HTTP/JSON server that owns the record store for several desks.
+
+    python server.py [--host 127.0.0.1] [--port 8765]
+
+POST /api/<operation> with a JSON body {"args": [...]} calls
+services.<operation>(*args) and replies {"result": ...}, or
+{"error": {"title": ..., "message": ...}} when a ServiceError is raised.
+GET /health answers {"result": "ok"}.  Records travel as
+{"record": "<type>", "fields": [...]}.
+
+Apart from warm_up and authenticate, every operation needs the session
+that a successful authenticate returns (as "session" next to "result"),
+sent back in an X-Session header.  Sessions lapse after SESSION_TIMEOUT
+seconds without use.
+
+Connections are kept alive between requests.  Reads run on a small
+thread pool; writes run one at a time, in arrival order, on a single
+writer thread, so two desks can never interleave changes to a file.
+Point the UI at the server with SERVER_URL in constants.py.
+"""
+import argparse
+import asyncio
+import functools
+import hmac
+import json
+import secrets
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import services
+from constants import SERVER_HOST, SERVER_PORT, SERVER_TOKEN, SESSION_TIMEOUT
+from logger import log_error, log_info, timed
+from records import Record
+from services import ServiceError
+
+# Operations exposed to clients, by whether they change the store.
+READS = ("warm_up", "authenticate", "sorted_ids", "get_record", "get_records", "sort_key",
+         "resolve_patient", "find_patient_by_name", "patient_full_name", "get_patient",
+         "search_patients", "find_appointments", "next_free_slot", "day_schedule",
+         "day_schedules", "find_prescription", "prescriptions_for", "recall_list",
+         "inactive_patients")
+WRITES = ("add_patient", "update_patient", "delete_patient", "book_appointment",
+          "delete_appointments", "reschedule_appointment", "add_prescription",
+          "update_prescription_details", "delete_prescriptions", "purge_patients")
+# Operations allowed without a session.  authenticate checks the password
+# on a reader; only upgrading an outdated stored hash goes to the writer.
+PUBLIC = ("warm_up", "authenticate")
+
+IDLE_TIMEOUT = 60
+MAX_BODY = 1024 * 1024
+STATUS_TEXT = {200: "OK", 400: "Bad Request", 401: "Unauthorized", 404: "Not Found",
+               405: "Method Not Allowed", 413: "Payload Too Large",
+               500: "Internal Server Error"}
+
+def encode(value):
+    """json.dumps default: records become {"record": type, "fields": [...]}."""
+    if isinstance(value, Record):
+        return {"record": type(value).__name__, "fields": list(value.fields())}
+    raise TypeError(f"Cannot encode {type(value).__name__}")
+
+class Server:
+    def __init__(self, host=SERVER_HOST, port=SERVER_PORT, token=SERVER_TOKEN, readers=4):
+        self.host = host
+        self.port = port
+        self.token = token
+        self.sessions = {}
+        self.readers = ThreadPoolExecutor(max_workers=readers)
+        self.writer = ThreadPoolExecutor(max_workers=1)
+
+    async def serve(self):
+        # Load the store before the first client is accepted.
+        services.warm_up()
+        server = await asyncio.start_server(self.handle, self.host, self.port)
+        log_info("server started", host=self.host, port=self.port)
+        print(f"Serving on http://{self.host}:{self.port}")
+        async with server:
+            await server.serve_forever()
+
+    def open_session(self):
+        session = secrets.token_urlsafe(32)
+        self.sessions[session] = time.monotonic() + SESSION_TIMEOUT
+        return session
+
+    def check_session(self, session):
+        """True for a live session, whose timeout then starts again."""
+        now = time.monotonic()
+        for expired in [s for s, expires in self.sessions.items() if expires < now]:
+            del self.sessions[expired]
+        if session not in self.sessions:
+            return False
+        self.sessions[session] = now + SESSION_TIMEOUT
+        return True
+
+    async def handle(self, reader, writer):
+        """Serves one keep-alive connection until the client closes it or idles out."""
+        try:
+            while True:
+                request = await self.read_request(reader)
+                if request is None:
+                    break
+                method, path, headers, body = request
+                status, payload = await self.dispatch(method, path, headers, body)
+                keep_alive = headers.get("connection", "").lower() != "close"
+                data = json.dumps(payload, default=encode).encode("utf-8")
+                writer.write(
+                    f"HTTP/1.1 {status} {STATUS_TEXT[status]}\r\n"
+                    f"Content-Type: application/json\r\n"
+                    f"Content-Length: {len(data)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode("ascii")
+                    + data)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def read_request(self, reader):
+        """Returns (method, path, headers, body), or None at end of stream."""
+        line = await asyncio.wait_for(reader.readline(), IDLE_TIMEOUT)
+        if not line:
+            return None
+        method, path, _ = line.decode("latin-1").split(" ", 2)
+        headers = {}
+        while True:
+            line = await asyncio.wait_for(reader.readline(), IDLE_TIMEOUT)
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        length = int(headers.get("content-length", 0))
+        if length > MAX_BODY:
+            raise ValueError("request body too large")
+        body = await reader.readexactly(length) if length else b""
+        return method, path, headers, body
+
+    async def dispatch(self, method, path, headers, body):
+        """Runs the requested operation; returns (status, payload)."""
+        if path == "/health":
+            return 200, {"result": "ok"}
+        if not path.startswith("/api/"):
+            return 404, _error("Unknown path.")
+        name = path[len("/api/"):]
+        if name not in READS and name not in WRITES:
+            return 404, _error(f"Unknown operation {name!r}.")
+        if method != "POST":
+            return 405, _error("Use POST.")
+        if self.token and not hmac.compare_digest(headers.get("x-api-token", ""), self.token):
+            return 401, _error("Invalid API token.", "Server Error")
+        if name not in PUBLIC and not self.check_session(headers.get("x-session", "")):
+            return 401, _error("Not logged in, or the session has expired.", "Server Error")
+        try:
+            args = json.loads(body or b"{}").get("args", [])
+        except (ValueError, AttributeError):
+            return 400, _error("Malformed JSON request.")
+        try:
+            if name == "authenticate":
+                result = await self.authenticate(*args)
+            else:
+                result = await self.run(name, args)
+        except ServiceError as e:
+            return 400, _error(e.message, e.title)
+        except TypeError as e:
+            return 400, _error(f"Bad arguments for {name}: {e}")
+        except Exception as e:
+            log_error(f"API call {name} failed: {e!r}")
+            return 500, _error(f"Operation failed: {e}")
+        if name == "authenticate":
+            return 200, {"result": result, "session": self.open_session()}
+        return 200, {"result": result}
+
+    async def run(self, name, args):
+        """Calls services.<name>(*args) on the writer for WRITES, else on a reader."""
+        executor = self.writer if name in WRITES else self.readers
+        call = timed(f"api.{name}")(functools.partial(getattr(services, name), *args))
+        return await asyncio.get_running_loop().run_in_executor(executor, call)
+
+    async def authenticate(self, username, password):
+        """Checks the (slow) password hash on a reader, so writes never wait on it."""
+        username, upgraded = await self.run("check_login", (username, password))
+        if upgraded is not None:
+            call = functools.partial(services.upgrade_password, username, *upgraded)
+            await asyncio.get_running_loop().run_in_executor(self.writer, call)
+        return username
+
+def _error(message, title="Error"):
+    return {"error": {"title": title, "message": message}}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Shared record store server.")
+    parser.add_argument("--host", default=SERVER_HOST)
+    parser.add_argument("--port", type=int, default=SERVER_PORT)
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(Server(args.host, args.port).serve())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        services.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,345 @@
+# services.py
+"""Patient, appointment and prescription operations, independent of Tk.
+
+Each function works on the shared RecordStore and raises ServiceError,
+carrying the title and message to show the user, when input is invalid
+or a business rule fails.  ui.py calls these; so can scripts and servers.
+"""
+import auth
+from bulk_io import recall_rows, export_recalls as _export_recalls
+from constants import PRESCRIPTION_VALID_DAYS, INACTIVE_AFTER_DAYS
+from dates import date_to_ordinal, ordinal_to_date, today_ordinal
+from record_store import close as close_store, get_store, lookup, sort_key as row_sort_key
+from records import Patient, Prescription
+from validation import (check_nonempty, check_date, check_future_date, check_past_date,
+                        check_phone, check_email, check_time)
+
+class ServiceError(Exception):
+    """A failed operation, with a user-facing title and message."""
+
+    def __init__(self, message, title="Error"):
+        super().__init__(message)
+        self.message = message
+        self.title = title
+
+def _check(*errors):
+    """Raises the first of the given FieldErrors, if any."""
+    for error in errors:
+        if error is not None:
+            raise ServiceError(error.message, error.title)
+
+def warm_up():
+    """Loads the record store ahead of first use."""
+    get_store()
+
+def close():
+    """Saves the store's warm-start snapshot and unused IDs; call once on exit."""
+    close_store()
+
+# ---------- Admins ----------
+
+LOGIN_ERRORS = {
+    auth.BAD_PASSWORD: "Invalid username or password.",
+    auth.LOCKED: "Too many failed attempts. Try again later.",
+}
+
+def authenticate(username, password):
+    """Checks admin credentials; returns the username or raises ServiceError.
+
+    Slow by design (see auth.py); GUI callers should run it on a worker.
+    """
+    username, upgraded = check_login(username, password)
+    if upgraded is not None:
+        upgrade_password(username, *upgraded)
+    return username
+
+def check_login(username, password):
+    """authenticate() without writing: returns (username, upgraded).
+
+    When upgraded is not None, pass it on as upgrade_password(username,
+    *upgraded) to store the outdated hash in its new form; a server does
+    that on its writer, leaving the slow check to a reader.
+    """
+    username = username.strip()
+    result, upgraded = auth.verify(username, password.strip())
+    if result != auth.OK:
+        raise ServiceError(LOGIN_ERRORS[result], "Login Failed")
+    return username, upgraded
+
+def upgrade_password(username, old_hash, new_hash):
+    """Replaces an admin's outdated password hash (see check_login)."""
+    auth.upgrade(username, old_hash, new_hash)
+
+# ---------- Tables ----------
+
+def sorted_ids(table, column=0, reverse=False):
+    """Returns a table's record IDs ordered by a column (see RecordStore.sorted_ids)."""
+    return get_store().sorted_ids(table, column, reverse)
+
+def get_record(table, record_id):
+    """Returns one record of a table, or None; answered even while the store loads."""
+    return lookup(table, record_id)
+
+def get_records(table, record_ids):
+    """get_record() for several IDs in one call; None stands in for missing ones."""
+    return [lookup(table, record_id) for record_id in record_ids]
+
+def sort_key(table, record_id, column):
+    """Sort key of one record for a column (matching sorted_ids), or None."""
+    record = lookup(table, record_id)
+    return None if record is None else row_sort_key(record, column)
+
+# ---------- Change feed ----------
+
+def subscribe(tables=None):
+    """Returns a change_feed.Subscription to committed changes of the given tables."""
+    return get_store().feed.subscribe(tables)
+
+def refresh():
+    """Picks up changes other processes made to the files; returns the reloaded tables.
+
+    Subscribers are sent what changed.
+    """
+    return get_store().refresh()
+
+# ---------- Patients ----------
+
+def find_patient_by_name(name):
+    """Returns the ID of the one patient whose name contains name, or None."""
+    matches = get_store().find_patients_by_name(name)
+    if len(matches) > 1:
+        raise ServiceError("Multiple patients match the name. Please specify by ID.", "Ambiguity")
+    return matches[0] if matches else None
+
+def resolve_patient(identifier):
+    """Returns a patient ID given either the ID itself or a name."""
+    identifier = identifier.strip()
+    if identifier.isdigit():
+        return identifier
+    return find_patient_by_name(identifier)
+
+def patient_full_name(pid):
+    patient = lookup("patients", pid)
+    return patient.full_name if patient is not None else "Unknown"
+
+def get_patient(identifier):
+    """Returns the Patient for an ID or name; raises if there is none."""
+    pid = resolve_patient(identifier)
+    patient = lookup("patients", pid) if pid else None
+    if patient is None:
+        raise ServiceError("Patient not found.")
+    return patient
+
+def search_patients(query):
+    """Returns the Patients whose first, last or full name contains query."""
+    store = get_store()
+    return [store.patients[pid] for pid in store.find_patients_by_name(query.strip())]
+
+def _check_patient(patient):
+    _check(check_nonempty(patient.first_name, "First Name"),
+           check_nonempty(patient.last_name, "Last Name"),
+           check_nonempty(patient.dob, "Date of Birth"),
+           check_nonempty(patient.phone, "Phone"),
+           check_nonempty(patient.email, "Email"),
+           check_nonempty(patient.address, "Address"),
+           check_past_date(patient.dob),
+           check_phone(patient.phone),
+           check_email(patient.email))
+
+def add_patient(first, last, dob, phone, email, address):
+    """Validates and adds a patient; returns the new ID."""
+    patient = Patient("", first.strip(), last.strip(), dob.strip(), phone.strip(),
+                      email.strip(), address.strip())
+    _check_patient(patient)
+    return get_store().create_patient(patient)
+
+def update_patient(identifier, first, last, dob, phone, email, address):
+    """Validates and replaces a patient's details."""
+    pid = resolve_patient(identifier)
+    if not pid:
+        raise ServiceError("Patient not found.")
+    patient = Patient(pid, first.strip(), last.strip(), dob.strip(), phone.strip(),
+                      email.strip(), address.strip())
+    _check_patient(patient)
+    if not get_store().update_patient(patient):
+        raise ServiceError("Patient not found.")
+
+def delete_patient(identifier):
+    """Deletes a patient with their appointments and prescriptions; returns the ID."""
+    pid = resolve_patient(identifier)
+    if not pid or not get_store().delete_patients([pid]):
+        raise ServiceError("Patient not found.")
+    return pid
+
+# ---------- Appointments ----------
+
+def book_appointment(full_name, date, time_str, reason):
+    """Books a free slot for the named patient; returns the appointment ID."""
+    full_name, date, time_str, reason = (full_name.strip(), date.strip(), time_str.strip(),
+                                         reason.strip())
+    _check(check_nonempty(full_name, "Patient Full Name"),
+           check_nonempty(date, "Date"),
+           check_nonempty(time_str, "Time"),
+           check_nonempty(reason, "Reason"),
+           check_future_date(date),
+           check_time(time_str))
+    store = get_store()
+    if store.is_slot_booked(date, time_str):
+        raise ServiceError("This appointment slot is already booked.", "Conflict")
+    pid = find_patient_by_name(full_name)
+    if not pid:
+        raise ServiceError("Patient not found. Please add the patient first.")
+    # The slot is re-checked under the store lock in case another desk took it.
+    aid = store.book_slot(pid, full_name, date, time_str, reason)
+    if aid is None:
+        raise ServiceError("This appointment slot is already booked.", "Conflict")
+    return aid
+
+def find_appointments(full_name, date, time_str):
+    """Returns the IDs of the named patient's appointments at date and time."""
+    pid = find_patient_by_name(full_name.strip().lower())
+    if not pid:
+        raise ServiceError("Patient not found.")
+    store = get_store()
+    day = date_to_ordinal(date.strip())
+    time_str = time_str.strip()
+    matching = [aid for aid in store.appointments_for_patient(pid)
+                if store.appointments[aid].day == day and store.appointments[aid].time == time_str]
+    if not matching:
+        raise ServiceError("Appointment not found.")
+    return matching
+
+def delete_appointments(aids):
+    return get_store().delete_appointments(aids)
+
+def reschedule_appointment(aid, date, time_str):
+    """Moves an appointment to a new free slot."""
+    aid, date, time_str = aid.strip(), date.strip(), time_str.strip()
+    _check(check_nonempty(date, "New Date"),
+           check_nonempty(time_str, "New Time"),
+           check_future_date(date),
+           check_time(time_str))
+    store = get_store()
+    if aid not in store.appointments:
+        raise ServiceError("Appointment not found.")
+    if store.is_slot_booked(date, time_str) or not store.move_appointment(aid, date, time_str):
+        raise ServiceError("The new appointment slot is already booked.", "Conflict")
+
+def next_free_slot(date="", time_str=""):
+    """Returns (date, time) of the next free slot after date and time, or tomorrow."""
+    day = date_to_ordinal(date.strip())
+    if day is None or day <= today_ordinal():
+        day, time_str = None, None
+    slot = get_store().next_free_slot(day, time_str)
+    if slot is None:
+        raise ServiceError("No free appointment slot in the next year.", "No Free Slots")
+    return slot
+
+def day_schedule(day):
+    """Returns [(slot time, [Appointment, ...]), ...] for a day ordinal."""
+    return get_store().day_schedule(day)
+
+def day_schedules(days):
+    """day_schedule() for several days in one call, e.g. a calendar week."""
+    store = get_store()
+    return [store.day_schedule(day) for day in days]
+
+# ---------- Prescriptions ----------
+
+def add_prescription(full_name, details, presc_date):
+    """Adds a prescription valid for PRESCRIPTION_VALID_DAYS; returns its ID."""
+    full_name, details, presc_date = full_name.strip(), details.strip(), presc_date.strip()
+    _check(check_nonempty(full_name, "Patient Full Name"),
+           check_nonempty(details, "Details"),
+           check_nonempty(presc_date, "Prescription Date"),
+           check_date(presc_date))
+    expiry = ordinal_to_date(date_to_ordinal(presc_date) + PRESCRIPTION_VALID_DAYS)
+    pid = find_patient_by_name(full_name)
+    if not pid:
+        raise ServiceError("Patient not found. Please add the patient first.")
+    return get_store().create_prescription(
+        Prescription("", pid, full_name, details, presc_date, expiry))
+
+def _prescription_ids(identifier):
+    """IDs matching a prescription ID and/or every prescription of a named patient."""
+    store = get_store()
+    presc_ids = []
+    if identifier in store.prescriptions:
+        presc_ids.append(identifier)
+    pid = find_patient_by_name(identifier)
+    if pid:
+        presc_ids.extend(presc_id for presc_id in store.prescriptions_for_patient(pid)
+                         if presc_id not in presc_ids)
+    return presc_ids
+
+def find_prescription(identifier):
+    """Returns the Prescription with this ID, or the named patient's first one."""
+    identifier = identifier.strip()
+    store = get_store()
+    prescription = store.prescriptions.get(identifier)
+    if prescription is None:
+        pid = find_patient_by_name(identifier)
+        presc_ids = store.prescriptions_for_patient(pid) if pid else []
+        if presc_ids:
+            prescription = store.prescriptions[presc_ids[0]]
+    if prescription is None:
+        raise ServiceError("Prescription not found.")
+    return prescription
+
+def update_prescription_details(identifier, details):
+    """Sets the details of a prescription, or of all a patient's prescriptions."""
+    details = details.strip()
+    _check(check_nonempty(details, "Prescription Details"))
+    presc_ids = _prescription_ids(identifier.strip())
+    if not presc_ids:
+        raise ServiceError("Prescription not found.")
+    store = get_store()
+    store.update_prescriptions([store.prescriptions[presc_id].replace(details=details)
+                                for presc_id in presc_ids])
+    return len(presc_ids)
+
+def prescriptions_for(full_name):
+    """Returns the IDs of the named patient's prescriptions."""
+    pid = find_patient_by_name(full_name.strip().lower())
+    if not pid:
+        raise ServiceError("Patient not found.")
+    presc_ids = get_store().prescriptions_for_patient(pid)
+    if not presc_ids:
+        raise ServiceError("Prescription not found.")
+    return presc_ids
+
+def delete_prescriptions(presc_ids):
+    return get_store().delete_prescriptions(presc_ids)
+
+def recall_list(first_day, last_day):
+    """Returns recall rows (see bulk_io.RECALL_COLUMNS) for an expiry window."""
+    return list(recall_rows(first_day, last_day))
+
+def export_recalls(path, first_day, last_day):
+    """Writes the recall list for an expiry window to a CSV file; returns the count."""
+    return _export_recalls(path, first_day, last_day)
+
+# ---------- Inactive patients ----------
+
+def inactive_patients(task=None):
+    """Returns the Patients with no prescription in the last INACTIVE_AFTER_DAYS.
+
+    Accepts a tasks.Task to report progress; returns None if it is cancelled.
+    """
+    store = get_store()
+    ids = store.inactive_patients(today_ordinal() - INACTIVE_AFTER_DAYS)
+    patients = []
+    for i, pid in enumerate(ids):
+        if task is not None:
+            if task.cancelled:
+                return None
+            if i % 1000 == 0:
+                task.report(i, len(ids))
+        patient = store.get_patient(pid)
+        if patient is not None:
+            patients.append(patient)
+    return patients
+
+def purge_patients(pids):
+    """Deletes patients with their appointments and prescriptions; returns the count."""
+    return get_store().delete_patients(set(pids))
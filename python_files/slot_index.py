@@ -0,0 +1,150 @@
+# slot_index.py
+import bisect
+
+from constants import OPENING_TIME, CLOSING_TIME, SLOT_MINUTES
+
+def time_to_minutes(time_text):
+    """Converts HH:MM to minutes since midnight, or None if malformed."""
+    parts = time_text.split(":")
+    if len(parts) != 2 or not parts[0].isdigit() or not parts[1].isdigit():
+        return None
+    return int(parts[0]) * 60 + int(parts[1])
+
+def minutes_to_time(minutes):
+    """Converts minutes since midnight back to HH:MM."""
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+OPENING_MINUTES = time_to_minutes(OPENING_TIME)
+CLOSING_MINUTES = time_to_minutes(CLOSING_TIME)
+SLOTS_PER_DAY = (CLOSING_MINUTES - OPENING_MINUTES) // SLOT_MINUTES
+FULL_DAY = (1 << SLOTS_PER_DAY) - 1
+
+def slot_number(minutes):
+    """Index of the opening-hours slot containing minutes, or None outside them."""
+    if minutes is None or not OPENING_MINUTES <= minutes < CLOSING_MINUTES:
+        return None
+    return (minutes - OPENING_MINUTES) // SLOT_MINUTES
+
+def slot_time(slot):
+    """Start time (HH:MM) of an opening-hours slot."""
+    return minutes_to_time(OPENING_MINUTES + slot * SLOT_MINUTES)
+
+def _slot_key(date, time_text):
+    minutes = time_to_minutes(time_text)
+    return (date, time_text if minutes is None else minutes)
+
+class SlotIndex:
+    """Index of booked appointment slots.
+
+    Dates may be any hashable key; RecordStore uses day ordinals.
+
+    Booked appointment IDs are kept per (date, time) for O(1) conflict
+    checks (times are compared as minutes, so "9:00" and "09:00" clash),
+    and the booked times of each date are kept sorted (as minutes) so
+    range and free-slot queries never scan the appointments.
+
+    Each date also has an occupancy bitmap: bit i is set while any booking
+    falls in the i-th SLOT_MINUTES slot between opening and closing time,
+    so a day view or a next-free-slot search is a few integer operations
+    per day.
+    """
+
+    def __init__(self):
+        self.slots = {}
+        self.times_by_date = {}
+        self.occupancy = {}
+
+    def clear(self):
+        self.slots = {}
+        self.times_by_date = {}
+        self.occupancy = {}
+
+    def add(self, date, time_text, aid):
+        """Marks (date, time) as booked by the given appointment."""
+        ids = self.slots.setdefault(_slot_key(date, time_text), set())
+        if not ids:
+            minutes = time_to_minutes(time_text)
+            if minutes is not None:
+                bisect.insort(self.times_by_date.setdefault(date, []), minutes)
+                slot = slot_number(minutes)
+                if slot is not None:
+                    self.occupancy[date] = self.occupancy.get(date, 0) | (1 << slot)
+        ids.add(aid)
+
+    def remove(self, date, time_text, aid):
+        """Releases the booking of (date, time) by the given appointment."""
+        key = _slot_key(date, time_text)
+        ids = self.slots.get(key)
+        if ids is None:
+            return
+        ids.discard(aid)
+        if ids:
+            return
+        del self.slots[key]
+        minutes = time_to_minutes(time_text)
+        times = self.times_by_date.get(date)
+        if minutes is None or times is None:
+            return
+        pos = bisect.bisect_left(times, minutes)
+        if pos < len(times) and times[pos] == minutes:
+            del times[pos]
+        slot = slot_number(minutes)
+        if slot is not None:
+            # Clear the slot's bit unless another booking (e.g. 09:15 next
+            # to 09:00) still falls inside it.
+            slot_start = OPENING_MINUTES + slot * SLOT_MINUTES
+            pos = bisect.bisect_left(times, slot_start)
+            if pos == len(times) or times[pos] >= slot_start + SLOT_MINUTES:
+                mask = self.occupancy.get(date, 0) & ~(1 << slot)
+                if mask:
+                    self.occupancy[date] = mask
+                else:
+                    self.occupancy.pop(date, None)
+        if not times:
+            del self.times_by_date[date]
+
+    def is_booked(self, date, time_text):
+        return bool(self.slots.get(_slot_key(date, time_text)))
+
+    def booked_ids(self, date, time_text):
+        return set(self.slots.get(_slot_key(date, time_text), ()))
+
+    def occupied(self, date):
+        """Returns the occupancy bitmap of date (bit i = slot i is taken)."""
+        return self.occupancy.get(date, 0)
+
+    def next_free(self, first_day, first_slot=0, max_days=366):
+        """Finds the first free slot on or after (first_day, first_slot).
+
+        Days must be day ordinals.  Returns (day, slot) or None when every
+        slot in the next max_days days is taken.
+        """
+        after = ~((1 << first_slot) - 1)
+        for day in range(first_day, first_day + max_days):
+            free = ~self.occupancy.get(day, 0) & FULL_DAY & after
+            if free:
+                return day, (free & -free).bit_length() - 1
+            after = -1
+        return None
+
+    def booked_times(self, date, start=OPENING_TIME, end=CLOSING_TIME):
+        """Returns the booked times on date in [start, end), sorted."""
+        times = self.times_by_date.get(date, [])
+        lo = bisect.bisect_left(times, time_to_minutes(start))
+        hi = bisect.bisect_left(times, time_to_minutes(end))
+        return [minutes_to_time(m) for m in times[lo:hi]]
+
+    def free_slots(self, date, start=OPENING_TIME, end=CLOSING_TIME, step=SLOT_MINUTES):
+        """Returns the unbooked slot start times on date in [start, end)."""
+        first = time_to_minutes(start)
+        last = time_to_minutes(end)
+        times = self.times_by_date.get(date, [])
+        pos = bisect.bisect_left(times, first)
+        free = []
+        for minutes in range(first, last, step):
+            while pos < len(times) and times[pos] < minutes:
+                pos += 1
+            if pos < len(times) and times[pos] == minutes:
+                continue
+            free.append(minutes_to_time(minutes))
+        return free
@@ -0,0 +1,80 @@
+# snapshot.py
+"""Warm-start snapshot of the parsed record store.
+
+The store's tables and indexes are pickled to SNAPSHOT_FILE together
+with the stamp (see file_handler.file_stamp) of the record files they
+were built from.  On the next start they are restored in one read
+instead of parsing and indexing every row again, as long as the stamp
+still matches.  Any change to the files, by this process or another,
+leaves the snapshot stale and it is ignored.
+
+Unpickling runs code, so the snapshot is kept in the user's own local
+cache folder, never next to the record files, which other desks may
+write over a shared drive.  There is one per record folder.
+"""
+import gc
+import hashlib
+import os
+import pickle
+from contextlib import contextmanager
+
+from constants import PATIENTS_FILE, SNAPSHOT_FILE
+from logger import log_error, timed
+
+# Bump when the pickled store layout changes.
+FORMAT = 1
+
+def snapshot_path():
+    """This user's snapshot of the record files in the current record folder."""
+    if os.name == "nt":
+        base = os.environ.get("LOCALAPPDATA") or os.path.expanduser("~")
+    else:
+        base = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    folder = os.path.dirname(os.path.abspath(PATIENTS_FILE))
+    key = hashlib.sha256(folder.encode("utf-8")).hexdigest()[:16]
+    return os.path.join(base, "optician", f"{key}-{SNAPSHOT_FILE}")
+
+@contextmanager
+def paused_gc():
+    """Suspends the cyclic GC while millions of small objects are created."""
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+@timed("snapshot.load")
+def load(stamp):
+    """Returns the saved state if it was built from files with this stamp, else None."""
+    if not SNAPSHOT_FILE:
+        return None
+    path = snapshot_path()
+    try:
+        with open(path, "rb") as f, paused_gc():
+            header = pickle.load(f)
+            if header != (FORMAT, stamp):
+                return None
+            return pickle.load(f)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        log_error(f"Ignoring unreadable snapshot {path}: {e!r}")
+        return None
+
+@timed("snapshot.save")
+def save(state, stamp):
+    """Writes state as the snapshot of files with this stamp."""
+    if not SNAPSHOT_FILE:
+        return
+    path = snapshot_path()
+    tmp = path + ".tmp"
+    try:
+        os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+        with open(tmp, "wb") as f:
+            pickle.dump((FORMAT, stamp), f, pickle.HIGHEST_PROTOCOL)
+            pickle.dump(state, f, pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+    except Exception as e:
+        log_error(f"Error writing snapshot {path}: {e}")
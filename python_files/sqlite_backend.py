@@ -0,0 +1,256 @@
+# sqlite_backend.py
+import os
+import sqlite3
+import threading
+
+from constants import (PATIENTS_FILE, APPOINTMENTS_FILE, PRESCRIPTIONS_FILE, ADMIN_FILE,
+                       SQLITE_DB_FILE, LOG_FILE)
+from logger import log_error
+from records import format_line, Patient, Appointment, Prescription, Admin
+
+# Record file -> (table, columns).  The first column is the record ID and the
+# column order matches the comma-separated field order of the .txt files.
+TABLES = {
+    PATIENTS_FILE: ("patients", ("patient_id", "first_name", "last_name", "dob",
+                                 "phone", "email", "address")),
+    APPOINTMENTS_FILE: ("appointments", ("appointment_id", "patient_id", "patient_name",
+                                         "date", "time", "status", "reason")),
+    PRESCRIPTIONS_FILE: ("prescriptions", ("prescription_id", "patient_id", "patient_name",
+                                           "details", "issue_date", "expiry_date")),
+    ADMIN_FILE: ("admins", ("admin_id", "username", "password_hash")),
+}
+RECORD_TYPES = {PATIENTS_FILE: Patient, APPOINTMENTS_FILE: Appointment,
+                PRESCRIPTIONS_FILE: Prescription, ADMIN_FILE: Admin}
+
+INDEXES = (
+    "CREATE INDEX IF NOT EXISTS idx_patients_name ON patients "
+    "(first_name COLLATE NOCASE, last_name COLLATE NOCASE)",
+    "CREATE INDEX IF NOT EXISTS idx_appointments_patient ON appointments (patient_id)",
+    "CREATE INDEX IF NOT EXISTS idx_appointments_slot ON appointments (date, time)",
+    "CREATE INDEX IF NOT EXISTS idx_prescriptions_patient ON prescriptions (patient_id)",
+    "CREATE UNIQUE INDEX IF NOT EXISTS idx_admins_username ON admins (username)",
+)
+
+# Every write also logs the IDs it touched in "changes", in the same
+# transaction, so other processes catch up by querying what changed since
+# the last seq they read.  A full rewrite logs REPLACED instead of its IDs.
+CHANGES = ("CREATE TABLE IF NOT EXISTS changes (seq INTEGER PRIMARY KEY AUTOINCREMENT, "
+           "tbl TEXT NOT NULL, op TEXT NOT NULL, record_id TEXT)")
+UPSERTED, DELETED, REPLACED = "+", "-", "*"
+CHANGES_KEPT = 10000
+
+_local = threading.local()
+
+def connect(db_file=SQLITE_DB_FILE):
+    """Returns this thread's connection, creating the schema on first use."""
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = sqlite3.connect(db_file)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        for table, columns in TABLES.values():
+            cols = ", ".join(f"{col} TEXT" if i else f"{col} TEXT PRIMARY KEY"
+                             for i, col in enumerate(columns))
+            conn.execute(f"CREATE TABLE IF NOT EXISTS {table} ({cols})")
+        conn.execute(CHANGES)
+        for statement in INDEXES:
+            conn.execute(statement)
+        conn.commit()
+        _local.conn = conn
+    return conn
+
+def _record_file(filename):
+    name = os.path.basename(filename)
+    for record_file in TABLES:
+        if os.path.basename(record_file) == name:
+            return record_file
+    raise ValueError(f"No table for {filename}")
+
+def _table(filename):
+    return TABLES[_record_file(filename)]
+
+def _rows(filename, records):
+    """Record lines as column tuples, parsed the way the text loader does."""
+    record_type = RECORD_TYPES[_record_file(filename)]
+    return [record_type.from_line(record).fields() for record in records]
+
+def _upsert_sql(table, columns):
+    placeholders = ", ".join("?" for _ in columns)
+    updates = ", ".join(f"{col} = excluded.{col}" for col in columns[1:])
+    return (f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders}) "
+            f"ON CONFLICT ({columns[0]}) DO UPDATE SET {updates}")
+
+def _log_changes(conn, table, op, record_ids):
+    """Logs a write in "changes"; call inside the write's transaction."""
+    conn.executemany("INSERT INTO changes (tbl, op, record_id) VALUES (?, ?, ?)",
+                     [(table, op, rid) for rid in record_ids])
+    conn.execute("DELETE FROM changes WHERE seq <= (SELECT MAX(seq) FROM changes) - ?",
+                 (CHANGES_KEPT,))
+
+# ---------- file_handler interface ----------
+
+def read_rows(filename):
+    """Returns the table's rows as field tuples, in insertion order."""
+    table, columns = _table(filename)
+    try:
+        rows = connect().execute(f"SELECT {', '.join(columns)} FROM {table} ORDER BY rowid")
+        return [tuple(value or "" for value in row) for row in rows]
+    except sqlite3.Error as e:
+        log_error(f"Error reading {table}: {e}")
+        return []
+
+def read_records(filename):
+    """Returns the table's rows as record lines, in insertion order."""
+    return [format_line(row) for row in read_rows(filename)]
+
+def read_row(filename, record_id):
+    """Returns one row by its ID (the primary key) as a field tuple, or None."""
+    table, columns = _table(filename)
+    try:
+        row = connect().execute(f"SELECT {', '.join(columns)} FROM {table} "
+                                f"WHERE {columns[0]} = ?", (str(record_id).strip(),)).fetchone()
+    except sqlite3.Error as e:
+        log_error(f"Error reading {table}: {e}")
+        return None
+    return None if row is None else tuple(value or "" for value in row)
+
+def position():
+    """The seq of the last logged change, for read_changes()."""
+    return connect().execute("SELECT COALESCE(MAX(seq), 0) FROM changes").fetchone()[0]
+
+def read_changes(filename, since):
+    """Returns (entries, position) for a table's changes after seq since.
+
+    Entries are file_handler journal entries carrying the rows as they
+    are now.  None when the table was rewritten since, or the log no
+    longer reaches back that far.
+    """
+    table, columns = _table(filename)
+    conn = connect()
+    try:
+        first, last = conn.execute("SELECT MIN(seq), COALESCE(MAX(seq), 0) FROM changes").fetchone()
+        if first is not None and first > since + 1:
+            return None
+        changes = conn.execute("SELECT op, record_id FROM changes WHERE seq > ? AND seq <= ? "
+                               "AND tbl = ? ORDER BY seq", (since, last, table)).fetchall()
+        if any(op == REPLACED for op, _ in changes):
+            return None
+        # Rows are read after the log, so they are at least as new as it.
+        record_ids = list(dict.fromkeys(rid for _, rid in changes))
+        rows = {}
+        for i in range(0, len(record_ids), 500):
+            chunk = record_ids[i:i + 500]
+            for row in conn.execute(f"SELECT {', '.join(columns)} FROM {table} WHERE "
+                                    f"{columns[0]} IN ({', '.join('?' for _ in chunk)})", chunk):
+                rows[row[0]] = tuple(value or "" for value in row)
+    except sqlite3.Error as e:
+        log_error(f"Error reading changes to {table}: {e}")
+        return None
+    entries = [UPSERTED + format_line(rows[rid]) if rid in rows else DELETED + rid
+               for rid in record_ids]
+    return entries, last
+
+def upsert_records(filename, records):
+    table, columns = _table(filename)
+    conn = connect()
+    rows = _rows(filename, records)
+    try:
+        with conn:
+            conn.executemany(_upsert_sql(table, columns), rows)
+            _log_changes(conn, table, UPSERTED, [row[0] for row in rows])
+    except sqlite3.Error as e:
+        log_error(f"Error writing {table}: {e}")
+        return False
+
+def append_record(filename, record):
+    return upsert_records(filename, [record])
+
+def append_records(filename, records):
+    return upsert_records(filename, records)
+
+def delete_records(filename, record_ids):
+    return delete_records_atomic({filename: record_ids})
+
+def delete_records_atomic(deletions):
+    """Deletes rows from several tables in one transaction."""
+    conn = connect()
+    try:
+        with conn:
+            for filename, record_ids in deletions.items():
+                table, columns = _table(filename)
+                record_ids = [str(rid).strip() for rid in record_ids]
+                conn.executemany(f"DELETE FROM {table} WHERE {columns[0]} = ?",
+                                 [(rid,) for rid in record_ids])
+                _log_changes(conn, table, DELETED, record_ids)
+        return True
+    except sqlite3.Error as e:
+        log_error(f"Error deleting from {', '.join(deletions)}: {e}")
+        return False
+
+def write_records_atomic(snapshots):
+    """Replaces the contents of several tables in one transaction."""
+    conn = connect()
+    try:
+        with conn:
+            for filename, records in snapshots.items():
+                table, columns = _table(filename)
+                conn.execute(f"DELETE FROM {table}")
+                conn.executemany(_upsert_sql(table, columns), _rows(filename, records))
+                _log_changes(conn, table, REPLACED, [None])
+        return True
+    except sqlite3.Error as e:
+        log_error(f"Error committing {', '.join(snapshots)}: {e}")
+        return False
+
+def write_records(filename, records):
+    return write_records_atomic({filename: records})
+
+# ---------- Indexed queries ----------
+
+def find_patients_by_name(first_name, last_name=None):
+    """Returns patient IDs by case-insensitive exact first/last name."""
+    sql = "SELECT patient_id FROM patients WHERE first_name = ? COLLATE NOCASE"
+    params = [first_name]
+    if last_name is not None:
+        sql += " AND last_name = ? COLLATE NOCASE"
+        params.append(last_name)
+    return [row[0] for row in connect().execute(sql, params)]
+
+def appointments_for_patient(pid):
+    return [row[0] for row in connect().execute(
+        "SELECT appointment_id FROM appointments WHERE patient_id = ? ORDER BY rowid", (pid,))]
+
+def prescriptions_for_patient(pid):
+    return [row[0] for row in connect().execute(
+        "SELECT prescription_id FROM prescriptions WHERE patient_id = ? ORDER BY rowid", (pid,))]
+
+def booked_appointment(date, time_text):
+    """Returns the ID of the booked appointment at (date, time), or None."""
+    row = connect().execute(
+        "SELECT appointment_id FROM appointments "
+        "WHERE date = ? AND time = ? AND status = 'Booked' COLLATE NOCASE LIMIT 1",
+        (date, time_text)).fetchone()
+    return row[0] if row else None
+
+# ---------- Migration ----------
+
+def migrate_text_files():
+    """One-shot import of the .txt record files into the SQLite tables."""
+    from file_handler import read_text_records
+    counts = {}
+    snapshots = {}
+    for filename in TABLES:
+        records = read_text_records(filename)
+        snapshots[filename] = records
+        counts[filename] = len(records)
+    if not write_records_atomic(snapshots):
+        return None
+    return counts
+
+if __name__ == "__main__":
+    result = migrate_text_files()
+    if result is None:
+        print(f"Migration failed; see {LOG_FILE}.")
+    else:
+        for filename, count in result.items():
+            print(f"{filename}: {count} records migrated to {SQLITE_DB_FILE}")
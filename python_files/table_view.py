@@ -0,0 +1,161 @@
+# table_view.py
+import tkinter as tk
+from tkinter import ttk
+
+PAGE_SIZE = 100
+
+class PagedTable(tk.Frame):
+    """A ttk.Treeview that only materializes the current page of rows.
+
+    ids_for(column, reverse) returns the ordered row IDs for a sort column
+    and get_row(row_id) returns a row's fields; rows are fetched from the
+    store only when their page is shown.  Clicking a heading sorts by it.
+    Given get_rows(row_ids), a page is fetched in one call instead.  With a
+    tasks.TaskRunner, ids_for and get_rows run off the Tk thread.  Given
+    sort_key(row_id, column), apply() slots changed rows into the current
+    order instead of re-fetching all of it.
+    """
+
+    def __init__(self, master, columns, ids_for, get_row,
+                 empty_text="No records.", page_size=PAGE_SIZE, runner=None, sort_key=None,
+                 get_rows=None):
+        super().__init__(master)
+        self.runner = runner
+        self.ids_for = ids_for
+        self.get_row = get_row
+        self.get_rows = get_rows
+        self.sort_key = sort_key
+        self.empty_text = empty_text
+        self.page_size = page_size
+        self.sort_column = 0
+        self.reverse = False
+        self.page = 0
+        self.ids = []
+        self.pending = None
+
+        keys = [f"c{i}" for i in range(len(columns))]
+        body = tk.Frame(self)
+        body.pack(fill=tk.BOTH, expand=True)
+        self.tree = ttk.Treeview(body, columns=keys, show="headings", height=20)
+        for i, (key, title) in enumerate(zip(keys, columns)):
+            self.tree.heading(key, text=title, command=lambda i=i: self.sort_by(i))
+            self.tree.column(key, width=110, stretch=True)
+        scrollbar = ttk.Scrollbar(body, orient=tk.VERTICAL, command=self.tree.yview)
+        self.tree.configure(yscrollcommand=scrollbar.set)
+        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+
+        nav = tk.Frame(self)
+        nav.pack(fill=tk.X)
+        tk.Button(nav, text="< Prev", command=self.prev_page).pack(side=tk.LEFT)
+        tk.Button(nav, text="Next >", command=self.next_page).pack(side=tk.RIGHT)
+        self.status = tk.Label(nav)
+        self.status.pack()
+
+    def refresh(self):
+        """Re-fetches the row order and redraws the current page."""
+        if self.runner is None:
+            self.set_ids(self.ids_for(self.sort_column, self.reverse))
+        else:
+            self.status.config(text="Loading...")
+            self.runner.submit(self.ids_for, self.sort_column, self.reverse,
+                               on_done=self.set_ids)
+
+    def set_ids(self, ids):
+        if not self.winfo_exists():
+            return
+        self.ids = ids
+        last_page = max(0, (len(self.ids) - 1) // self.page_size)
+        self.page = min(self.page, last_page)
+        self.show_page()
+
+    def apply(self, changes):
+        """Updates the view for change_feed Changes to its rows.
+
+        Touched rows are taken out of the order and the ones that still
+        exist are put back at their sorted position; the page is redrawn
+        only if its rows moved, otherwise just the touched rows are.
+        """
+        touched = set()
+        for change in changes:
+            touched.update(change.record_ids)
+        if not touched:
+            return
+        if self.sort_key is None:
+            self.refresh()
+            return
+        # A new list: the old one may be shared with the store's sort cache.
+        ids = [row_id for row_id in self.ids if row_id not in touched]
+        for row_id in touched:
+            key = self.sort_key(row_id, self.sort_column)
+            if key is not None:
+                ids.insert(self._position(ids, key), row_id)
+        self.ids = ids
+        last_page = max(0, (len(ids) - 1) // self.page_size)
+        self.page = min(self.page, last_page)
+        start = self.page * self.page_size
+        shown = self.tree.get_children()
+        if tuple(ids[start:start + self.page_size]) != shown:
+            self.show_page()
+            return
+        for row_id in touched.intersection(shown):
+            row = self.get_row(row_id)
+            if row is not None:
+                self.tree.item(row_id, values=row)
+
+    def _position(self, ids, key):
+        """Binary search for where a row with this sort key belongs."""
+        lo, hi = 0, len(ids)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            other = self.sort_key(ids[mid], self.sort_column)
+            if other is None or (other > key if self.reverse else other <= key):
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def show_page(self):
+        start = self.page * self.page_size
+        row_ids = self.pending = self.ids[start:start + self.page_size]
+        if self.get_rows is None:
+            self._fill(start, row_ids, [self.get_row(row_id) for row_id in row_ids])
+        elif self.runner is None:
+            self._fill(start, row_ids, self.get_rows(row_ids))
+        else:
+            self.status.config(text="Loading...")
+            self.runner.submit(self.get_rows, row_ids,
+                               on_done=lambda rows: self._fill(start, row_ids, rows))
+
+    def _fill(self, start, row_ids, rows):
+        # Skip a page that was closed, or replaced by another one meanwhile.
+        if not self.winfo_exists() or row_ids is not self.pending:
+            return
+        self.tree.delete(*self.tree.get_children())
+        for row_id, row in zip(row_ids, rows):
+            if row is not None:
+                self.tree.insert("", tk.END, iid=row_id, values=row)
+        if self.ids:
+            end = min(start + self.page_size, len(self.ids))
+            self.status.config(text=f"Rows {start + 1}-{end} of {len(self.ids)}")
+        else:
+            self.status.config(text=self.empty_text)
+
+    def sort_by(self, column):
+        if column == self.sort_column:
+            self.reverse = not self.reverse
+        else:
+            self.sort_column = column
+            self.reverse = False
+        self.page = 0
+        self.refresh()
+
+    def next_page(self):
+        if (self.page + 1) * self.page_size < len(self.ids):
+            self.page += 1
+            self.show_page()
+
+    def prev_page(self):
+        if self.page > 0:
+            self.page -= 1
+            self.show_page()
@@ -0,0 +1,152 @@
+# tasks.py
+import queue
+import threading
+import tkinter as tk
+from concurrent.futures import ThreadPoolExecutor
+from tkinter import messagebox, ttk
+
+from logger import log_error, timed
+
+class Task:
+    """Handle for a background job: progress reporting and cancellation.
+
+    Jobs submitted with pass_task=True receive their Task as the "task"
+    keyword argument and may call report() and check cancelled.
+    """
+
+    def __init__(self, title=None):
+        self.title = title
+        self.progress = None
+        self._cancel = threading.Event()
+
+    def report(self, done, total):
+        self.progress = (done, total)
+
+    def cancel(self):
+        self._cancel.set()
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+class TaskRunner:
+    """Runs store work on a thread pool and hands results back to Tk.
+
+    Worker threads never touch Tk: finished jobs are queued and their
+    callbacks run on the Tk thread from an after() poll, which is only
+    scheduled while jobs are outstanding.
+    """
+
+    def __init__(self, root, max_workers=4, poll_ms=50):
+        self.root = root
+        self.poll_ms = poll_ms
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        self.results = queue.Queue()
+        self.pending = 0
+        self.dialogs = {}
+
+    def submit(self, func, *args, on_done=None, on_error=None, title=None,
+               pass_task=False, **kwargs):
+        """Runs func(*args, **kwargs) in the background and returns its Task.
+
+        on_done(result) / on_error(exc) are called on the Tk thread unless
+        the task was cancelled.  A title shows a progress dialog while the
+        job runs.  Only jobs given their Task (pass_task) can stop early,
+        so only their dialog has a Cancel button.
+        """
+        task = Task(title)
+        if pass_task:
+            kwargs["task"] = task
+        name = f"task.{getattr(func, '__name__', 'job')}"
+
+        def run():
+            try:
+                with timed(name):
+                    result = func(*args, **kwargs)
+                self.results.put((task, True, result, on_done, on_error))
+            except Exception as e:
+                self.results.put((task, False, e, on_done, on_error))
+
+        if title:
+            self.dialogs[task] = ProgressDialog(self.root, task, cancellable=pass_task)
+        self.executor.submit(run)
+        self.pending += 1
+        if self.pending == 1:
+            self.root.after(self.poll_ms, self.poll)
+        return task
+
+    def poll(self):
+        while True:
+            try:
+                task, ok, value, on_done, on_error = self.results.get_nowait()
+            except queue.Empty:
+                break
+            self.pending -= 1
+            dialog = self.dialogs.pop(task, None)
+            try:
+                if dialog is not None:
+                    dialog.close()
+                if not task.cancelled:
+                    self._deliver(ok, value, on_done, on_error)
+            except Exception as e:
+                # e.g. a TclError from a window closed while the job ran;
+                # the poll must go on for the other jobs.
+                log_error(f"Task callback failed: {e!r}")
+        try:
+            for dialog in self.dialogs.values():
+                dialog.update_progress()
+        finally:
+            if self.pending:
+                self.root.after(self.poll_ms, self.poll)
+
+    def _deliver(self, ok, value, on_done, on_error):
+        if ok:
+            if on_done is not None:
+                on_done(value)
+        elif on_error is not None:
+            on_error(value)
+        else:
+            log_error(f"Background task failed: {value!r}")
+            messagebox.showerror("Error", f"Operation failed: {value}")
+
+    def shutdown(self):
+        for task in list(self.dialogs):
+            task.cancel()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+class ProgressDialog:
+    """Small window with a progress bar (and a Cancel button) for a Task."""
+
+    def __init__(self, root, task, cancellable=True):
+        self.task = task
+        self.win = tk.Toplevel(root)
+        self.win.title(task.title)
+        self.win.resizable(False, False)
+        tk.Label(self.win, text=task.title, padx=20, pady=10).pack()
+        self.bar = ttk.Progressbar(self.win, length=250, mode="indeterminate")
+        self.bar.pack(padx=20)
+        self.bar.start(15)
+        if cancellable:
+            tk.Button(self.win, text="Cancel", command=self.cancel).pack(pady=10)
+            self.win.protocol("WM_DELETE_WINDOW", self.cancel)
+        else:
+            # Closing the window must not look like it stopped the job.
+            self.win.protocol("WM_DELETE_WINDOW", lambda: None)
+
+    def update_progress(self):
+        if self.task.progress is None:
+            return
+        done, total = self.task.progress
+        if str(self.bar["mode"]) != "determinate":
+            self.bar.stop()
+            self.bar.config(mode="determinate")
+        self.bar.config(maximum=max(total, 1), value=done)
+
+    def cancel(self):
+        self.task.cancel()
+        self.close()
+
+    def close(self):
+        if self.win is not None:
+            self.win.destroy()
+            self.win = None
@@ -1,118 +1,70 @@
 # ui.py
+import threading
 import tkinter as tk
-from tkinter import messagebox
-import datetime
-import hashlib
-
-from constants import PATIENTS_FILE, APPOINTMENTS_FILE, PRESCRIPTIONS_FILE, ADMIN_FILE
-from file_handler import read_records, write_records, append_record
-from validation import (validate_nonempty, validate_future_date, validate_past_date,
-                        validate_phone, validate_age, validate_email, validate_time)
+from tkinter import messagebox, filedialog
+
+from bulk_io import RECALL_DAYS
+from constants import FILE_CHECK_MS, SERVER_TOKEN, SERVER_URL, VIEW_POLL_MS
+from dates import date_to_ordinal, ordinal_to_date, today_ordinal
+from logger import log_error, log_info, log_warning, timed
+from services import ServiceError
+from table_view import PagedTable
+from tasks import TaskRunner
+
+if SERVER_URL:
+    # Thin client: the same operations, run by the shared server.
+    import client as services
+    services.configure(SERVER_URL, SERVER_TOKEN)
+else:
+    import services
 
 # ---------- Helper Functions ----------
 
-def hash_password(password):
-    return hashlib.sha256(password.encode()).hexdigest()
-
-# Passwords
-password1 = "password123"
-password2 = "mrivera123"
-
-# Generate hashes
-hash1 = hash_password(password1)
-hash2 = hash_password(password2)
-
-print(f"Hash for 'password123': {hash1}")
-print(f"Hash for 'mrivera123': {hash2}")
-
-def get_patient_by_name(full_name):
-    """Return patient ID by matching any part (first, last, or full) of the name."""
-    full_name = full_name.strip().lower()
-    records = read_records(PATIENTS_FILE)
-    matches = []
-    for rec in records:
-        parts = rec.split(",")
-        if len(parts) < 3:
-            continue
-        first = parts[1].strip().lower()
-        last = parts[2].strip().lower()
-        combined = f"{first} {last}"
-        if full_name in first or full_name in last or full_name in combined:
-            matches.append(parts[0].strip())
-    if len(matches) == 1:
-        return matches[0]
-    elif len(matches) > 1:
-        messagebox.showerror("Ambiguity", "Multiple patients match the name. Please specify by ID.")
-        return None
+def show_error(error):
+    """Shows a failed service call; used as on_error for background calls."""
+    if isinstance(error, ServiceError):
+        messagebox.showerror(error.title, error.message)
     else:
+        log_error(f"Background task failed: {error!r}")
+        messagebox.showerror("Error", f"Operation failed: {error}")
+
+def call(func, *args):
+    """Runs a quick service lookup on the Tk thread; returns None after showing an error."""
+    try:
+        return func(*args)
+    except ServiceError as e:
+        show_error(e)
         return None
 
-def get_patient_full_name(pid):
-    """Returns the full name for the given patient ID."""
-    records = read_records(PATIENTS_FILE)
-    for rec in records:
-        parts = rec.split(",")
-        if parts[0].strip() == pid:
-            return f"{parts[1].strip()} {parts[2].strip()}"
-    return "Unknown"
-
-def get_patient_id(identifier):
-    """If identifier is numeric, returns it; otherwise, uses name lookup."""
-    identifier = identifier.strip()
-    if identifier.isdigit():
-        return identifier
-    else:
-        return get_patient_by_name(identifier)
+def run(func, *args, on_done=None, title=None):
+    """Runs a service operation in the background, reporting failures."""
+    return tasks.submit(func, *args, on_done=on_done, on_error=show_error, title=title)
 
 # ---------- ADMIN LOGIN ----------
-def load_admins():
-    """Reads admins from ADMIN_FILE. Format: AdminID,Username,PasswordHash."""
-    admins = {}
-    records = read_records(ADMIN_FILE)
-    for rec in records:
-        parts = rec.split(",")
-        if len(parts) >= 3:
-            username = parts[1].strip()
-            password_hash = parts[2].strip()
-            admins[username] = password_hash
-    return admins
-
+@timed("ui.login")
 def login():
-    """Handles the admin login process."""
+    """Checks the admin login on a worker so slow password hashing never blocks Tk."""
     username = entry_username.get().strip()
-    password = entry_password.get().strip()
-    admins = load_admins()
-    password_hash = hash_password(password)
-    
-    # Log the entered username and password hash
-    print(f"Entered Username: {username}")
-    print(f"Entered Password Hash: {password_hash}")
-    
-    if username in admins:
-        print(f"Stored Password Hash: {admins[username]}")
-        if admins[username] == password_hash:
-            messagebox.showinfo("Login Success", f"Welcome, {username}!")
-            login_root.destroy()
-            open_main_ui()
-        else:
-            messagebox.showerror("Login Failed", "Invalid password.")
-    else:
-        messagebox.showerror("Login Failed", "Invalid username.")
+    login_button.config(state="disabled")
 
-# ---------- PATIENT MANAGEMENT ----------
-def generate_patient_id():
-    """Generates a new unique patient ID."""
-    records = read_records(PATIENTS_FILE)
-    max_id = 0
-    for rec in records:
-        try:
-            pid = int(rec.split(",")[0].strip())
-            if pid > max_id:
-                max_id = pid
-        except:
-            continue
-    return str(max_id + 1)
+    def done(_):
+        log_info("login", username=username)
+        messagebox.showinfo("Login Success", f"Welcome, {username}!")
+        login_tasks.shutdown()
+        login_root.destroy()
+        open_main_ui()
+
+    def failed(error):
+        login_button.config(state="normal")
+        if isinstance(error, ServiceError):
+            log_warning("login failed", username=username)
+        show_error(error)
+
+    login_tasks.submit(services.authenticate, username, entry_password.get(),
+                       on_done=done, on_error=failed)
 
+# ---------- PATIENT MANAGEMENT ----------
+@timed("ui.add_patient")
 def add_patient():
     """Opens a window to add a new patient."""
     win = tk.Toplevel(main_ui)
@@ -136,34 +88,21 @@ def add_patient():
     address_entry = tk.Entry(win)
     address_entry.pack()
     
+    @timed("ui.add_patient.save")
     def save():
         """Saves the new patient record."""
         first = first_entry.get().strip()
         last = last_entry.get().strip()
-        dob = dob_entry.get().strip()
-        phone = phone_entry.get().strip()
-        email = email_entry.get().strip()
-        address = address_entry.get().strip()
-        if not (validate_nonempty(first, "First Name") and
-                validate_nonempty(last, "Last Name") and
-                validate_nonempty(dob, "Date of Birth") and
-                validate_nonempty(phone, "Phone") and
-                validate_nonempty(email, "Email") and
-                validate_nonempty(address, "Address")):
-            return
-        if not validate_past_date(dob):
-            return
-        if not (validate_phone(phone) and validate_email(email)):
-            return
-        pid = generate_patient_id()
-        record = f"{pid},{first},{last},{dob},{phone},{email},{address}"
-        append_record(PATIENTS_FILE, record)
-        messagebox.showinfo("Success", f"Patient added with ID {pid}.")
-        win.destroy()
-        # Automatically open appointment booking with the new patient's full name.
-        book_appointment(f"{first} {last}")
+        def saved(pid):
+            messagebox.showinfo("Success", f"Patient added with ID {pid}.")
+            win.destroy()
+            # Automatically open appointment booking with the new patient's full name.
+            book_appointment(f"{first} {last}")
+        run(services.add_patient, first, last, dob_entry.get(), phone_entry.get(),
+            email_entry.get(), address_entry.get(), on_done=saved)
     tk.Button(win, text="Save", command=save).pack()
 
+@timed("ui.search_patient")
 def search_patient():
     """Opens a window to search for a patient."""
     win = tk.Toplevel(main_ui)
@@ -171,23 +110,18 @@ def search_patient():
     tk.Label(win, text="Enter Full Name (First Last):").pack()
     query_entry = tk.Entry(win)
     query_entry.pack()
+    @timed("ui.search_patient.search")
     def search():
         """Searches for a patient by full name."""
-        query = query_entry.get().strip().lower()
-        records = read_records(PATIENTS_FILE)
-        results = []
-        for rec in records:
-            parts = rec.split(",")
-            if len(parts) >= 3:
-                full_name = f"{parts[1].strip()} {parts[2].strip()}".lower()
-                if query in full_name:
-                    results.append(rec)
-        if results:
-            messagebox.showinfo("Results", "\n".join(results))
-        else:
-            messagebox.showinfo("Results", "No matching patient found.")
+        def found(patients):
+            if patients:
+                messagebox.showinfo("Results", "\n".join(patient.to_line() for patient in patients))
+            else:
+                messagebox.showinfo("Results", "No matching patient found.")
+        run(services.search_patients, query_entry.get(), on_done=found)
     tk.Button(win, text="Search", command=search).pack()
 
+@timed("ui.edit_patient")
 def edit_patient():
     """Opens a window to edit an existing patient record."""
     win = tk.Toplevel(main_ui)
@@ -201,25 +135,17 @@ def edit_patient():
     phone_var = tk.StringVar()
     email_var = tk.StringVar()
     address_var = tk.StringVar()
+    @timed("ui.edit_patient.load")
     def load():
         """Loads the patient record for editing."""
-        identifier = id_entry.get().strip()
-        pid = get_patient_id(identifier)
-        if not pid:
-            messagebox.showerror("Error", "Patient not found.")
-            return
-        records = read_records(PATIENTS_FILE)
-        for rec in records:
-            parts = rec.split(",")
-            if parts[0].strip() == pid:
-                first_var.set(parts[1].strip())
-                last_var.set(parts[2].strip())
-                dob_var.set(parts[3].strip())
-                phone_var.set(parts[4].strip())
-                email_var.set(parts[5].strip())
-                address_var.set(parts[6].strip())
-                return
-        messagebox.showerror("Error", "Patient not found.")
+        patient = call(services.get_patient, id_entry.get())
+        if patient is not None:
+            first_var.set(patient.first_name)
+            last_var.set(patient.last_name)
+            dob_var.set(patient.dob)
+            phone_var.set(patient.phone)
+            email_var.set(patient.email)
+            address_var.set(patient.address)
     tk.Button(win, text="Load", command=load).pack()
     tk.Label(win, text="New First Name:").pack()
     tk.Entry(win, textvariable=first_var).pack()
@@ -233,48 +159,17 @@ def edit_patient():
     tk.Entry(win, textvariable=email_var).pack()
     tk.Label(win, text="New Address:").pack()
     tk.Entry(win, textvariable=address_var).pack()
+    @timed("ui.edit_patient.update")
     def update():
         """Updates the patient record."""
-        identifier = id_entry.get().strip()
-        pid = get_patient_id(identifier)
-        if not pid:
-            messagebox.showerror("Error", "Patient not found.")
-            return
-        first = first_var.get().strip()
-        last = last_var.get().strip()
-        dob = dob_var.get().strip()
-        phone = phone_var.get().strip()
-        email = email_var.get().strip()
-        address = address_var.get().strip()
-        if not (validate_nonempty(first, "First Name") and
-                validate_nonempty(last, "Last Name") and
-                validate_nonempty(dob, "Date of Birth") and
-                validate_nonempty(phone, "Phone") and
-                validate_nonempty(email, "Email") and
-                validate_nonempty(address, "Address")):
-            return
-        if not validate_past_date(dob):
-            return
-        if not (validate_phone(phone) and validate_email(email)):
-            return
-        records = read_records(PATIENTS_FILE)
-        updated_records = []
-        found = False
-        for rec in records:
-            parts = rec.split(",")
-            if parts[0].strip() == pid:
-                updated_records.append(f"{pid},{first},{last},{dob},{phone},{email},{address}")
-                found = True
-            else:
-                updated_records.append(rec)
-        if found:
-            write_records(PATIENTS_FILE, updated_records)
+        def updated(result):
             messagebox.showinfo("Success", "Patient record updated.")
             win.destroy()
-        else:
-            messagebox.showerror("Error", "Patient not found.")
+        run(services.update_patient, id_entry.get(), first_var.get(), last_var.get(),
+            dob_var.get(), phone_var.get(), email_var.get(), address_var.get(), on_done=updated)
     tk.Button(win, text="Update", command=update).pack()
 
+@timed("ui.delete_patient")
 def delete_patient():
     """Opens a window to delete a patient record."""
     win = tk.Toplevel(main_ui)
@@ -282,62 +177,59 @@ def delete_patient():
     tk.Label(win, text="Enter Patient ID or Full Name:").pack()
     id_entry = tk.Entry(win)
     id_entry.pack()
+    @timed("ui.delete_patient.delete")
     def delete():
         """Deletes the patient record."""
-        identifier = id_entry.get().strip()
-        pid = get_patient_id(identifier)
-        if not pid:
-            messagebox.showerror("Error", "Patient not found.")
-            return
-        records = read_records(PATIENTS_FILE)
-        updated = [rec for rec in records if rec.split(",")[0].strip() != pid]
-        if len(records) == len(updated):
-            messagebox.showerror("Error", "Patient not found.")
-        else:
-            write_records(PATIENTS_FILE, updated)
-            # Cascade deletion in appointments and prescriptions.
-            apps = read_records(APPOINTMENTS_FILE)
-            apps = [app for app in apps if app.split(",")[1].strip() != pid]
-            write_records(APPOINTMENTS_FILE, apps)
-            prescs = read_records(PRESCRIPTIONS_FILE)
-            prescs = [p for p in prescs if p.split(",")[1].strip() != pid]
-            write_records(PRESCRIPTIONS_FILE, prescs)
+        def deleted(pid):
             messagebox.showinfo("Success", f"Patient with ID {pid} and related records deleted.")
             win.destroy()
+        # Cascades to the patient's appointments and prescriptions.
+        run(services.delete_patient, id_entry.get(), on_done=deleted, title="Deleting patient...")
     tk.Button(win, text="Delete", command=delete).pack()
 
+def _row_fields(record):
+    return record.fields() if record is not None else None
+
+def open_table_view(title, table, columns, empty_text):
+    """Opens a paged, sortable view over one of the store's tables."""
+    win = tk.Toplevel(main_ui)
+    win.title(title)
+    view = PagedTable(win, columns,
+                      lambda column, reverse: services.sorted_ids(table, column, reverse),
+                      lambda row_id: _row_fields(services.get_record(table, row_id)), empty_text,
+                      runner=tasks,
+                      sort_key=lambda row_id, column: services.sort_key(table, row_id, column),
+                      get_rows=lambda row_ids: [_row_fields(record) for record in
+                                                services.get_records(table, row_ids)])
+    view.pack(fill=tk.BOTH, expand=True)
+    tk.Button(win, text="Refresh", command=view.refresh).pack()
+    view.refresh()
+    # Local stores push changes; through the server the Refresh button is it.
+    subscription = services.subscribe([table])
+    if subscription is None:
+        return
+
+    def poll():
+        if not win.winfo_exists():
+            return
+        changes = subscription.pending()
+        if changes:
+            view.apply(changes)
+        win.after(VIEW_POLL_MS, poll)
+
+    win.bind("<Destroy>", lambda event: subscription.close() if event.widget is win else None)
+    win.after(VIEW_POLL_MS, poll)
+
+@timed("ui.view_patients")
 def view_patients():
     """Opens a window to view all patient records."""
-    win = tk.Toplevel(main_ui)
-    win.title("View Patients")
-    text_area = tk.Text(win, width=80, height=20)
-    text_area.pack()
-    def refresh():
-        """Refreshes the list of patient records."""
-        text_area.delete("1.0", tk.END)
-        records = read_records(PATIENTS_FILE)
-        if records:
-            text_area.insert(tk.END, "\n".join(records))
-        else:
-            text_area.insert(tk.END, "No patient records.")
-    tk.Button(win, text="Refresh", command=refresh).pack()
-    refresh()
+    open_table_view("View Patients", "patients",
+                    ("ID", "First Name", "Last Name", "Date of Birth", "Phone", "Email", "Address"),
+                    "No patient records.")
 
 # ---------- APPOINTMENT MANAGEMENT ----------
-def generate_appointment_id():
-    """Generates a new unique appointment ID."""
-    records = read_records(APPOINTMENTS_FILE)
-    max_id = 0
-    for rec in records:
-        try:
-            aid = int(rec.split(",")[0].strip())
-            if aid > max_id:
-                max_id = aid
-        except:
-            continue
-    return str(max_id + 1)
-
-def book_appointment(default_name=""):
+@timed("ui.book_appointment")
+def book_appointment(default_name="", default_date="", default_time=""):
     """Opens a window to book a new appointment."""
     win = tk.Toplevel(main_ui)
     win.title("Book Appointment")
@@ -349,44 +241,36 @@ def book_appointment(default_name=""):
     tk.Label(win, text="Appointment Date (DD/MM/YYYY):").pack()
     date_entry = tk.Entry(win)
     date_entry.pack()
+    date_entry.insert(0, default_date)
     tk.Label(win, text="Appointment Time (HH:MM, 09:00-19:00):").pack()
     time_entry = tk.Entry(win)
     time_entry.pack()
+    time_entry.insert(0, default_time)
+    @timed("ui.book_appointment.suggest")
+    def suggest():
+        """Fills in the next free slot from the entered date and time (or tomorrow)."""
+        slot = call(services.next_free_slot, date_entry.get(), time_entry.get())
+        if slot is None:
+            return
+        date_entry.delete(0, tk.END)
+        date_entry.insert(0, slot[0])
+        time_entry.delete(0, tk.END)
+        time_entry.insert(0, slot[1])
+    tk.Button(win, text="Suggest Next Free Slot", command=suggest).pack()
     tk.Label(win, text="Reason:").pack()
     reason_entry = tk.Entry(win)
     reason_entry.pack()
+    @timed("ui.book_appointment.book")
     def book():
         """Books the appointment."""
-        full_name = name_entry.get().strip()
-        date = date_entry.get().strip()
-        time_str = time_entry.get().strip()
-        reason = reason_entry.get().strip()
-        if not (validate_nonempty(full_name, "Patient Full Name") and
-                validate_nonempty(date, "Date") and
-                validate_nonempty(time_str, "Time") and
-                validate_nonempty(reason, "Reason")):
-            return
-        if not (validate_future_date(date) and validate_time(time_str)):
-            return
-        # Check for appointment conflict: same date & time already booked.
-        existing = [rec for rec in read_records(APPOINTMENTS_FILE)
-                    if rec.split(",")[3].strip() == date and
-                       rec.split(",")[4].strip() == time_str and
-                       rec.split(",")[5].strip().lower() == "booked"]
-        if existing:
-            messagebox.showerror("Conflict", "This appointment slot is already booked.")
-            return
-        pid = get_patient_by_name(full_name)
-        if not pid:
-            messagebox.showerror("Error", "Patient not found. Please add the patient first.")
-            return
-        aid = generate_appointment_id()
-        record = f"{aid},{pid},{full_name},{date},{time_str},Booked,{reason}"
-        append_record(APPOINTMENTS_FILE, record)
-        messagebox.showinfo("Success", f"Appointment booked with ID {aid}.")
-        win.destroy()
+        def booked(aid):
+            messagebox.showinfo("Success", f"Appointment booked with ID {aid}.")
+            win.destroy()
+        run(services.book_appointment, name_entry.get(), date_entry.get(), time_entry.get(),
+            reason_entry.get(), on_done=booked)
     tk.Button(win, text="Book", command=book).pack()
 
+@timed("ui.delete_appointment")
 def delete_appointment():
     """Opens a window to delete an appointment."""
     win = tk.Toplevel(main_ui)
@@ -400,28 +284,19 @@ def delete_appointment():
     tk.Label(win, text="Enter Appointment Time (HH:MM):").pack()
     time_entry = tk.Entry(win)
     time_entry.pack()
+    @timed("ui.delete_appointment.delete")
     def delete():
         """Deletes the appointment."""
-        full_name = name_entry.get().strip().lower()
-        date = date_entry.get().strip()
-        time_str = time_entry.get().strip()
-        pid = get_patient_by_name(full_name)
-        if not pid:
-            messagebox.showerror("Error", "Patient not found.")
-            return
-        records = read_records(APPOINTMENTS_FILE)
-        updated = [rec for rec in records if not (rec.split(",")[1].strip() == pid and 
-                                                   rec.split(",")[3].strip() == date and 
-                                                   rec.split(",")[4].strip() == time_str)]
-        if len(records) == len(updated):
-            messagebox.showerror("Error", "Appointment not found.")
-        else:
-            if messagebox.askyesno("Confirm", "Are you sure you want to delete this appointment?"):
-                write_records(APPOINTMENTS_FILE, updated)
+        matching = call(services.find_appointments, name_entry.get(), date_entry.get(),
+                        time_entry.get())
+        if matching and messagebox.askyesno("Confirm", "Are you sure you want to delete this appointment?"):
+            def deleted(count):
                 messagebox.showinfo("Success", "Appointment deleted.")
                 win.destroy()
+            run(services.delete_appointments, matching, on_done=deleted)
     tk.Button(win, text="Delete", command=delete).pack()
 
+@timed("ui.extend_appointment")
 def extend_appointment():
     """Opens a window to extend an appointment."""
     win = tk.Toplevel(main_ui)
@@ -435,67 +310,76 @@ def extend_appointment():
     tk.Label(win, text="Enter New Time (HH:MM):").pack()
     time_entry = tk.Entry(win)
     time_entry.pack()
+    @timed("ui.extend_appointment.extend")
     def extend():
         """Extends the appointment."""
-        aid = aid_entry.get().strip()
-        new_date = date_entry.get().strip()
-        new_time = time_entry.get().strip()
-        if not (validate_nonempty(new_date, "New Date") and validate_nonempty(new_time, "New Time")):
-            return
-        if not (validate_future_date(new_date) and validate_time(new_time)):
-            return
-        records = read_records(APPOINTMENTS_FILE)
-        updated = []
-        found = False
-        for rec in records:
-            parts = rec.split(",")
-            if parts[0].strip() == aid:
-                # Check if new slot is available:
-                conflict = [r for r in records if r.split(",")[3].strip() == new_date and 
-                            r.split(",")[4].strip() == new_time and r.split(",")[5].strip().lower() == "booked"]
-                if conflict:
-                    messagebox.showerror("Conflict", "The new appointment slot is already booked.")
-                    return
-                updated.append(f"{aid},{parts[1].strip()},{parts[2].strip()},{new_date},{new_time},Booked,{parts[6].strip()}")
-                found = True
-            else:
-                updated.append(rec)
-        if found:
-            write_records(APPOINTMENTS_FILE, updated)
+        def moved(result):
             messagebox.showinfo("Success", "Appointment extended.")
             win.destroy()
-        else:
-            messagebox.showerror("Error", "Appointment not found.")
+        run(services.reschedule_appointment, aid_entry.get(), date_entry.get(), time_entry.get(),
+            on_done=moved)
     tk.Button(win, text="Extend", command=extend).pack()
 
-def view_appointments():
+WEEKDAYS = ("Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun")
+
+@timed("ui.view_calendar")
+def view_calendar():
+    """Opens a week view of booked and free appointment slots."""
     win = tk.Toplevel(main_ui)
-    win.title("View Appointments")
-    text_area = tk.Text(win, width=80, height=20)
-    text_area.pack()
-    def refresh():
-        text_area.delete("1.0", tk.END)
-        records = read_records(APPOINTMENTS_FILE)
-        if records:
-            text_area.insert(tk.END, "\n".join(records))
-        else:
-            text_area.insert(tk.END, "No appointments found.")
-    tk.Button(win, text="Refresh", command=refresh).pack()
-    refresh()
+    win.title("Appointment Calendar")
+    today = today_ordinal()
+    # Day ordinal 1 (01/01/0001) was a Monday.
+    week = [today - (today - 1) % 7]
+    grid = tk.Frame(win, bg="white")
+    grid.pack(padx=10, pady=10)
+
+    @timed("ui.view_calendar.show")
+    def show():
+        days = list(range(week[0], week[0] + 7))
+        run(services.day_schedules, days, on_done=lambda schedules: draw(days, schedules))
+
+    def draw(days, schedules):
+        # Skip a closed window, or a week the user has already left.
+        if not win.winfo_exists() or days[0] != week[0]:
+            return
+        for widget in grid.winfo_children():
+            widget.destroy()
+        for col, day in enumerate(days, start=1):
+            tk.Label(grid, text=f"{WEEKDAYS[(day - 1) % 7]}\n{ordinal_to_date(day)}",
+                     font=("Arial", 9, "bold"), bg="white", width=14).grid(row=0, column=col)
+        for col, (day, schedule) in enumerate(zip(days, schedules), start=1):
+            for row, (time_str, booked) in enumerate(schedule, start=1):
+                if col == 1:
+                    tk.Label(grid, text=time_str, bg="white").grid(row=row, column=0)
+                if booked:
+                    text = ", ".join(appointment.patient_name for appointment in booked)
+                    cell = tk.Label(grid, text=text, bg="#F8D7DA", width=14, relief=tk.RIDGE)
+                else:
+                    cell = tk.Label(grid, text="", bg="#D4EDDA", width=14, relief=tk.RIDGE)
+                    if day > today:
+                        # Clicking a free future slot opens the booking form for it.
+                        cell.bind("<Button-1>", lambda event, d=ordinal_to_date(day), t=time_str:
+                                  book_appointment(default_date=d, default_time=t))
+                cell.grid(row=row, column=col, sticky="nsew")
+
+    def move(weeks):
+        week[0] += 7 * weeks
+        show()
+    nav = tk.Frame(win)
+    nav.pack(fill=tk.X)
+    tk.Button(nav, text="< Prev Week", command=lambda: move(-1)).pack(side=tk.LEFT)
+    tk.Button(nav, text="Next Week >", command=lambda: move(1)).pack(side=tk.RIGHT)
+    tk.Button(nav, text="Refresh", command=show).pack()
+    show()
+
+@timed("ui.view_appointments")
+def view_appointments():
+    open_table_view("View Appointments", "appointments",
+                    ("ID", "Patient ID", "Patient Name", "Date", "Time", "Status", "Reason"),
+                    "No appointments found.")
 
 # ---------- PRESCRIPTION MANAGEMENT ----------
-def generate_prescription_id():
-    records = read_records(PRESCRIPTIONS_FILE)
-    max_id = 0
-    for rec in records:
-        try:
-            pid = int(rec.split(",")[0].strip())
-            if pid > max_id:
-                max_id = pid
-        except:
-            continue
-    return str(max_id + 1)
-
+@timed("ui.add_prescription")
 def add_prescription():
     win = tk.Toplevel(main_ui)
     win.title("Add Prescription")
@@ -508,32 +392,16 @@ def add_prescription():
     tk.Label(win, text="Prescription Date (DD/MM/YYYY):").pack()
     date_entry = tk.Entry(win)
     date_entry.pack()
+    @timed("ui.add_prescription.add")
     def add():
-        full_name = name_entry.get().strip()
-        details = details_entry.get().strip()
-        presc_date = date_entry.get().strip()
-        if not (validate_nonempty(full_name, "Patient Full Name") and
-                validate_nonempty(details, "Details") and
-                validate_nonempty(presc_date, "Prescription Date")):
-            return
-        try:
-            dt = datetime.datetime.strptime(presc_date, "%d/%m/%Y")
-        except Exception:
-            messagebox.showerror("Date Error", "Invalid date format. Use DD/MM/YYYY.")
-            return
-        expiry_dt = dt + datetime.timedelta(days=365)
-        expiry = expiry_dt.strftime("%d/%m/%Y")
-        pid = get_patient_by_name(full_name)
-        if not pid:
-            messagebox.showerror("Error", "Patient not found. Please add the patient first.")
-            return
-        presc_id = generate_prescription_id()
-        record = f"{presc_id},{pid},{full_name},{details},{presc_date},{expiry}"
-        append_record(PRESCRIPTIONS_FILE, record)
-        messagebox.showinfo("Success", f"Prescription added with ID {presc_id}.")
-        win.destroy()
+        def added(presc_id):
+            messagebox.showinfo("Success", f"Prescription added with ID {presc_id}.")
+            win.destroy()
+        run(services.add_prescription, name_entry.get(), details_entry.get(), date_entry.get(),
+            on_done=added)
     tk.Button(win, text="Add", command=add).pack()
 
+@timed("ui.edit_prescription")
 def edit_prescription():
     win = tk.Toplevel(main_ui)
     win.title("Edit Prescription")
@@ -541,92 +409,100 @@ def edit_prescription():
     id_entry = tk.Entry(win)
     id_entry.pack()
     new_var = tk.StringVar()
+    @timed("ui.edit_prescription.load")
     def load():
-        identifier = id_entry.get().strip()
-        records = read_records(PRESCRIPTIONS_FILE)
-        found = False
-        for rec in records:
-            parts = rec.split(",")
-            if parts[0].strip() == identifier:
-                new_var.set(parts[3].strip())
-                found = True
-                break
-        if not found:
-            pid = get_patient_by_name(identifier)
-            if pid:
-                for rec in records:
-                    parts = rec.split(",")
-                    if parts[1].strip() == pid:
-                        new_var.set(parts[3].strip())
-                        found = True
-                        break
-        if not found:
-            messagebox.showerror("Error", "Prescription not found.")
+        prescription = call(services.find_prescription, id_entry.get())
+        if prescription is not None:
+            new_var.set(prescription.details)
     tk.Button(win, text="Load", command=load).pack()
     tk.Label(win, text="New Prescription Details:").pack()
     tk.Entry(win, textvariable=new_var).pack()
+    @timed("ui.edit_prescription.update")
     def update():
-        identifier = id_entry.get().strip()
-        new_details = new_var.get().strip()
-        if not validate_nonempty(new_details, "Prescription Details"):
-            return
-        records = read_records(PRESCRIPTIONS_FILE)
-        updated = []
-        found = False
-        for rec in records:
-            parts = rec.split(",")
-            if parts[0].strip() == identifier or (get_patient_by_name(identifier) and parts[1].strip() == get_patient_by_name(identifier)):
-                updated.append(f"{parts[0].strip()},{parts[1].strip()},{parts[2].strip()},{new_details},{parts[4].strip()},{parts[5].strip()}")
-                found = True
-            else:
-                updated.append(rec)
-        if found:
-            write_records(PRESCRIPTIONS_FILE, updated)
+        def updated(count):
             messagebox.showinfo("Success", "Prescription updated.")
             win.destroy()
-        else:
-            messagebox.showerror("Error", "Prescription not found.")
+        run(services.update_prescription_details, id_entry.get(), new_var.get(), on_done=updated)
     tk.Button(win, text="Update", command=update).pack()
 
+@timed("ui.delete_prescription")
 def delete_prescription():
     win = tk.Toplevel(main_ui)
     win.title("Delete Prescription")
     tk.Label(win, text="Enter Patient Full Name (First Last):").pack()
     name_entry = tk.Entry(win)
     name_entry.pack()
+    @timed("ui.delete_prescription.delete")
     def delete():
-        full_name = name_entry.get().strip().lower()
-        pid = get_patient_by_name(full_name)
-        if not pid:
-            messagebox.showerror("Error", "Patient not found.")
-            return
-        records = read_records(PRESCRIPTIONS_FILE)
-        updated = [rec for rec in records if rec.split(",")[1].strip() != pid]
-        if len(records) == len(updated):
-            messagebox.showerror("Error", "Prescription not found.")
-        else:
-            if messagebox.askyesno("Confirm", "Delete prescription for this patient?"):
-                write_records(PRESCRIPTIONS_FILE, updated)
+        presc_ids = call(services.prescriptions_for, name_entry.get())
+        if presc_ids and messagebox.askyesno("Confirm", "Delete prescription for this patient?"):
+            def deleted(count):
                 messagebox.showinfo("Success", "Prescription deleted.")
                 win.destroy()
+            run(services.delete_prescriptions, presc_ids, on_done=deleted)
     tk.Button(win, text="Delete", command=delete).pack()
 
+@timed("ui.view_prescriptions")
 def view_prescriptions():
+    open_table_view("View Prescriptions", "prescriptions",
+                    ("ID", "Patient ID", "Patient Name", "Details", "Date", "Expiry"),
+                    "No prescriptions found.")
+
+@timed("ui.view_recalls")
+def view_recalls():
+    """Lists prescriptions expiring in a date window and exports them for mailing."""
     win = tk.Toplevel(main_ui)
-    win.title("View Prescriptions")
+    win.title("Prescription Recalls")
+    tk.Label(win, text="Expiring From (DD/MM/YYYY):").pack()
+    from_entry = tk.Entry(win)
+    from_entry.pack()
+    from_entry.insert(0, ordinal_to_date(today_ordinal()))
+    tk.Label(win, text="Expiring To (DD/MM/YYYY):").pack()
+    to_entry = tk.Entry(win)
+    to_entry.pack()
+    to_entry.insert(0, ordinal_to_date(today_ordinal() + RECALL_DAYS - 1))
     text_area = tk.Text(win, width=80, height=20)
+
+    def window():
+        first_day = date_to_ordinal(from_entry.get().strip())
+        last_day = date_to_ordinal(to_entry.get().strip())
+        if first_day is None or last_day is None:
+            messagebox.showerror("Date Error", "Invalid date format. Use DD/MM/YYYY.")
+            return None
+        return first_day, last_day
+
+    @timed("ui.view_recalls.show")
+    def show():
+        days = window()
+        if days is None:
+            return
+        def listed(rows):
+            if not win.winfo_exists():
+                return
+            lines = [f"{row[1]}  {row[3]} {row[4]}  {row[5]}  {row[6]}  ({row[8]})" for row in rows]
+            text_area.delete("1.0", tk.END)
+            text_area.insert(tk.END, "\n".join(lines) if lines else "No prescriptions expire in this window.")
+        run(services.recall_list, *days, on_done=listed)
+
+    @timed("ui.view_recalls.export")
+    def export():
+        days = window()
+        if days is None:
+            return
+        path = filedialog.asksaveasfilename(parent=win, defaultextension=".csv",
+                                            filetypes=[("CSV files", "*.csv")])
+        if not path:
+            return
+        def exported(count):
+            messagebox.showinfo("Success", f"Exported {count} recalls to {path}.")
+        run(services.export_recalls, path, *days, on_done=exported)
+    tk.Button(win, text="Show", command=show).pack()
     text_area.pack()
-    def refresh():
-        text_area.delete("1.0", tk.END)
-        records = read_records(PRESCRIPTIONS_FILE)
-        if records:
-            text_area.insert(tk.END, "\n".join(records))
-        else:
-            text_area.insert(tk.END, "No prescriptions found.")
-    tk.Button(win, text="Refresh", command=refresh).pack()
-    refresh()
+    tk.Button(win, text="Export CSV", command=export).pack()
+    show()
 
 # ---------- INACTIVE PATIENTS CLEANUP (by Prescription Date) ----------
+@timed("ui.view_inactive_patients")
 def view_inactive_patients():
     """
     Displays patients for whom the most recent prescription date is over 4 years old
@@ -637,52 +513,57 @@ def view_inactive_patients():
     text_area = tk.Text(win, width=80, height=20)
     text_area.pack()
     
-    now = datetime.datetime.now()
-    threshold = now - datetime.timedelta(days=4*365)
-    patients = read_records(PATIENTS_FILE)
-    inactive = []
-    for rec in patients:
-        parts = rec.split(",")
-        pid = parts[0].strip()
-        prescs = [p for p in read_records(PRESCRIPTIONS_FILE) if p.split(",")[1].strip() == pid]
-        latest_date = None
-        for presc in prescs:
-            try:
-                presc_date = presc.split(",")[4].strip()
-                dt = datetime.datetime.strptime(presc_date, "%d/%m/%Y")
-                if (latest_date is None) or (dt > latest_date):
-                    latest_date = dt
-            except:
-                continue
-        # If no prescription exists or latest is older than threshold, mark inactive.
-        if latest_date is None or latest_date < threshold:
-            inactive.append(rec)
-    if inactive:
-        text_area.insert(tk.END, "\n".join(inactive))
-    else:
-        text_area.insert(tk.END, "No inactive patients found.")
-    
+    inactive_ids = []
+
+    def show(patients):
+        if patients is None or not win.winfo_exists():
+            return
+        inactive_ids.extend(patient.patient_id for patient in patients)
+        if patients:
+            text_area.insert(tk.END, "\n".join(patient.to_line() for patient in patients))
+            delete_button.config(state="normal")
+        else:
+            text_area.insert(tk.END, "No inactive patients found.")
+    tasks.submit(services.inactive_patients, on_done=show, on_error=show_error,
+                 title="Finding inactive patients...", pass_task=True)
+
+    @timed("ui.view_inactive_patients.delete_inactive")
     def delete_inactive():
         if messagebox.askyesno("Confirm", "Delete all inactive patient records? This will also delete related appointments and prescriptions."):
+            delete_button.config(state="disabled")
 
-            inactive_ids = [rec.split(",")[0].strip() for rec in inactive]
-            remaining = [rec for rec in patients if rec.split(",")[0].strip() not in inactive_ids]
-            write_records(PATIENTS_FILE, remaining)
-            apps = [app for app in read_records(APPOINTMENTS_FILE) if app.split(",")[1].strip() not in inactive_ids]
-            write_records(APPOINTMENTS_FILE, apps)
-            prescs = [p for p in read_records(PRESCRIPTIONS_FILE) if p.split(",")[1].strip() not in inactive_ids]
-            write_records(PRESCRIPTIONS_FILE, prescs)
-            messagebox.showinfo("Success", "Inactive patient records and related data deleted.")
-            win.destroy()
-    tk.Button(win, text="Delete All Inactive", command=delete_inactive, bg="#8B0000", fg="white").pack()
+            def purged(count):
+                messagebox.showinfo("Success", "Inactive patient records and related data deleted.")
+                win.destroy()
+            # Not cancellable: the deletions are committed as one transaction.
+            run(services.purge_patients, list(inactive_ids), on_done=purged,
+                title="Deleting inactive patients...")
+    # Enabled once the scan has found something to delete.
+    delete_button = tk.Button(win, text="Delete All Inactive", command=delete_inactive,
+                              bg="#8B0000", fg="white", state="disabled")
+    delete_button.pack()
 
 def cleanup_records():
     view_inactive_patients()
 
 # ---------- MAIN UI WINDOW ----------
+def check_files():
+    """Reloads tables other processes changed, so open views get the deltas too."""
+    def again(_=None):
+        main_ui.after(FILE_CHECK_MS, check_files)
+
+    def failed(e):
+        log_error(f"Error checking record files: {e}")
+        again()
+    tasks.submit(services.refresh, on_done=again, on_error=failed)
+
 def open_main_ui():
-    global main_ui
+    global main_ui, tasks
     main_ui = tk.Tk()
+    tasks = TaskRunner(main_ui)
+    # Usually already loaded during login; otherwise load while the menu is drawn.
+    tasks.submit(services.warm_up)
+    main_ui.after(FILE_CHECK_MS, check_files)
     main_ui.title("Optician Patient Management System")
     main_ui.geometry("900x700")
     main_ui.configure(bg="#f4f4f4")
@@ -706,30 +587,46 @@ def open_main_ui():
     tk.Button(appointment_frame, text="Delete Appointment", command=delete_appointment, font=("Arial", 10), bg="#DC3545", fg="white", width=18).grid(row=2, column=0, pady=2)
     tk.Button(appointment_frame, text="Extend Appointment", command=extend_appointment, font=("Arial", 10), bg="#FFC107", width=18).grid(row=3, column=0, pady=2)
     tk.Button(appointment_frame, text="View Appointments", command=view_appointments, font=("Arial", 10), bg="#6C757D", fg="white", width=18).grid(row=4, column=0, pady=2)
+    tk.Button(appointment_frame, text="Calendar", command=view_calendar, font=("Arial", 10), bg="#007BFF", fg="white", width=18).grid(row=5, column=0, pady=2)
     
     tk.Label(prescription_frame, text="Prescription Management", font=("Arial", 12, "bold"), bg="white").grid(row=0, column=0, pady=5)
     tk.Button(prescription_frame, text="Add Prescription", command=add_prescription, font=("Arial", 10), bg="#6C757D", fg="white", width=18).grid(row=1, column=0, pady=2)
     tk.Button(prescription_frame, text="Edit Prescription", command=edit_prescription, font=("Arial", 10), bg="#FFC107", width=18).grid(row=2, column=0, pady=2)
     tk.Button(prescription_frame, text="Delete Prescription", command=delete_prescription, font=("Arial", 10), bg="#DC3545", fg="white", width=18).grid(row=3, column=0, pady=2)
     tk.Button(prescription_frame, text="View Prescriptions", command=view_prescriptions, font=("Arial", 10), bg="#007BFF", fg="white", width=18).grid(row=4, column=0, pady=2)
+    tk.Button(prescription_frame, text="Recall List", command=view_recalls, font=("Arial", 10), bg="#17A2B8", fg="white", width=18).grid(row=5, column=0, pady=2)
     
     tk.Button(main_ui, text="View & Cleanup Inactive Patients", command=view_inactive_patients, font=("Arial", 10), bg="#8B0000", fg="white").grid(row=1, column=1, pady=10)
     
     main_ui.mainloop()
+    tasks.shutdown()
 
 # ---------- LOGIN WINDOW ----------
-login_root = tk.Tk()
-login_root.title("Login")
-login_root.geometry("350x250")
-login_root.configure(bg="#f4f4f4")
-frame = tk.Frame(login_root, bg="white", padx=20, pady=20)
-frame.pack(pady=20)
-tk.Label(frame, text="Login", font=("Arial", 14, "bold"), bg="white").pack(pady=5)
-tk.Label(frame, text="Username:", font=("Arial", 10), bg="white").pack()
-entry_username = tk.Entry(frame, width=25)
-entry_username.pack(pady=5)
-tk.Label(frame, text="Password:", font=("Arial", 10), bg="white").pack()
-entry_password = tk.Entry(frame, width=25, show="*")
-entry_password.pack(pady=5)
-tk.Button(frame, text="Login", command=login, font=("Arial", 10), bg="#28A745", fg="white").pack(pady=10)
-login_root.mainloop()
+def main():
+    """Shows the login window; nothing is built or loaded at import time."""
+    global login_root, login_tasks, entry_username, entry_password, login_button
+    login_root = tk.Tk()
+    login_root.title("Login")
+    login_root.geometry("350x250")
+    login_root.configure(bg="#f4f4f4")
+    login_tasks = TaskRunner(login_root, max_workers=1)
+    # Start loading the record store while the user types their password.
+    threading.Thread(target=services.warm_up, daemon=True).start()
+    frame = tk.Frame(login_root, bg="white", padx=20, pady=20)
+    frame.pack(pady=20)
+    tk.Label(frame, text="Login", font=("Arial", 14, "bold"), bg="white").pack(pady=5)
+    tk.Label(frame, text="Username:", font=("Arial", 10), bg="white").pack()
+    entry_username = tk.Entry(frame, width=25)
+    entry_username.pack(pady=5)
+    tk.Label(frame, text="Password:", font=("Arial", 10), bg="white").pack()
+    entry_password = tk.Entry(frame, width=25, show="*")
+    entry_password.pack(pady=5)
+    login_button = tk.Button(frame, text="Login", command=login, font=("Arial", 10), bg="#28A745", fg="white")
+    login_button.pack(pady=10)
+    try:
+        login_root.mainloop()
+    finally:
+        services.close()
+
+if __name__ == "__main__":
+    main()
@@ -1,78 +1,162 @@
 # validation.py
-import datetime
-from tkinter import messagebox
+import re
+
+from dates import date_to_ordinal, today_ordinal
+
+# ---------- Checks (no UI) ----------
+# Each check returns a FieldError, or None when the value is valid.  Date
+# checks take an optional "today" (a day ordinal) so batch callers compute
+# it only once.
+
+TIME_RE = re.compile(r"(\d{1,2}):(\d{1,2})$", re.ASCII)
+PHONE_RE = re.compile(r"\d{10}$", re.ASCII)
+EMAIL_RE = re.compile(r"[^@]*@[^@]*\.")
+AGE_RE = re.compile(r"\d{1,3}$", re.ASCII)
+
+class FieldError:
+    """A failed check: the field, a machine-readable code and a user message."""
+
+    __slots__ = ("field", "code", "message")
+
+    def __init__(self, field, code, message):
+        self.field = field
+        self.code = code
+        self.message = message
+
+    @property
+    def title(self):
+        """Message box title matching the kind of error."""
+        if self.code.startswith("date"):
+            return "Date Error"
+        if self.code.startswith("time"):
+            return "Time Error"
+        return "Input Error"
+
+    def __str__(self):
+        return self.message
+
+    def __repr__(self):
+        return f"FieldError({self.field!r}, {self.code!r}, {self.message!r})"
+
+def check_nonempty(text, field_name="Field"):
+    if not text.strip():
+        return FieldError(field_name, "empty", f"{field_name} cannot be empty.")
+    return None
+
+def check_date(date_text, field_name="Date"):
+    """Checks that the date is in DD/MM/YYYY format."""
+    if date_to_ordinal(date_text) is None:
+        return FieldError(field_name, "date_format", "Invalid date format. Use DD/MM/YYYY.")
+    return None
+
+def check_future_date(date_text, field_name="Date", today=None):
+    day = date_to_ordinal(date_text)
+    if day is None:
+        return FieldError(field_name, "date_format", "Invalid date format. Use DD/MM/YYYY.")
+    if day <= (today or today_ordinal()):
+        return FieldError(field_name, "date_not_future", "Date must be in the future.")
+    return None
+
+def check_past_date(date_text, field_name="Date", today=None):
+    day = date_to_ordinal(date_text)
+    if day is None:
+        return FieldError(field_name, "date_format", "Invalid date format. Use DD/MM/YYYY.")
+    if day > (today or today_ordinal()):
+        return FieldError(field_name, "date_not_past", "Date must be in the past.")
+    return None
+
+def check_phone(phone, field_name="Phone"):
+    if not PHONE_RE.match(phone):
+        return FieldError(field_name, "phone", "Phone must be exactly 10 digits.")
+    return None
+
+def check_age(age, field_name="Age"):
+    if not AGE_RE.match(age) or not (1 <= int(age) <= 150):
+        return FieldError(field_name, "age", "Age must be a number between 1 and 150.")
+    return None
+
+def check_email(email, field_name="Email"):
+    if not EMAIL_RE.match(email):
+        return FieldError(field_name, "email", "Invalid email address.")
+    return None
+
+def check_time(time_text, field_name="Time"):
+    match = TIME_RE.match(time_text)
+    if not match:
+        return FieldError(field_name, "time_format", "Invalid time format. Use HH:MM.")
+    hour, minute = int(match.group(1)), int(match.group(2))
+    if hour < 9 or hour >= 19:
+        return FieldError(field_name, "time_range", "Time must be between 09:00 and 19:00.")
+    if minute > 59:
+        return FieldError(field_name, "time_minutes", "Minutes must be between 0 and 59.")
+    return None
+
+# ---------- Batch API ----------
+
+_DATE_CHECKS = (check_future_date, check_past_date)
+
+def check_column(check, values, field_name=None):
+    """Runs one check over a whole column of values.
+
+    Returns a list of (index, FieldError) for the values that fail.
+    """
+    kwargs = {}
+    if field_name is not None:
+        kwargs["field_name"] = field_name
+    if check in _DATE_CHECKS:
+        kwargs["today"] = today_ordinal()
+    errors = []
+    for i, value in enumerate(values):
+        error = check(value, **kwargs)
+        if error is not None:
+            errors.append((i, error))
+    return errors
+
+def check_columns(columns, checks):
+    """Validates a table given as {field: [values]} against {field: check}.
+
+    Returns {row index: [FieldError, ...]} for every row with a problem.
+    """
+    failures = {}
+    for field, check in checks.items():
+        for i, error in check_column(check, columns[field], field):
+            failures.setdefault(i, []).append(error)
+    return failures
+
+# ---------- Tk validators ----------
+
+def _report(error):
+    """Shows error in a message box; returns True when there is none."""
+    if error is None:
+        return True
+    from tkinter import messagebox
+    messagebox.showerror(error.title, error.message)
+    return False
 
 def validate_nonempty(text, field_name="Field"):
     """Checks that the input is not empty."""
-    if not text.strip():
-        messagebox.showerror("Input Error", f"{field_name} cannot be empty.")
-        return False
-    return True
+    return _report(check_nonempty(text, field_name))
 
 def validate_future_date(date_text):
     """Checks that the date is in DD/MM/YYYY format and is in the future."""
-    try:
-        dt = datetime.datetime.strptime(date_text, "%d/%m/%Y")
-        if dt <= datetime.datetime.now():
-            messagebox.showerror("Date Error", "Date must be in the future.")
-            return False
-        return True
-    except Exception:
-        messagebox.showerror("Date Error", "Invalid date format. Use DD/MM/YYYY.")
-        return False
+    return _report(check_future_date(date_text))
 
 def validate_past_date(date_text):
     """Checks that the date is in DD/MM/YYYY format and is in the past."""
-    try:
-        dt = datetime.datetime.strptime(date_text, "%d/%m/%Y")
-        if dt >= datetime.datetime.now():
-            messagebox.showerror("Date Error", "Date must be in the past.")
-            return False
-        return True
-    except Exception:
-        messagebox.showerror("Date Error", "Invalid date format. Use DD/MM/YYYY.")
-        return False
+    return _report(check_past_date(date_text))
 
 def validate_phone(phone):
     """Checks that the phone number is exactly 10 digits."""
-    if not phone.isdigit() or len(phone) != 10:
-        messagebox.showerror("Input Error", "Phone must be exactly 10 digits.")
-        return False
-    return True
+    return _report(check_phone(phone))
 
 def validate_age(age):
     """Checks that age is a number between 1 and 150."""
-    if not age.isdigit() or not (1 <= int(age) <= 150):
-        messagebox.showerror("Input Error", "Age must be a number between 1 and 150.")
-        return False
-    return True
+    return _report(check_age(age))
 
 def validate_email(email):
     """Checks that the email contains an '@' and a '.' after '@'."""
-    if "@" not in email:
-        messagebox.showerror("Input Error", "Invalid email address.")
-        return False
-    parts = email.split("@")
-    if len(parts) < 2 or "." not in parts[1]:
-        messagebox.showerror("Input Error", "Invalid email address.")
-        return False
-    return True
+    return _report(check_email(email))
 
 def validate_time(time_text):
     """Checks that time is in HH:MM format and between 09:00 and 19:00."""
-    try:
-        parts = time_text.split(":")
-        if len(parts) != 2:
-            raise ValueError
-        hour = int(parts[0])
-        minute = int(parts[1])
-        if hour < 9 or hour >= 19:
-            messagebox.showerror("Time Error", "Time must be between 09:00 and 19:00.")
-            return False
-        if minute < 0 or minute > 59:
-            messagebox.showerror("Time Error", "Minutes must be between 0 and 59.")
-            return False
-        return True
-    except Exception:
-        messagebox.showerror("Time Error", "Invalid time format. Use HH:MM.")
-        return False
+    return _report(check_time(time_text))
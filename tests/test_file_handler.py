@@ -0,0 +1,79 @@
+# test_file_handler.py
+import os
+
+import file_handler
+from file_handler import (file_generation, file_position, file_version, locked, read_changes,
+                          read_records, upsert_records, write_records)
+
+def test_read_changes_returns_appended_journal_entries():
+    write_records("a.txt", ["1,x"])
+    position = file_position("a.txt")
+    upsert_records("a.txt", ["2,y"])
+    entries, position = read_changes("a.txt", position)
+    assert entries == ["+2,y"]
+    assert read_changes("a.txt", position) == ([], position)
+
+def test_rewrite_bumps_generation_and_forces_full_read():
+    write_records("a.txt", ["1,x", "2,y"])
+    position = file_position("a.txt")
+    generation = file_generation("a.txt")
+    # Two rewrites can hand the file its old inode number back.
+    write_records("a.txt", ["1,x", "2,z"])
+    write_records("a.txt", ["1,x", "2,y", "3,w"])
+    assert file_generation("a.txt") == generation + 2
+    assert read_changes("a.txt", position) is None
+
+def test_tail_must_start_at_a_line_boundary():
+    write_records("a.txt", ["1,x", "2,y"])
+    generation, _, journal_read = file_position("a.txt")
+    assert read_changes("a.txt", (generation, 2, journal_read)) is None
+    assert read_changes("a.txt", (generation, 4, journal_read)) == (["+2,y"], (generation, 8, 0))
+
+def test_bare_version_in_lock_file_reads_as_generation_zero():
+    with open("a.txt.lock", "w") as f:
+        f.write("7")
+    assert (file_version("a.txt"), file_generation("a.txt")) == (7, 0)
+
+def _leave_commit(marker):
+    """Stages a two-file commit the way a crashed writer would leave it."""
+    with locked(["a.txt", "b.txt"], exclusive=True):
+        file_handler._write_temp("a.txt", ["1,new"])
+        with open(file_handler._staged_path("b.txt"), "w") as f:
+            f.write("-1\n")
+        if marker:
+            with open(file_handler._transaction_path("a.txt") + ".crashed", "w") as f:
+                f.write(os.path.abspath("a.txt") + "\n" + os.path.abspath("b.txt") + "\n")
+        else:
+            with open(file_handler._marker_temp("a.txt"), "w") as f:
+                f.write(os.path.abspath("a.t"))  # torn mid-write
+
+def test_commit_with_marker_is_rolled_forward_by_next_reader():
+    write_records("a.txt", ["1,old"])
+    write_records("b.txt", ["1,p", "2,q"])
+    _leave_commit(marker=True)
+    with open("b.txt.lock") as f:
+        version = int(f.read().split()[0])
+    assert read_records("b.txt") == ["2,q"]
+    assert read_records("a.txt") == ["1,new"]
+    # Other processes must notice the files changed.
+    assert file_version("b.txt") > version
+    leftovers = [name for name in os.listdir(".")
+                 if name.endswith((".tmp", ".staged")) or name.startswith(".transaction")]
+    assert leftovers == []
+
+def test_commit_without_marker_is_discarded():
+    write_records("a.txt", ["1,old"])
+    write_records("b.txt", ["1,p", "2,q"])
+    _leave_commit(marker=False)
+    assert read_records("a.txt") == ["1,old"]
+    assert read_records("b.txt") == ["1,p", "2,q"]
+    leftovers = [name for name in os.listdir(".")
+                 if name.endswith((".tmp", ".staged")) or name.startswith(".transaction")]
+    assert leftovers == []
+
+def test_atomic_delete_commits_every_file():
+    write_records("a.txt", ["1,x", "2,y"])
+    write_records("b.txt", ["1,p"])
+    assert file_handler.delete_records_atomic({"a.txt": ["1"], "b.txt": ["1"]})
+    assert read_records("a.txt") == ["2,y"]
+    assert read_records("b.txt") == []
@@ -0,0 +1,79 @@
+# test_record_store.py
+import pytest
+
+import record_store
+from record_store import RecordStore, WriteConflict
+from records import Patient
+
+def patient(first):
+    return Patient("", first, "Smith", "01/01/1990", "0123456789", "a@b.com", "1 High St")
+
+def fresh_patients():
+    return RecordStore().patients
+
+def test_refresh_catches_up_without_reloading(monkeypatch):
+    a = RecordStore()
+    pid = a.create_patient(patient("Ann"))
+    b = RecordStore()
+    a.update_patient(a.patients[pid].replace(first_name="Anna"))
+    a.create_patient(patient("Bob"))
+    monkeypatch.setattr(b, "_reload", lambda table: pytest.fail(f"{table} reloaded"))
+    assert b.refresh() == ["patients"]
+    assert b.patients == fresh_patients()
+    assert b.find_patients_by_name("Anna") == [pid]
+
+def test_refresh_reloads_after_rewrites(monkeypatch):
+    monkeypatch.setattr(record_store, "JOURNAL_MODE", False)
+    a = RecordStore()
+    pids = [a.create_patient(patient(name)) for name in ("Ann", "Bob", "Cat")]
+    b = RecordStore()
+    # Two tmp+replace rewrites: the file may be back on its old inode.
+    b.update_patient(b.patients[pids[0]].replace(first_name="Renamed"))
+    b.update_patient(b.patients[pids[1]].replace(first_name="Again"))
+    a.refresh()
+    assert a.patients == fresh_patients()
+    assert list(a.patients) == pids
+
+def race(monkeypatch, other, times):
+    """Has other write a patient just before each of the next `times` commits.
+
+    Returns the list of commits attempted, other's own left out.
+    """
+    real = record_store.commit_if_unchanged
+    commits = []
+    racing = []
+
+    def commit(versions, writes):
+        if not racing:
+            commits.append(versions)
+            if len(commits) <= times:
+                racing.append(True)
+                try:
+                    other.create_patient(patient("Bob"))
+                finally:
+                    racing.clear()
+        return real(versions, writes)
+
+    monkeypatch.setattr(record_store, "commit_if_unchanged", commit)
+    return commits
+
+def test_conflicting_write_is_retried_on_fresh_tables(monkeypatch):
+    a = RecordStore()
+    b = RecordStore()
+    commits = race(monkeypatch, b, times=1)
+    pid = a.create_patient(patient("Ann"))
+    assert len(commits) == 2
+    assert a.patients == fresh_patients()
+    assert sorted(p.first_name for p in a.patients.values()) == ["Ann", "Bob"]
+    assert a.patients[pid].first_name == "Ann"
+
+def test_write_gives_up_when_files_keep_changing(monkeypatch):
+    a = RecordStore()
+    b = RecordStore()
+    commits = race(monkeypatch, b, times=record_store.WRITE_RETRIES)
+    with pytest.raises(WriteConflict):
+        a.create_patient(patient("Ann"))
+    assert len(commits) == record_store.WRITE_RETRIES
+    a.refresh()
+    assert a.patients == fresh_patients()
+    assert [p.first_name for p in a.patients.values()] == ["Bob"] * record_store.WRITE_RETRIES
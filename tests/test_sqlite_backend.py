@@ -0,0 +1,41 @@
+# test_sqlite_backend.py
+import pytest
+
+import sqlite_backend
+from constants import PATIENTS_FILE
+
+def line(pid, first):
+    return f"{pid},{first},Smith,01/01/1990,0123456789,a@b.com,1 High St"
+
+@pytest.fixture(autouse=True)
+def connection():
+    """A connection to this test's database, closed afterwards."""
+    yield sqlite_backend.connect()
+    sqlite_backend._local.conn.close()
+    del sqlite_backend._local.conn
+
+def test_read_changes_returns_rows_changed_since():
+    sqlite_backend.upsert_records(PATIENTS_FILE, [line("1", "Ann"), line("2", "Bob")])
+    position = sqlite_backend.position()
+    sqlite_backend.upsert_records(PATIENTS_FILE, [line("2", "Rob")])
+    sqlite_backend.upsert_records(PATIENTS_FILE, [line("3", "Cat")])
+    sqlite_backend.delete_records(PATIENTS_FILE, ["3"])
+    entries, position = sqlite_backend.read_changes(PATIENTS_FILE, position)
+    assert entries == ["+" + line("2", "Rob"), "-3"]
+    assert sqlite_backend.read_changes(PATIENTS_FILE, position) == ([], position)
+
+def test_read_changes_needs_full_read_after_rewrite_or_pruning(monkeypatch):
+    sqlite_backend.upsert_records(PATIENTS_FILE, [line("1", "Ann")])
+    position = sqlite_backend.position()
+    sqlite_backend.write_records(PATIENTS_FILE, [line("1", "Ann")])
+    assert sqlite_backend.read_changes(PATIENTS_FILE, position) is None
+    position = sqlite_backend.position()
+    monkeypatch.setattr(sqlite_backend, "CHANGES_KEPT", 1)
+    for pid in "234":
+        sqlite_backend.upsert_records(PATIENTS_FILE, [line(pid, "Bob")])
+    assert sqlite_backend.read_changes(PATIENTS_FILE, position) is None
+
+def test_read_row_by_primary_key():
+    sqlite_backend.upsert_records(PATIENTS_FILE, [line("1", "Ann")])
+    assert sqlite_backend.read_row(PATIENTS_FILE, "1")[1] == "Ann"
+    assert sqlite_backend.read_row(PATIENTS_FILE, "9") is None